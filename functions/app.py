@@ -1,13 +1,50 @@
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, UploadFile, Request, Header, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-import tensorflow as tf
-import numpy as np
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import List, Optional
+from contextlib import ExitStack
 from PIL import Image
-import io
+import numpy as np
+import asyncio
+import itertools
+import json
 import os
+import threading
+import time
+
+from batcher import MicroBatcher, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS, DEFAULT_MAX_PENDING
+from executors import BoundedExecutor, Overloaded, default_workers
+from model_inputs import FULL_SPEC, InputBuffers, build_inputs_timed, input_spec
+from fallback import COLOR_MODEL_PATH, ColorClassifier, smart_color_prediction
+from cache import PredictionCache, cache_key, content_hash, perceptual_hash
+from archives import detach_upload, iter_uploads
+from runtimes import RUNTIMES, TFLITE_VARIANTS, TFLiteModel, path_runtime, tflite_path_for
+from registry import ModelRegistry, file_version
+from cascade import CASCADE_PATH, CascadePolicy, gate_scores
+from uploads import BodyLimitMiddleware, UploadRejected, checked_inputs, open_upload
+from streaming import DEFAULT_SMOOTHING_MS, StreamSession, frame_inputs
+from metrics import (
+    MetricsMiddleware, MetricsRegistry, SamplingProfiler, current_endpoint,
+    model_memory_bytes, process_rss_bytes
+)
 
 app = FastAPI()
 
+# Uploads : taille max du corps (verifiee pendant la reception, archives a part) et
+# nombre max de pixels, controle sur l'en-tete avant tout decodage (0 = sans limite)
+MAX_UPLOAD_BYTES = int(float(os.environ.get("MAX_UPLOAD_MB", 20)) * 1024 * 1024)
+MAX_BATCH_UPLOAD_BYTES = int(float(os.environ.get("MAX_BATCH_UPLOAD_MB", 512)) * 1024 * 1024)
+MAX_IMAGE_PIXELS = int(float(os.environ.get("MAX_IMAGE_MPX", 50)) * 1_000_000)
+# Garde-fou de PIL pour tout ce qui serait decode sans passer par uploads.py
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS or None
+
+# Ajoute avant CORS (donc a l'interieur) : les 413 gardent les en-tetes CORS
+app.add_middleware(
+    BodyLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES,
+    overrides={"/predict/batch": MAX_BATCH_UPLOAD_BYTES}
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -16,243 +53,1030 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Metriques Prometheus (/metrics) : latence par endpoint et par etape, files,
+# requetes en cours, erreurs par type, memoire des modeles
+metrics = MetricsRegistry(prefix="fruits_")
+request_latency = metrics.histogram(
+    "http_request_duration_seconds", "Duree des requetes HTTP", ["endpoint", "method", "status"]
+)
+requests_in_flight = metrics.gauge(
+    "http_requests_in_flight", "Requetes HTTP en cours", ["endpoint"]
+)
+stage_latency = metrics.histogram(
+    "stage_duration_seconds",
+    "Duree de chaque etape d'une requete (read, decode_wait, decode, resize, convert, "
+    "inference, format, fallback)",
+    ["endpoint", "stage", "model"]
+)
+errors_total = metrics.counter("errors_total", "Erreurs par endpoint et par type", ["endpoint", "type"])
+batch_queue_wait = metrics.histogram(
+    "batcher_queue_wait_seconds", "Attente des images dans la file du micro-batcher", ["model"]
+)
+batch_inference = metrics.histogram(
+    "batcher_inference_seconds", "Duree d'une passe avant sur un lot", ["model"]
+)
+batch_size = metrics.histogram(
+    "batcher_batch_size", "Taille des lots executes", ["model"], buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+metrics.gauge("queue_depth", "Taches en attente ou en cours par file", ["queue"], collect=lambda: {
+    ("decode",): decode_executor.stats()["in_flight"],
+    ("inference",): inference_executor.stats()["in_flight"],
+    **{(f"batcher-{name}",): served.batcher.pending()
+       for name, served in registry.items() if served.batcher}
+})
+metrics.counter("queue_rejected_total", "Requetes rejetees (file pleine)", ["queue"], collect=lambda: {
+    ("decode",): decode_executor.stats()["rejected"],
+    ("inference",): inference_executor.stats()["rejected"],
+    **{(f"batcher-{name}",): served.batcher.stats()["rejected"]
+       for name, served in registry.items() if served.batcher}
+})
+metrics.gauge("model_memory_bytes", "Taille des poids des modeles servis", ["model", "version"],
+              collect=lambda: {(name, str(served.version)): model_memory_bytes(served.model)
+                               for name, served in registry.items()})
+cascade_answers = metrics.counter(
+    "cascade_answers_total", "Reponses de /predict en mode cascade, par etage", ["model"]
+)
+metrics.gauge("stream_sessions", "Sessions /stream ouvertes",
+              collect=lambda: {(): len(stream_sessions)})
+stream_frames = metrics.counter(
+    "stream_frames_total", "Frames /stream (received, processed, dropped, error)", ["result"]
+)
+stream_latency = metrics.histogram(
+    "stream_frame_seconds", "Reception d'un frame /stream -> envoi de sa prediction", ["model"]
+)
+metrics.gauge("process_resident_memory_bytes", "RSS du processus",
+              collect=lambda: {(): process_rss_bytes()})
+metrics.counter("cache_lookups_total", "Consultations du cache de predictions", ["result"],
+                collect=lambda: {(key,): value for key, value in prediction_cache.stats().items()
+                                 if key in ("hits", "perceptual_hits", "misses")})
+
+# Profileur par echantillonnage des requetes lentes (POST /debug/profiler pour l'activer)
+profiler = SamplingProfiler(
+    interval_ms=float(os.environ.get("PROFILER_INTERVAL_MS", 5)),
+    threshold_ms=float(os.environ.get("PROFILER_THRESHOLD_MS", 500))
+)
+if os.environ.get("PROFILER_ENABLED", "0") == "1":
+    profiler.configure(True)
+
+# Ajoute en dernier (donc a l'exterieur) : compte aussi les 413 et les erreurs CORS
+app.add_middleware(
+    MetricsMiddleware,
+    paths=lambda: [route.path for route in app.routes],
+    latency=request_latency,
+    in_flight=requests_in_flight,
+    errors=errors_total,
+    profiler=profiler
+)
+
+def observe_stage(stage, seconds, model=""):
+    """Enregistre la duree d'une etape pour l'endpoint de la requete en cours"""
+    stage_latency.observe(seconds, current_endpoint.get(), stage, model)
+
+def count_error(error):
+    errors_total.inc(current_endpoint.get(), type(error).__name__)
+
 CLASSES = ['apple', 'banana', 'carrot', 'orange', 'tomato']
-cnn_model = None
-ann_model = None
+# Modeles servis, du prefere au moins bon. COLOR : classifieur couleur (python fallback.py),
+# mode degrade si aucun reseau n'est charge ou si leurs files sont pleines
+MODEL_SOURCES = {
+    "CNN": 'models/cnn_model.h5',
+    # CNN compact distille du CNN (python train_distillation.py)
+    "STUDENT": 'models/student_model.h5',
+    "ANN": 'models/ann_model.h5',
+    "COLOR": COLOR_MODEL_PATH
+}
+DEGRADE_ON_OVERLOAD = os.environ.get("DEGRADE_ON_OVERLOAD", "1") == "1"
+# /predict : "best" (meilleur modele charge) ou "cascade" (python cascade.py pour calibrer)
+PREDICT_MODE = os.environ.get("PREDICT_MODE", "best")
+CASCADE_POLICY_PATH = os.environ.get("CASCADE_POLICY", CASCADE_PATH)
+cascade_state = {"version": None, "policy": None}
+
+# Micro-batching : BATCHING_ENABLED=0 revient au chemin une requete = un predict()
+BATCHING_ENABLED = os.environ.get("BATCHING_ENABLED", "1") == "1"
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", DEFAULT_MAX_BATCH_SIZE))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", DEFAULT_MAX_WAIT_MS))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("INFERENCE_QUEUE_SIZE", DEFAULT_MAX_PENDING))
+
+# Decodage hors de la boucle asyncio : DECODE_EXECUTOR=thread|process
+DECODE_EXECUTOR = os.environ.get("DECODE_EXECUTOR", "thread")
+DECODE_WORKERS = int(os.environ.get("DECODE_WORKERS", default_workers()))
+DECODE_QUEUE_SIZE = int(os.environ.get("DECODE_QUEUE_SIZE", 64))
+RETRY_AFTER = int(os.environ.get("RETRY_AFTER", 1))
+
+decode_executor = BoundedExecutor(
+    "decode", DECODE_WORKERS, DECODE_QUEUE_SIZE,
+    kind=DECODE_EXECUTOR, retry_after=RETRY_AFTER
+)
+# Utilise quand le micro-batching est desactive
+inference_executor = BoundedExecutor(
+    "inference", int(os.environ.get("INFERENCE_WORKERS", 2)), INFERENCE_QUEUE_SIZE,
+    retry_after=RETRY_AFTER
+)
+# Lots float32 des passes avant hors micro-batcher, un tampon par thread d'inference
+input_buffers = InputBuffers()
+
+# Taille des lots de /predict/batch
+BATCH_CHUNK_SIZE = int(os.environ.get("BATCH_CHUNK_SIZE", 32))
+
+# Cache des predictions, cle = hash des octets + modele + version des poids
+CACHE_ENABLED = os.environ.get("CACHE_ENABLED", "1") == "1"
+CACHE_PERCEPTUAL = os.environ.get("CACHE_PERCEPTUAL", "0") == "1"
+prediction_cache = PredictionCache(
+    max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", 1024)),
+    max_bytes=int(float(os.environ.get("CACHE_MAX_MB", 16)) * 1024 * 1024),
+    ttl=float(os.environ.get("CACHE_TTL", 3600))
+)
+
+# Runtime d'inference : keras (.h5) ou tflite / tflite-fp16 / tflite-int8
+MODEL_RUNTIME = os.environ.get("MODEL_RUNTIME", "keras")
+if MODEL_RUNTIME not in RUNTIMES:
+    # Une faute de frappe servirait Keras sans le dire
+    raise ValueError(f"MODEL_RUNTIME inconnu : {MODEL_RUNTIME} ({', '.join(RUNTIMES)})")
+# Limites de threads par processus (voir serve.py pour le mode multi-workers)
+INTRA_OP_THREADS = int(os.environ.get("INTRA_OP_THREADS", 0))
+INTER_OP_THREADS = int(os.environ.get("INTER_OP_THREADS", 0))
+TFLITE_THREADS = int(os.environ.get("TFLITE_THREADS", INTRA_OP_THREADS)) or None
+
+# Demarrage : STARTUP_MODE=background (le serveur repond tout de suite), blocking,
+# ou preloaded (modeles deja charges par serve.py avant le fork des workers)
+STARTUP_MODE = os.environ.get("STARTUP_MODE", "background")
+# Attente maximale d'une requete arrivee avant que les modeles soient prets
+READY_TIMEOUT = float(os.environ.get("READY_TIMEOUT", 10))
+models_ready = threading.Event()
+startup_state = {"status": "starting", "error": None, "load_s": None, "warmup_s": None}
+
+# Rechargement a chaud : verification de models/ toutes les N secondes (0 = seulement
+# via POST /models/reload, protege par ADMIN_TOKEN s'il est defini)
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", 0))
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Flux camera (/stream) : sessions simultanees max, taille max d'un frame, modele par
+# defaut ("auto" = meilleur modele charge) et demi-vie du lissage temporel
+STREAM_MAX_SESSIONS = int(os.environ.get("STREAM_MAX_SESSIONS", 32))
+STREAM_MAX_FRAME_BYTES = int(float(os.environ.get("STREAM_MAX_FRAME_KB", 1024)) * 1024)
+STREAM_MODEL = os.environ.get("STREAM_MODEL", "auto")
+STREAM_SMOOTHING_MS = float(os.environ.get("STREAM_SMOOTHING_MS", DEFAULT_SMOOTHING_MS))
+stream_sessions = set()
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """Serveur sature : 503 avec Retry-After plutot qu'une file sans fin"""
+    count_error(exc)
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(exc), "queue": exc.name},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(UploadRejected)
+async def upload_rejected_handler(request: Request, exc: UploadRejected):
+    """Upload refuse avant decodage : 400, 413, 415 ou 422"""
+    count_error(exc)
+    return JSONResponse(status_code=exc.status_code, content={"error": str(exc)})
+
+async def read_upload(file):
+    """Octets d'une image envoyee, refusee d'apres son en-tete si besoin
+
+    Memoryview sans copie sur le fichier temporaire pour les gros uploads,
+    bytes si le decodage se fait dans un autre processus.
+    """
+    start = time.perf_counter()
+    image_bytes = await asyncio.to_thread(
+        open_upload, file.file, MAX_IMAGE_PIXELS, DECODE_EXECUTOR != "process"
+    )
+    observe_stage("read", time.perf_counter() - start)
+    return image_bytes
+
+def make_batcher(model, name):
+    """Micro-batcher d'une version de modele (None si le batching est desactive)"""
+    if not BATCHING_ENABLED or isinstance(model, ColorClassifier):
+        return None
+    def observe_batch(size, delays, seconds):
+        batch_size.observe(size, name)
+        batch_inference.observe(seconds, name)
+        for delay in delays:
+            batch_queue_wait.observe(delay, name)
+
+    return MicroBatcher(
+        model, name,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        max_pending=INFERENCE_QUEUE_SIZE,
+        retry_after=RETRY_AFTER,
+        observer=observe_batch
+    )
+
+def model_source(h5_path):
+    """Fichier servi pour un modele selon MODEL_RUNTIME (.tflite s'il existe, sinon .h5)"""
+    if MODEL_RUNTIME in TFLITE_VARIANTS and h5_path.endswith('.h5'):
+        path = tflite_path_for(h5_path, MODEL_RUNTIME)
+        if os.path.exists(path):
+            return path
+        print(f"{path} non trouve (python export_tflite.py), utilisation de Keras")
+    return h5_path
+
+def load_model_file(path):
+    """Charge un fichier .tflite, .npz (classifieur couleur) ou .h5"""
+    if path.endswith('.tflite'):
+        return TFLiteModel(path, num_threads=TFLITE_THREADS)
+    if path.endswith('.npz'):
+        return ColorClassifier.load(path)
+
+    # Import paresseux : tensorflow n'est charge que si un modele Keras est servi
+    import tensorflow as tf
+    try:
+        if INTRA_OP_THREADS:
+            tf.config.threading.set_intra_op_parallelism_threads(INTRA_OP_THREADS)
+        if INTER_OP_THREADS:
+            tf.config.threading.set_inter_op_parallelism_threads(INTER_OP_THREADS)
+    except RuntimeError:
+        # Runtime deja initialise par un chargement precedent
+        pass
+
+    return tf.keras.models.load_model(path)
+
+def warm_up_model(model):
+    """Passe avant factice pour tracer les graphes (lot de 1 et lot maximal)"""
+    shape = tuple(int(d) for d in model.input_shape[1:])
+    for batch_size in (1, BATCH_MAX_SIZE):
+        model.predict_on_batch(np.zeros((batch_size, *shape), dtype=np.float32))
+
+registry = ModelRegistry(
+    MODEL_SOURCES, load_model_file, resolve=model_source,
+    warm_up=warm_up_model, make_batcher=make_batcher
+)
+
+def start_batchers():
+    """Cree un micro-batcher par modele charge"""
+    registry.start_batchers()
 
-def load_models():
-    """Charge les modeles entraines"""
-    global cnn_model, ann_model
+def load_models(with_batchers=True):
+    """Charge les modeles entraines
 
+    with_batchers=False charge seulement les poids (avant un fork, les
+    threads des micro-batchers ne survivraient pas dans les workers).
+    """
     print("\n" + "="*60)
     print("Chargement des modeles...")
     print("="*60)
 
-    cnn_path = 'models/cnn_model.h5'
-    if os.path.exists(cnn_path):
-        try:
-            cnn_model = tf.keras.models.load_model(cnn_path)
-            print(f"Modele CNN charge depuis {cnn_path}")
-        except Exception as e:
-            print(f"Erreur CNN : {e}")
-    else:
-        print(f"Modele CNN non trouve : {cnn_path}")
+    registry.load_all(with_batchers=with_batchers)
 
-    ann_path = 'models/ann_model.h5'
-    if os.path.exists(ann_path):
-        try:
-            ann_model = tf.keras.models.load_model(ann_path)
-            print(f"Modele ANN charge depuis {ann_path}")
-        except Exception as e:
-            print(f"Erreur ANN : {e}")
-    else:
-        print(f"Modele ANN non trouve : {ann_path}")
-
-    if not cnn_model and not ann_model:
+    if not registry.items():
         print("\nAucun modele entraine trouve")
         print("Executez : python train_models_complete.py")
 
+    print(f"Runtime : {MODEL_RUNTIME}")
+
+    prediction_cache.clear()
+    if with_batchers and BATCHING_ENABLED and registry.items():
+        print(f"Micro-batching actif : {BATCH_MAX_SIZE} images / {BATCH_MAX_WAIT_MS} ms")
+
     print("="*60)
 
-def preprocess_image(image_bytes, target_size=(224, 224)):
-    """Pretraite l'image pour la prediction"""
-    img = Image.open(io.BytesIO(image_bytes))
-    img = img.convert('RGB')
-    img = img.resize(target_size)
+def predict_inputs(model, arrays):
+    """Passe avant sur des entrees decodees (pixels uint8), converties dans le tampon du thread"""
+    return np.asarray(model.predict_on_batch(input_buffers.stack(arrays)))
 
-    x = np.array(img, dtype=np.float32) / 255.0
-    x = np.expand_dims(x, axis=0)
+async def run_model(x, served):
+    """Passe avant sur une image, via le micro-batcher s'il existe"""
+    if isinstance(served.model, ColorClassifier):
+        # Quelques microsecondes : pas de file d'attente, meme en surcharge
+        return served.model.predict_on_batch(x)[0]
+    if served.batcher:
+        return await asyncio.wrap_future(served.batcher.submit(x))
+    predictions = await inference_executor.run(predict_inputs, served.model, [x])
+    return predictions[0]
 
-    return x
+def format_prediction(probs, model_name, version=None):
+    """Construit la reponse a partir du vecteur de probabilites"""
+    idx = np.argmax(probs)
+    confidence = float(probs[idx] * 100)
+    label = CLASSES[idx]
 
-def predict_with_model(image_bytes, model, model_name):
-    """Fait une prediction avec un modele"""
+    all_probs = {
+        CLASSES[i]: float(probs[i] * 100)
+        for i in range(len(CLASSES))
+    }
+
+    return {
+        "label": label,
+        "confidence": f"{confidence:.2f}%",
+        "model": model_name,
+        "version": version,
+        "all_predictions": all_probs
+    }
+
+async def evaluate_model(x, served):
+    """Passe avant chronometree d'un modele sur un tenseur deja decode"""
+    model_name = served.name
+    start = time.perf_counter()
     try:
-        x = preprocess_image(image_bytes)
-        predictions = model.predict(x, verbose=0)
+        probs = await run_model(x, served)
+        predicted = time.perf_counter()
+        observe_stage("inference", predicted - start, model_name)
+        result = format_prediction(probs, model_name, served.version)
+        observe_stage("format", time.perf_counter() - predicted, model_name)
+    except Overloaded:
+        raise
+    except Exception as e:
+        count_error(e)
+        result = {"error": str(e), "model": model_name, "version": served.version}
 
-        idx = np.argmax(predictions[0])
-        confidence = float(predictions[0][idx] * 100)
-        label = CLASSES[idx]
+    return result, round((time.perf_counter() - start) * 1000, 2)
 
-        all_probs = {
-            CLASSES[i]: float(predictions[0][i] * 100)
-            for i in range(len(CLASSES))
-        }
+async def predict_models(image_bytes, names):
+    """Decode l'image une seule fois puis evalue tous les modeles en parallele
 
-        return {
-            "label": label,
-            "confidence": f"{confidence:.2f}%",
-            "model": model_name,
-            "all_predictions": all_probs
-        }
+    `names` : noms des modeles. Chaque requete garde la version qu'elle a
+    prise jusqu'a la fin, meme si un rechargement a lieu entre-temps.
+    Retourne {nom: resultat}, chaque resultat indiquant la latence et la
+    version du modele.
+    """
+    with ExitStack() as stack:
+        models = [(name, stack.enter_context(registry.use(name))) for name in names]
+        return await predict_served(
+            image_bytes, [(name, served) for name, served in models if served is not None]
+        )
 
-    except Exception as e:
-        return {
-            "error": str(e),
-            "model": model_name
-        }
+async def run_fallback(image_bytes):
+    """Regles de couleur historiques, quand aucun modele n'est charge"""
+    start = time.perf_counter()
+    result = await decode_executor.run(smart_color_prediction, image_bytes)
+    observe_stage("fallback", time.perf_counter() - start)
+    return result
 
-def smart_color_prediction(image_bytes):
-    """Prediction de secours basee sur les couleurs"""
-    img = Image.open(io.BytesIO(image_bytes))
-    img = img.convert('RGB')
-    img_small = img.resize((50, 50))
-    pixels = np.array(img_small)
-
-    avg_color = pixels.mean(axis=(0, 1))
-    r, g, b = avg_color
-
-    scores = {
-        'tomato': 0,
-        'apple': 0,
-        'banana': 0,
-        'carrot': 0,
-        'orange': 0
+def model_spec(served):
+    """Entree attendue par une version de modele (image 224, image reduite, histogramme)"""
+    return input_spec(served.model.input_shape)
+
+def observe_decode(timings, elapsed):
+    """Etapes d'un build_inputs_timed ; decode_wait = file et aller-retour de l'executeur"""
+    for stage, seconds in timings.items():
+        observe_stage(stage, seconds)
+    observe_stage("decode_wait", max(0.0, elapsed - sum(timings.values())))
+
+async def predict_served(image_bytes, models, inputs=None, extra_specs=()):
+    """predict_models sur des versions deja prises : liste de (nom, ServedModel)
+
+    `inputs` : dict {spec: entree} partage entre appels (cascade), complete
+    au premier decodage avec `extra_specs` pour ne pas redecoder ensuite.
+    """
+    if inputs is None:
+        inputs = {}
+    results = {}
+    keys = {name: [] for name, _ in models}
+    pending = []
+
+    if CACHE_ENABLED:
+        digest = content_hash(image_bytes)
+
+    for model_name, model in models:
+        if CACHE_ENABLED:
+            key = cache_key("bytes", digest, model_name, model.version)
+            cached = prediction_cache.get(key, count_miss=not CACHE_PERCEPTUAL)
+            if cached is not None:
+                results[model_name] = {**cached, "latency_ms": 0.0, "cached": True}
+                continue
+            keys[model_name].append(key)
+        pending.append((model_name, model))
+
+    if pending:
+        specs = [model_spec(model) for _, model in pending] + list(extra_specs)
+        if CACHE_ENABLED and CACHE_PERCEPTUAL:
+            # Le dHash est calcule sur l'image pleine resolution
+            specs.append(FULL_SPEC)
+        try:
+            # Un seul decodage, puis l'entree propre a chaque modele
+            if not set(specs) <= set(inputs):
+                start = time.perf_counter()
+                decoded, timings = await decode_executor.run(
+                    build_inputs_timed, image_bytes, specs, False
+                )
+                observe_decode(timings, time.perf_counter() - start)
+                inputs.update(decoded)
+        except Overloaded:
+            raise
+        except Exception as e:
+            count_error(e)
+            for model_name, model in pending:
+                results[model_name] = {"error": str(e), "model": model_name,
+                                       "version": model.version}
+            pending = []
+
+    if pending and CACHE_ENABLED and CACHE_PERCEPTUAL:
+        digest = await decode_executor.run(perceptual_hash, inputs[FULL_SPEC])
+        remaining = []
+        for model_name, model in pending:
+            key = cache_key("dhash", digest, model_name, model.version)
+            cached = prediction_cache.get(key, perceptual=True)
+            if cached is not None:
+                prediction_cache.put(keys[model_name][0], cached)
+                results[model_name] = {**cached, "latency_ms": 0.0, "cached": True}
+            else:
+                keys[model_name].append(key)
+                remaining.append((model_name, model))
+        pending = remaining
+
+    evaluated = await asyncio.gather(*(
+        evaluate_model(inputs[model_spec(model)], model) for _, model in pending
+    ))
+
+    for (model_name, _), (result, latency) in zip(pending, evaluated):
+        if "error" not in result:
+            for key in keys[model_name]:
+                prediction_cache.put(key, result)
+        results[model_name] = {**result, "latency_ms": latency}
+
+    return {model_name: results[model_name] for model_name, _ in models}
+
+def cascade_policy():
+    """Politique de cascade (python cascade.py), relue si le fichier change"""
+    try:
+        version = file_version(CASCADE_POLICY_PATH)
+    except OSError:
+        return None
+    if version != cascade_state["version"]:
+        try:
+            cascade_state["policy"] = CascadePolicy.load(CASCADE_POLICY_PATH)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Politique de cascade illisible ({CASCADE_POLICY_PATH}) : {e}")
+        cascade_state["version"] = version
+    return cascade_state["policy"]
+
+async def predict_cascade(image_bytes, policy):
+    """Cascade : le modele le moins cher d'abord, escalade si son score est sous le seuil
+
+    L'image n'est decodee qu'une fois pour tous les etages et chaque etage
+    garde sa version jusqu'a la fin. Le dernier etage charge repond
+    toujours. Si un etage superieur est sature, la reponse de l'etage
+    precedent est renvoyee, marquee degraded.
+    """
+    with ExitStack() as stack:
+        stages = [(name, stack.enter_context(registry.use(name))) for name in policy.stages]
+        stages = [(name, served) for name, served in stages if served is not None]
+        specs = [model_spec(served) for _, served in stages]
+        inputs = {}
+        trace = []
+        result = None
+
+        for i, (name, served) in enumerate(stages):
+            try:
+                stage_result = (await predict_served(
+                    image_bytes, [(name, served)], inputs, specs
+                ))[name]
+            except Overloaded:
+                if result is None or not DEGRADE_ON_OVERLOAD:
+                    raise
+                result = {**result, "degraded": True}
+                break
+
+            if "error" in stage_result:
+                trace.append({"model": name, "error": stage_result["error"]})
+                continue
+
+            probs = np.array(list(stage_result["all_predictions"].values())) / 100
+            accepted = i == len(stages) - 1 or policy.accepts(name, probs)
+            trace.append({
+                "model": name,
+                policy.gate: round(float(gate_scores(probs, policy.gate)[0]), 4),
+                "threshold": policy.thresholds.get(name),
+                "accepted": accepted,
+                "latency_ms": stage_result.get("latency_ms")
+            })
+            result = stage_result
+            if accepted:
+                break
+
+    if result is None:
+        return {"error": "Aucun etage de la cascade n'a repondu", "cascade": {"stages": trace}}
+
+    cascade_answers.inc(result["model"])
+    return {
+        **result,
+        "latency_ms": round(sum(stage.get("latency_ms") or 0.0 for stage in trace), 2),
+        "cascade": {"stage": result["model"], "gate": policy.gate, "stages": trace}
     }
 
-    if r > 150 and g < 100 and b < 100:
-        scores['tomato'] = 80 + (r - g) / 10
+async def predict_with_model(image_bytes, model_name):
+    """Fait une prediction avec un modele"""
+    results = await predict_models(image_bytes, [model_name])
+    if model_name not in results:
+        return model_unavailable(model_name)
+    return results[model_name]
+
+def loaded_models():
+    """Noms des modeles charges, du prefere au moins bon"""
+    return [name for name, _ in registry.items()]
 
-    if (r > 150 and g < 120) or (g > r and g > 100):
-        scores['apple'] = 75 + abs(r - g) / 10
+def warm_up():
+    """Passe avant factice sur chaque modele pour tracer les graphes"""
+    registry.warm_up_all()
 
-    if r > 180 and g > 150 and b < 120:
-        scores['banana'] = 85
+def load_and_warm_up(load=True):
+    """Chargement + echauffement, execute en arriere-plan au demarrage"""
+    try:
+        startup_state["status"] = "loading"
+        start = time.perf_counter()
+        if load:
+            load_models()
+        else:
+            start_batchers()
+        startup_state["load_s"] = round(time.perf_counter() - start, 3)
 
-    if r > 150 and 80 < g < 140 and b < 100:
-        scores['carrot'] = 70
+        startup_state["status"] = "warming_up"
+        start = time.perf_counter()
+        warm_up()
+        startup_state["warmup_s"] = round(time.perf_counter() - start, 3)
 
-    if r > 180 and g > 120 and b < 100:
-        scores['orange'] = 75
+        startup_state["status"] = "ready"
+        registry.watch(MODEL_WATCH_INTERVAL)
+    except Exception as e:
+        startup_state["status"] = "failed"
+        startup_state["error"] = str(e)
+        print(f"Erreur au demarrage : {e}")
+    finally:
+        models_ready.set()
 
-    predicted = max(scores, key=scores.get)
-    confidence = min(scores[predicted], 85.0)
+async def wait_until_ready():
+    """Attend les modeles au plus READY_TIMEOUT secondes, retourne True s'ils sont prets"""
+    if models_ready.is_set():
+        return True
+    return await asyncio.to_thread(models_ready.wait, READY_TIMEOUT)
 
+def model_unavailable(name):
+    if not models_ready.is_set():
+        return {
+            "error": f"Modele {name} en cours de chargement",
+            "status": startup_state["status"]
+        }
     return {
-        "label": predicted,
-        "confidence": f"{confidence:.2f}%",
-        "model": "Detection couleur (fallback)",
-        "all_predictions": scores
+        "error": f"Modele {name} non disponible",
+        "suggestion": "Executez : python train_models_complete.py"
     }
 
 @app.on_event("startup")
 async def startup():
-    """Charge les modeles au demarrage"""
-    load_models()
+    """Charge les modeles au demarrage (en arriere-plan par defaut)"""
+    load = STARTUP_MODE != "preloaded"
+    if STARTUP_MODE == "blocking":
+        load_and_warm_up()
+    else:
+        threading.Thread(
+            target=load_and_warm_up, args=(load,), name="model-loader", daemon=True
+        ).start()
 
 @app.get("/")
 def root():
     """Page d'accueil"""
     status = []
 
-    if cnn_model:
-        status.append("CNN OK")
-    else:
-        status.append("CNN manquant")
-
-    if ann_model:
-        status.append("ANN OK")
-    else:
-        status.append("ANN manquant")
+    for name in MODEL_SOURCES:
+        if registry.get(name):
+            status.append(f"{name} OK")
+        else:
+            status.append(f"{name} manquant")
 
     return {
         "message": "Serveur de classification actif",
         "models_status": " | ".join(status),
         "classes": CLASSES,
         "endpoints": {
-            "predict": "/predict (utilise le meilleur modele)",
+            "predict": "/predict (utilise le meilleur modele, ?mode=cascade pour la cascade)",
             "predict_cnn": "/predict/cnn",
             "predict_ann": "/predict/ann",
-            "compare": "/compare (compare les deux modeles)"
+            "predict_student": "/predict/student",
+            "predict_color": "/predict/color",
+            "compare": "/compare (compare tous les modeles charges)",
+            "predict_batch": "/predict/batch (plusieurs images ou archive, NDJSON)",
+            "stream": "/stream (WebSocket, frames camera, dernier frame seulement)",
+            "reload": "/models/reload (POST, recharge les modeles modifies)",
+            "metrics": "/metrics (Prometheus)"
         }
     }
 
 @app.post("/predict")
-async def predict(file: UploadFile = File(...)):
-    """Prediction avec le meilleur modele disponible"""
+async def predict(file: UploadFile = File(...), mode: Optional[str] = None):
+    """Prediction avec le meilleur modele disponible
+
+    mode=cascade (ou PREDICT_MODE=cascade) : cascade calibree du modele le
+    moins cher au plus cher, l'etage qui a repondu est indique.
+    """
     try:
-        image_bytes = await file.read()
+        image_bytes = await read_upload(file)
+        await wait_until_ready()
 
-        if cnn_model:
-            result = predict_with_model(image_bytes, cnn_model, "CNN")
-        elif ann_model:
-            result = predict_with_model(image_bytes, ann_model, "ANN")
-        else:
-            result = smart_color_prediction(image_bytes)
+        policy = cascade_policy() if (mode or PREDICT_MODE) == "cascade" else None
+
+        try:
+            if policy and any(registry.get(name) for name in policy.stages):
+                result = await predict_cascade(image_bytes, policy)
+            else:
+                name = next((name for name in MODEL_SOURCES if registry.get(name)), None)
+                if name:
+                    result = await predict_with_model(image_bytes, name)
+                else:
+                    result = await run_fallback(image_bytes)
+        except Overloaded:
+            # File d'inference pleine : reponse degradee du classifieur couleur
+            if not DEGRADE_ON_OVERLOAD or not registry.get("COLOR"):
+                raise
+            result = {**await predict_with_model(image_bytes, "COLOR"), "degraded": True}
 
         return {"prediction": result}
 
+    except (Overloaded, UploadRejected):
+        raise
     except Exception as e:
+        count_error(e)
         return {"error": str(e)}
 
 @app.post("/predict/cnn")
 async def predict_cnn(file: UploadFile = File(...)):
     """Prediction avec le modele CNN"""
     try:
-        image_bytes = await file.read()
+        image_bytes = await read_upload(file)
+        await wait_until_ready()
 
-        if cnn_model:
-            result = predict_with_model(image_bytes, cnn_model, "CNN")
+        if registry.get("CNN"):
+            result = await predict_with_model(image_bytes, "CNN")
         else:
-            result = {
-                "error": "Modele CNN non disponible",
-                "suggestion": "Executez : python train_models_complete.py"
-            }
+            result = model_unavailable("CNN")
 
         return {"prediction": result}
 
+    except (Overloaded, UploadRejected):
+        raise
     except Exception as e:
+        count_error(e)
         return {"error": str(e)}
 
 @app.post("/predict/ann")
 async def predict_ann(file: UploadFile = File(...)):
     """Prediction avec le modele ANN"""
     try:
-        image_bytes = await file.read()
+        image_bytes = await read_upload(file)
+        await wait_until_ready()
 
-        if ann_model:
-            result = predict_with_model(image_bytes, ann_model, "ANN")
+        if registry.get("ANN"):
+            result = await predict_with_model(image_bytes, "ANN")
         else:
-            result = {
-                "error": "Modele ANN non disponible",
-                "suggestion": "Executez : python train_models_complete.py"
-            }
+            result = model_unavailable("ANN")
+
+        return {"prediction": result}
+
+    except (Overloaded, UploadRejected):
+        raise
+    except Exception as e:
+        count_error(e)
+        return {"error": str(e)}
+
+@app.post("/predict/student")
+async def predict_student(file: UploadFile = File(...)):
+    """Prediction avec le CNN compact distille (STUDENT)"""
+    try:
+        image_bytes = await read_upload(file)
+        await wait_until_ready()
+
+        if registry.get("STUDENT"):
+            result = await predict_with_model(image_bytes, "STUDENT")
+        else:
+            result = model_unavailable("STUDENT")
 
         return {"prediction": result}
 
+    except (Overloaded, UploadRejected):
+        raise
     except Exception as e:
+        count_error(e)
+        return {"error": str(e)}
+
+@app.post("/predict/color")
+async def predict_color(file: UploadFile = File(...)):
+    """Prediction avec le classifieur couleur (COLOR)"""
+    try:
+        image_bytes = await read_upload(file)
+        await wait_until_ready()
+
+        if registry.get("COLOR"):
+            result = await predict_with_model(image_bytes, "COLOR")
+        else:
+            result = model_unavailable("COLOR")
+
+        return {"prediction": result}
+
+    except (Overloaded, UploadRejected):
+        raise
+    except Exception as e:
+        count_error(e)
         return {"error": str(e)}
 
 @app.post("/compare")
 async def compare_models(file: UploadFile = File(...)):
-    """Compare les predictions des deux modeles"""
+    """Compare les predictions de tous les modeles charges
+
+    L'image est decodee une fois et les modeles sont evalues en parallele :
+    la latence totale tend vers celle du modele le plus lent.
+    """
     try:
-        image_bytes = await file.read()
+        image_bytes = await read_upload(file)
+        await wait_until_ready()
+        start = time.perf_counter()
 
         results = {}
+        models = loaded_models()
 
-        if cnn_model:
-            results["cnn"] = predict_with_model(image_bytes, cnn_model, "CNN")
-
-        if ann_model:
-            results["ann"] = predict_with_model(image_bytes, ann_model, "ANN")
-
-        if not results:
-            results["fallback"] = smart_color_prediction(image_bytes)
+        if models:
+            predictions = await predict_models(image_bytes, models)
+            results = {name.lower(): result for name, result in predictions.items()}
+        else:
+            results["fallback"] = await run_fallback(image_bytes)
 
-        return {"comparison": results}
+        return {
+            "comparison": results,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
 
+    except (Overloaded, UploadRejected):
+        raise
     except Exception as e:
+        count_error(e)
         return {"error": str(e)}
 
+async def decode_checked(data, spec):
+    """Controle l'en-tete puis decode une image d'un lot, etapes mesurees"""
+    start = time.perf_counter()
+    inputs, timings = await decode_executor.run(
+        checked_inputs, data, [spec], MAX_IMAGE_PIXELS, False
+    )
+    observe_decode(timings, time.perf_counter() - start)
+    return inputs[spec]
+
+async def predict_chunk(chunk, served, model_name):
+    """Decode un lot d'images en parallele puis fait une seule passe avant"""
+    spec = model_spec(served) if served is not None else FULL_SPEC
+    decoded = await asyncio.gather(
+        *(decode_checked(data, spec) for _, data in chunk),
+        return_exceptions=True
+    )
+
+    results = [None] * len(chunk)
+    valid = []
+    for i, x in enumerate(decoded):
+        if isinstance(x, Exception):
+            count_error(x)
+            results[i] = {"error": str(x), "model": model_name}
+        else:
+            valid.append(i)
+
+    if valid and served is not None:
+        start = time.perf_counter()
+        predictions = await inference_executor.run(
+            predict_inputs, served.model, [decoded[i] for i in valid]
+        )
+        elapsed = time.perf_counter() - start
+        observe_stage("inference", elapsed, model_name)
+        latency = round(elapsed * 1000 / len(valid), 2)
+        for i, probs in zip(valid, np.asarray(predictions)):
+            results[i] = {**format_prediction(probs, model_name, served.version),
+                          "latency_ms": latency}
+    elif valid:
+        for i in valid:
+            results[i] = await run_fallback(chunk[i][1])
+
+    return results
+
+async def stream_batch(files, model_name):
+    """Genere une ligne JSON par image, lot par lot, avec une seule version du modele"""
+    images = iter_uploads(files, MAX_UPLOAD_BYTES)
+    index = 0
+
+    with registry.use(model_name) as served:
+        while True:
+            chunk = await asyncio.to_thread(
+                lambda: list(itertools.islice(images, BATCH_CHUNK_SIZE))
+            )
+            if not chunk:
+                break
+
+            try:
+                results = await predict_chunk(chunk, served, model_name)
+            except Exception as e:
+                count_error(e)
+                results = [{"error": str(e), "model": model_name}] * len(chunk)
+
+            start = time.perf_counter()
+            lines = []
+            for (name, _), result in zip(chunk, results):
+                lines.append(json.dumps({"index": index, "file": name, "prediction": result}) + "\n")
+                index += 1
+            observe_stage("format", time.perf_counter() - start, model_name)
+            for line in lines:
+                yield line
+
+@app.post("/predict/batch")
+async def predict_batch(files: List[UploadFile] = File(...), model: str = "auto"):
+    """Prediction sur plusieurs images ou une archive zip/tar
+
+    Les images sont traitees par lots de BATCH_CHUNK_SIZE et les resultats
+    sont renvoyes en NDJSON au fur et a mesure.
+    """
+    await wait_until_ready()
+    models = loaded_models()
+
+    if model == "auto":
+        model_name = next(iter(models), "fallback")
+    else:
+        model_name = model.upper()
+        if model_name not in models:
+            return JSONResponse(
+                status_code=404,
+                content={"error": f"Modele {model_name} non disponible"}
+            )
+
+    uploads = [detach_upload(f) for f in files]
+
+    return StreamingResponse(
+        stream_batch(uploads, model_name),
+        media_type="application/x-ndjson"
+    )
+
+def stream_model_name(session):
+    """Modele d'une session : celui demande, ou le meilleur modele charge ("auto")"""
+    if session.model.lower() != "auto":
+        return session.model.upper()
+    return next((name for name in MODEL_SOURCES if registry.get(name)), None)
+
+async def receive_frames(websocket, session):
+    """Lit les messages du client : frames binaires dans la session, textes = controle"""
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                data = message["bytes"]
+                stream_frames.inc("received")
+                if STREAM_MAX_FRAME_BYTES and len(data) > STREAM_MAX_FRAME_BYTES:
+                    session.reject_frame(
+                        f"Frame trop gros : {len(data)} octets (max {STREAM_MAX_FRAME_BYTES})"
+                    )
+                    stream_frames.inc("error")
+                elif session.put_frame(data):
+                    stream_frames.inc("dropped")
+            elif message.get("text") is not None:
+                # Applique tout de suite : les frames suivants sont lus dans le nouveau format
+                session.put_control(message["text"])
+    finally:
+        session.close()
+
+async def classify_frame(session, index, received_at, data, layout):
+    """Prediction lissee d'un frame ; None si le frame est abandonne (serveur sature)
+
+    `layout` : format du frame a sa reception (None = image compressee).
+    """
+    name = stream_model_name(session)
+    if name is None:
+        return {"frame": index, **model_unavailable("auto")}
+
+    with registry.use(name) as served:
+        if served is None:
+            return {"frame": index, **model_unavailable(name)}
+        spec = model_spec(served)
+        try:
+            start = time.perf_counter()
+            inputs, timings = await decode_executor.run(
+                frame_inputs, data, layout, [spec], MAX_IMAGE_PIXELS, False
+            )
+            observe_decode(timings, time.perf_counter() - start)
+            start = time.perf_counter()
+            probs = await run_model(inputs[spec], served)
+            observe_stage("inference", time.perf_counter() - start, name)
+        except Overloaded:
+            # Le client enverra un frame plus recent : inutile de reessayer celui-ci
+            session.dropped += 1
+            stream_frames.inc("dropped")
+            return None
+        except (UploadRejected, ValueError) as e:
+            stream_frames.inc("error")
+            return {"frame": index, "error": str(e)}
+
+    now = time.perf_counter()
+    smoothed = session.smoother.update(probs, now)
+    session.processed += 1
+    stream_frames.inc("processed")
+    stream_latency.observe(now - received_at, name)
+
+    instant = format_prediction(probs, name, served.version)
+    return {
+        "frame": index,
+        "prediction": format_prediction(smoothed, name, served.version),
+        "instant": {"label": instant["label"], "confidence": instant["confidence"]},
+        "latency_ms": round((now - received_at) * 1000, 2),
+        "dropped": session.dropped
+    }
+
+@app.websocket("/stream")
+async def stream(websocket: WebSocket):
+    """Flux de frames camera : une session par client, seul le dernier frame est classe
+
+    Messages binaires : frames (image compressee, ou RGB brut apres un
+    message {"format": "rgb", "width", "height"}). Messages texte : JSON de
+    configuration (format, model, smoothing_ms), acquitte par
+    {"config": ...}. Chaque prediction porte le numero du frame classe
+    (0 pour le premier frame recu) ; les frames arrives pendant un calcul
+    sont remplaces par le plus recent.
+    """
+    await websocket.accept()
+    if len(stream_sessions) >= STREAM_MAX_SESSIONS:
+        # 1013 : "try again later"
+        await websocket.close(code=1013)
+        return
+
+    current_endpoint.set("/stream")
+    session = StreamSession(STREAM_MODEL, STREAM_SMOOTHING_MS)
+    stream_sessions.add(session)
+    receiver = None
+
+    try:
+        await wait_until_ready()
+        receiver = asyncio.create_task(receive_frames(websocket, session))
+        while True:
+            await session.wait()
+            for message in session.take_notices():
+                await websocket.send_json(message)
+
+            frame = session.take_frame()
+            if frame is not None:
+                try:
+                    message = await classify_frame(session, *frame)
+                except Exception as e:
+                    count_error(e)
+                    message = {"frame": frame[0], "error": str(e)}
+                if message is not None:
+                    await websocket.send_json(message)
+
+            if session.closed:
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if receiver:
+            receiver.cancel()
+        stream_sessions.discard(session)
+
+@app.get("/stream/stats")
+def stream_stats():
+    """Sessions /stream ouvertes : frames recus, classes, abandonnes et debit"""
+    sessions = [{**session.config(), **session.stats()} for session in list(stream_sessions)]
+    return {"sessions": len(sessions), "max_sessions": STREAM_MAX_SESSIONS, "details": sessions}
+
+@app.get("/ready")
+def ready():
+    """Disponibilite : 200 une fois les modeles charges et echauffes, 503 avant"""
+    content = {
+        "ready": models_ready.is_set(),
+        "pid": os.getpid(),
+        **startup_state,
+        "cnn_loaded": registry.get("CNN") is not None,
+        "ann_loaded": registry.get("ANN") is not None
+    }
+    return JSONResponse(status_code=200 if models_ready.is_set() else 503, content=content)
+
 @app.get("/health")
 def health():
-    """Verification de sante"""
+    """Verification de sante (vivacite : repond meme pendant le chargement)"""
     return {
         "status": "healthy",
-        "cnn_loaded": cnn_model is not None,
-        "ann_loaded": ann_model is not None
+        "pid": os.getpid(),
+        "startup": startup_state["status"],
+        "cnn_loaded": registry.get("CNN") is not None,
+        "ann_loaded": registry.get("ANN") is not None
+    }
+
+@app.get("/batching/stats")
+def batching_stats():
+    """Distribution des tailles de lot et delais d'attente par modele"""
+    return {
+        "enabled": BATCHING_ENABLED,
+        "models": {
+            name: served.batcher.stats()
+            for name, served in registry.items() if served.batcher
+        },
+        "executors": {
+            "decode": decode_executor.stats(),
+            "inference": inference_executor.stats()
+        }
+    }
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Compteurs succes / echecs / evictions du cache de predictions"""
+    return {
+        "enabled": CACHE_ENABLED,
+        "perceptual": CACHE_PERCEPTUAL,
+        "model_versions": registry.versions(),
+        **prediction_cache.stats()
     }
 
 @app.get("/models/info")
@@ -260,29 +1084,71 @@ def models_info():
     """Informations sur les modeles"""
     info = {
         "classes": CLASSES,
-        "num_classes": len(CLASSES)
+        "num_classes": len(CLASSES),
+        "runtime": MODEL_RUNTIME
     }
 
-    if cnn_model:
-        info["cnn"] = {
-            "loaded": True,
-            "input_shape": str(cnn_model.input_shape),
-            "total_params": cnn_model.count_params()
-        }
-    else:
-        info["cnn"] = {"loaded": False}
-
-    if ann_model:
-        info["ann"] = {
-            "loaded": True,
-            "input_shape": str(ann_model.input_shape),
-            "total_params": ann_model.count_params()
-        }
-    else:
-        info["ann"] = {"loaded": False}
+    for name in MODEL_SOURCES:
+        served = registry.get(name)
+        if served:
+            info[name.lower()] = {
+                "loaded": True,
+                "version": served.version,
+                "path": served.path,
+                # Runtime reel : keras si la variante .tflite demandee manque
+                "runtime": path_runtime(served.path),
+                "input_shape": str(served.model.input_shape),
+                "total_params": served.model.count_params()
+            }
+        else:
+            info[name.lower()] = {"loaded": False}
 
     return info
 
+@app.get("/models/registry")
+def models_registry():
+    """Versions servies, rechargements et erreurs de chargement"""
+    return registry.stats()
+
+@app.post("/models/reload")
+async def reload_models(force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """Recharge en arriere-plan les modeles dont le fichier a change
+
+    La nouvelle version est chargee et echauffee a cote de l'ancienne, puis
+    echangee ; les requetes en cours terminent sur l'ancienne version.
+    """
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        return JSONResponse(status_code=403, content={"error": "Token admin invalide"})
+    if not models_ready.is_set():
+        return JSONResponse(status_code=503, content={"error": "Chargement initial en cours"})
+
+    results = await asyncio.to_thread(registry.reload, force)
+    return {"models": results}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Metriques au format texte de Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profiler")
+def profiler_status():
+    """Etat du profileur et derniers profils ecrits (format folded)"""
+    return profiler.stats()
+
+@app.post("/debug/profiler")
+def configure_profiler(enabled: bool, threshold_ms: Optional[float] = None,
+                       interval_ms: Optional[float] = None,
+                       x_admin_token: Optional[str] = Header(None)):
+    """Active ou coupe le profileur a chaud
+
+    Les requetes plus lentes que threshold_ms sont ecrites dans profiles/
+    (flamegraph.pl ou speedscope pour les visualiser).
+    """
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        return JSONResponse(status_code=403, content={"error": "Token admin invalide"})
+    profiler.configure(enabled, interval_ms=interval_ms, threshold_ms=threshold_ms)
+    return profiler.stats()
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,66 @@
+import os
+import tarfile
+import zipfile
+
+from uploads import UploadRejected
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+
+def is_image_name(name):
+    base = os.path.basename(name)
+    return not base.startswith('.') and base.lower().endswith(IMAGE_EXTENSIONS)
+
+def member_too_large(size, max_member_bytes):
+    if max_member_bytes and size > max_member_bytes:
+        return UploadRejected(413, f"Membre d'archive trop gros ({size / 1024 / 1024:.1f} Mo)")
+    return None
+
+def iter_upload_images(fileobj, filename, max_member_bytes=0):
+    """Itere sur (nom, octets) des images d'un fichier envoye
+
+    Le fichier peut etre une image seule, une archive zip ou une archive tar
+    (compressee ou non). Les membres d'archive sont lus un par un pour que
+    la memoire reste bornee quelle que soit la taille de l'archive ; un
+    membre de plus de `max_member_bytes` (taille decompressee annoncee) n'est
+    pas lu et l'UploadRejected prend la place de ses octets.
+    """
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and is_image_name(info.filename):
+                    rejected = member_too_large(info.file_size, max_member_bytes)
+                    yield info.filename, rejected or archive.read(info)
+        return
+
+    fileobj.seek(0)
+    if tarfile.is_tarfile(fileobj):
+        fileobj.seek(0)
+        with tarfile.open(fileobj=fileobj, mode='r|*') as archive:
+            for member in archive:
+                if member.isfile() and is_image_name(member.name):
+                    rejected = member_too_large(member.size, max_member_bytes)
+                    yield member.name, rejected or archive.extractfile(member).read()
+        return
+
+    fileobj.seek(0)
+    yield filename, fileobj.read()
+
+def detach_upload(upload):
+    """Ouvre un second descripteur sur le fichier temporaire d'un upload
+
+    FastAPI peut fermer les UploadFile avant la fin d'une StreamingResponse ;
+    le descripteur duplique garde le contenu accessible jusqu'a sa fermeture.
+    """
+    upload.file.seek(0)
+    return upload.filename, os.fdopen(os.dup(upload.file.fileno()), 'rb')
+
+def iter_uploads(files, max_member_bytes=0):
+    """Enchaine les images de plusieurs fichiers (nom, fichier) puis les ferme"""
+    try:
+        for filename, fileobj in files:
+            yield from iter_upload_images(fileobj, filename, max_member_bytes)
+    finally:
+        for _, fileobj in files:
+            fileobj.close()
@@ -0,0 +1,186 @@
+import threading
+import queue
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from executors import Overloaded
+from model_inputs import stack_inputs
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_MAX_PENDING = 256
+
+class MicroBatcher:
+    """Regroupe les requetes concurrentes en un seul appel au modele
+
+    Un thread dedie attend la premiere requete, puis collecte les suivantes
+    jusqu'a max_batch_size images ou max_wait_ms millisecondes, execute une
+    seule passe avant sur le lot et renvoie a chaque appelant sa ligne de
+    resultat via un Future. Au-dela de max_pending images en attente,
+    submit leve Overloaded.
+    """
+
+    def __init__(self, model, name, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, max_pending=DEFAULT_MAX_PENDING,
+                 retry_after=1, history_size=10000, observer=None):
+        self.model = model
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        # observer(taille du lot, attentes en file, duree de la passe) apres chaque lot
+        self.observer = observer
+
+        self._queue = queue.Queue()
+        self._buffer = None
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._queue_delays = deque(maxlen=history_size)
+        self._inference_times = deque(maxlen=history_size)
+        self._images = 0
+        self._batches = 0
+        self._rejected = 0
+        self._started_at = time.perf_counter()
+
+        self._thread = threading.Thread(
+            target=self._run, name=f"batcher-{name}", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, x):
+        """Ajoute une entree (image (H, W, C) ou histogramme), avec ou sans dimension de lot
+
+        Les images uint8 sont converties en float32 directement dans le
+        tampon du lot.
+        """
+        if x.ndim in (2, 4):
+            x = x[0]
+        if self.max_pending and self._queue.qsize() >= self.max_pending:
+            with self._lock:
+                self._rejected += 1
+            raise Overloaded(f"batcher-{self.name}", self.retry_after)
+        future = Future()
+        self._queue.put((x, future, time.perf_counter()))
+        return future
+
+    def pending(self):
+        """Images en attente dans la file"""
+        return self._queue.qsize()
+
+    def predict(self, x, timeout=None):
+        """Version bloquante de submit"""
+        return self.submit(x).result(timeout=timeout)
+
+    def close(self):
+        """Arrete le thread apres avoir traite les requetes en attente"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        stop = False
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+
+        return batch, stop
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch, stop = self._collect(first)
+            self._process(batch)
+
+            if stop:
+                return
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        items = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not items:
+            return
+
+        try:
+            x = self._stack([item[0] for item in items])
+            predictions = np.asarray(self.model.predict_on_batch(x))
+        except Exception as e:
+            for _, future, _ in items:
+                future.set_exception(e)
+            return
+
+        finished = time.perf_counter()
+        for i, (_, future, _) in enumerate(items):
+            future.set_result(predictions[i])
+
+        delays = [started - enqueued for _, _, enqueued in items]
+        with self._lock:
+            self._batch_sizes[len(items)] += 1
+            self._queue_delays.extend(delays)
+            self._inference_times.append(finished - started)
+            self._images += len(items)
+            self._batches += 1
+
+        if self.observer:
+            self.observer(len(items), delays, finished - started)
+
+    def _stack(self, arrays):
+        """Empile les entrees dans un tampon float32 prealloue et reutilise"""
+        shape = arrays[0].shape
+        if self._buffer is None or self._buffer.shape[1:] != shape:
+            self._buffer = np.empty((self.max_batch_size, *shape), dtype=np.float32)
+        return stack_inputs(arrays, self._buffer)
+
+    def stats(self):
+        """Distribution des tailles de lot et delais d'attente (en ms)"""
+        with self._lock:
+            delays = np.array(self._queue_delays) * 1000
+            inference = np.array(self._inference_times) * 1000
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            images = self._images
+            batches = self._batches
+            rejected = self._rejected
+
+        elapsed = time.perf_counter() - self._started_at
+
+        def percentiles(values):
+            if not len(values):
+                return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+            return {
+                "p50": float(np.percentile(values, 50)),
+                "p90": float(np.percentile(values, 90)),
+                "p99": float(np.percentile(values, 99)),
+                "max": float(values.max())
+            }
+
+        return {
+            "model": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "images": images,
+            "batches": batches,
+            "mean_batch_size": images / batches if batches else 0.0,
+            "batch_size_distribution": batch_sizes,
+            "queue_delay_ms": percentiles(delays),
+            "inference_ms": percentiles(inference),
+            "images_per_sec": images / elapsed if elapsed > 0 else 0.0,
+            "pending": self._queue.qsize(),
+            "rejected": rejected
+        }
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import tensorflow as tf
+
+import train_models_complete as training
+from bench_utils import CLASSES, percentiles, read_images
+from model_inputs import build_inputs, input_spec, serving_model, spec_name
+
+def measure(path, images, batch_size):
+    """Parametres, taille, chargement, latence (decodage compris) et precision d'un .h5"""
+    start = time.perf_counter()
+    model = tf.keras.models.load_model(path, compile=False)
+    load_time = time.perf_counter() - start
+
+    spec = input_spec(model.input_shape)
+    model.predict_on_batch(build_inputs(images[0][2], [spec])[spec])
+
+    latencies = []
+    inputs = []
+    correct = 0
+    for _, cls, data in images:
+        start = time.perf_counter()
+        x = build_inputs(data, [spec])[spec]
+        probs = np.asarray(model.predict_on_batch(x))[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        inputs.append(x)
+        correct += CLASSES[int(np.argmax(probs))] == cls
+
+    batch = np.concatenate((inputs * batch_size)[:batch_size])
+    model.predict_on_batch(batch)
+    start = time.perf_counter()
+    model.predict_on_batch(batch)
+    batch_time = time.perf_counter() - start
+
+    return {
+        "file": path,
+        "input": spec_name(spec),
+        "params": int(model.count_params()),
+        "file_mb": os.path.getsize(path) / 1024 / 1024,
+        "load_s": load_time,
+        "latency_ms": percentiles(latencies),
+        "batch_images_per_sec": batch_size / batch_time,
+        "accuracy": correct / len(images)
+    }
+
+def main():
+    """Compare les entrees de l'ANN : 224x224 aplati vs image reduite vs histogramme"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--inputs', nargs='+', default=['full', 'pixels:32', 'pixels:56', 'histogram:8'],
+                        help="architectures non entrainees a comparer (taille, chargement, latence)")
+    parser.add_argument('--models', nargs='*', default=['models/ann_model.h5'],
+                        help="modeles entraines (ajoute la precision)")
+    parser.add_argument('--split', default='data/test')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--output', help="rapport JSON")
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BENCHMARK DES ENTREES DE L'ANN")
+    print("="*70)
+
+    images = read_images(args.split)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for text in args.inputs:
+            model = serving_model(training.create_ann_model(ann_input=text))
+            path = os.path.join(tmp, f"ann_{text.replace(':', '_')}.h5")
+            model.save(path)
+            tf.keras.backend.clear_session()
+            result = measure(path, images, args.batch_size)
+            result["file"] = f"(non entraine) {text}"
+            result["accuracy"] = None
+            results.append(result)
+
+    for path in args.models:
+        if os.path.exists(path):
+            results.append(measure(path, images, args.batch_size))
+        else:
+            print(f"Modele non trouve : {path}")
+
+    baseline = next((r for r in results if r["input"] == "full"), None)
+
+    print(f"\n{'Entree':<14} {'Parametres':>12} {'Fichier':>10} {'Chargement':>11} "
+          f"{'p50':>8} {'p95':>8} {'Lot img/s':>10} {'Precision':>10}  Source")
+    for r in results:
+        accuracy = f"{r['accuracy'] * 100:9.2f}%" if r["accuracy"] is not None else f"{'-':>10}"
+        print(f"{r['input']:<14} {r['params']:>12,} {r['file_mb']:8.2f}Mo {r['load_s']:10.2f}s "
+              f"{r['latency_ms']['p50']:6.2f}ms {r['latency_ms']['p95']:6.2f}ms "
+              f"{r['batch_images_per_sec']:10.1f} {accuracy}  {r['file']}")
+
+    if baseline:
+        print(f"\nPar rapport a l'ANN 224x224 aplati ({baseline['params']:,} parametres) :")
+        for r in results:
+            if r is not baseline:
+                print(f"  {r['input']:<14} {r['params'] / baseline['params'] * 100:6.2f}% des parametres, "
+                      f"latence p50 x{r['latency_ms']['p50'] / baseline['latency_ms']['p50']:.2f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nRapport : {args.output}")
+
+if __name__ == "__main__":
+    main()
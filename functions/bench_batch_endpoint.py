@@ -0,0 +1,68 @@
+import argparse
+import io
+import json
+import time
+import zipfile
+
+from bench_utils import (
+    encode_multipart, free_port, post_image, read_images, request, start_server, stop_server
+)
+
+def build_zip(images):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED) as archive:
+        for path, _, data in images:
+            archive.writestr(f"{len(archive.namelist())}_{path}", data)
+    return buf.getvalue()
+
+def post_batch(port, files):
+    body, content_type = encode_multipart(files, field="files")
+    status, _, payload = request(
+        "POST", port, "/predict/batch", body, {"Content-Type": content_type}, timeout=600
+    )
+    lines = [json.loads(line) for line in payload.splitlines() if line.strip()]
+    return status, lines
+
+def main():
+    """Compare une boucle sur /predict a un seul appel /predict/batch"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--split', default='data/validation')
+    parser.add_argument('--repeat', type=int, default=4, help="copies du split envoyees")
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BENCHMARK /predict/batch")
+    print("="*70)
+
+    images = read_images(args.split) * args.repeat
+    port = free_port()
+    # Sans cache, sinon les copies repetees de /predict seraient gratuites
+    server = start_server(port, env={"CACHE_ENABLED": "0"})
+
+    try:
+        post_image(port, "/predict", images[0][0], images[0][2])
+
+        start = time.perf_counter()
+        for path, _, data in images:
+            post_image(port, "/predict", path, data)
+        loop_rate = len(images) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        status, lines = post_batch(port, [(path, data) for path, _, data in images])
+        files_rate = len(lines) / (time.perf_counter() - start)
+
+        archive = build_zip(images)
+        start = time.perf_counter()
+        _, zip_lines = post_batch(port, [("images.zip", archive)])
+        zip_rate = len(zip_lines) / (time.perf_counter() - start)
+    finally:
+        stop_server(server)
+
+    errors = sum(1 for line in lines if "error" in line["prediction"])
+    print(f"\n{len(images)} images ({args.split} x{args.repeat})")
+    print(f"Boucle /predict         : {loop_rate:8.1f} images/s")
+    print(f"/predict/batch fichiers : {files_rate:8.1f} images/s (HTTP {status}, {errors} erreurs)")
+    print(f"/predict/batch zip      : {zip_rate:8.1f} images/s ({len(zip_lines)} lignes)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from batcher import MicroBatcher
+from bench_utils import read_images
+from model_inputs import FULL_SPEC, build_inputs, input_spec
+
+def load_images(split='data/test', spec=FULL_SPEC):
+    """Pretraite toutes les images d'un split pour l'entree `spec`"""
+    return [build_inputs(data, [spec])[spec] for _, _, data in read_images(split)]
+
+def run_load(predict_fn, images, concurrency, requests_per_client):
+    """Lance `concurrency` clients qui enchainent les predictions"""
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset):
+        local = []
+        for i in range(requests_per_client):
+            x = images[(offset + i) % len(images)]
+            start = time.perf_counter()
+            predict_fn(x)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "p50": float(np.percentile(latencies, 50)),
+        "p99": float(np.percentile(latencies, 99)),
+        "images_per_sec": len(latencies) / elapsed
+    }
+
+def print_result(label, result):
+    print(f"{label:<12} p50 {result['p50']:8.2f} ms | p99 {result['p99']:8.2f} ms | "
+          f"{result['images_per_sec']:8.1f} images/s")
+
+def main():
+    """Compare le chemin une requete = un predict() au micro-batching"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='models/cnn_model.h5')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=50, help="requetes par client")
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BENCHMARK MICRO-BATCHING")
+    print("="*70)
+
+    model = tf.keras.models.load_model(args.model)
+    images = load_images(spec=input_spec(model.input_shape))
+    print(f"{len(images)} images de test, modele {args.model}")
+
+    # Echauffement : trace les fonctions de prediction
+    model.predict(images[0], verbose=0)
+    model.predict_on_batch(np.concatenate(images[:2]))
+
+    for concurrency in args.concurrency:
+        print(f"\n{concurrency} clients concurrents")
+        print("-"*70)
+
+        direct = run_load(lambda x: model.predict(x, verbose=0), images,
+                          concurrency, args.requests)
+        print_result("Direct", direct)
+
+        batcher = MicroBatcher(model, "bench", args.max_batch_size, args.max_wait_ms)
+        batched = run_load(batcher.predict, images, concurrency, args.requests)
+        stats = batcher.stats()
+        batcher.close()
+        print_result("Batching", batched)
+        print(f"{'':<12} taille moyenne des lots {stats['mean_batch_size']:.1f} | "
+              f"attente p99 {stats['queue_delay_ms']['p99']:.2f} ms")
+        print(f"{'':<12} distribution {stats['batch_size_distribution']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import json
+import time
+
+from bench_utils import free_port, post_image, read_images, request, start_server, stop_server
+
+def wait_for(check, timeout=300, interval=0.05):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if check():
+            return True
+        time.sleep(interval)
+    return False
+
+def cold_start(mode, runtime, image):
+    """Temps jusqu'a /health, /ready et la premiere prediction par un vrai modele"""
+    port = free_port()
+    start = time.perf_counter()
+    server = start_server(port, env={"STARTUP_MODE": mode, "MODEL_RUNTIME": runtime,
+                                     "READY_TIMEOUT": "0"}, wait_path="/health")
+    timings = {"health_s": time.perf_counter() - start}
+
+    def model_prediction():
+        status, _, body = post_image(port, "/predict", image[0], image[2])
+        if status != 200:
+            return False
+        prediction = json.loads(body).get("prediction", {})
+        return "error" not in prediction and "fallback" not in prediction.get("model", "")
+
+    try:
+        wait_for(lambda: request("GET", port, "/ready")[0] == 200)
+        timings["ready_s"] = time.perf_counter() - start
+
+        wait_for(model_prediction)
+        timings["first_prediction_s"] = time.perf_counter() - start
+    finally:
+        stop_server(server)
+
+    return timings
+
+def main():
+    """Mesure le demarrage a froid jusqu'a la premiere prediction reussie"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modes', nargs='+', default=['blocking', 'background'])
+    parser.add_argument('--runtimes', nargs='+', default=['keras'])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BENCHMARK DU DEMARRAGE A FROID")
+    print("="*70)
+
+    image = read_images('data/test')[0]
+
+    print(f"\n{'Mode':<12} {'Runtime':<12} {'/health':>9} {'/ready':>9} {'1re prediction':>15}")
+    for runtime in args.runtimes:
+        for mode in args.modes:
+            runs = [cold_start(mode, runtime, image) for _ in range(args.runs)]
+            avg = {key: sum(r[key] for r in runs) / len(runs) for key in runs[0]}
+            print(f"{mode:<12} {runtime:<12} {avg['health_s']:8.2f}s {avg['ready_s']:8.2f}s "
+                  f"{avg['first_prediction_s']:14.2f}s")
+
+if __name__ == "__main__":
+    main()
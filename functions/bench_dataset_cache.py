@@ -0,0 +1,49 @@
+import argparse
+import time
+
+import train_models_complete as training
+
+def iterate_epoch(generator):
+    """Temps pour produire tous les lots d'une epoque (pipeline d'entree seul)"""
+    start = time.perf_counter()
+    for i in range(len(generator)):
+        generator[i]
+    generator.on_epoch_end()
+    return time.perf_counter() - start
+
+def fit_epoch(train_gen, val_gen):
+    """Temps d'une epoque d'entrainement du CNN"""
+    model = training.create_cnn_model()
+    start = time.perf_counter()
+    model.fit(train_gen, epochs=1, validation_data=val_gen, verbose=0)
+    return time.perf_counter() - start
+
+def main():
+    """Compare une epoque flow_from_directory et une epoque depuis le cache"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--fit', action='store_true', help="mesurer aussi model.fit")
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BENCHMARK DU CACHE DE DATASET")
+    print("="*70)
+
+    for use_cache in (False, True):
+        training.USE_DATASET_CACHE = use_cache
+        label = "Cache uint8" if use_cache else "flow_from_directory"
+
+        start = time.perf_counter()
+        train_gen, val_gen = training.load_data()
+        setup = time.perf_counter() - start
+
+        times = [iterate_epoch(train_gen) for _ in range(args.epochs)]
+        print(f"\n{label}")
+        print(f"  Preparation : {setup:.2f}s")
+        print(f"  Epoque (entree seule) : {sum(times) / len(times):.2f}s")
+
+        if args.fit:
+            print(f"  Epoque (fit CNN) : {fit_epoch(train_gen, val_gen):.2f}s")
+
+if __name__ == "__main__":
+    main()
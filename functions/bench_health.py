@@ -0,0 +1,78 @@
+import argparse
+import threading
+import time
+from collections import Counter
+
+from bench_utils import (
+    free_port, percentiles, post_image, read_images, request, start_server, stop_server
+)
+
+def probe_health(port, duration, interval=0.05):
+    """Mesure la latence de /health pendant `duration` secondes"""
+    latencies = []
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        start = time.perf_counter()
+        request("GET", port, "/health", timeout=30)
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(interval)
+    return latencies
+
+def saturate(port, images, stop, statuses, lock):
+    """Envoie des images a /predict en boucle jusqu'a `stop`"""
+    i = 0
+    while not stop.is_set():
+        path, _, data = images[i % len(images)]
+        try:
+            status, _, _ = post_image(port, "/predict", path, data, timeout=120)
+        except OSError:
+            status = "erreur"
+        with lock:
+            statuses[status] += 1
+        i += 1
+
+def main():
+    """Verifie que /health reste rapide pendant que /predict est sature"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--split', default='data/test')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("TEST DE CHARGE : /health PENDANT LA SATURATION DE /predict")
+    print("="*70)
+
+    images = read_images(args.split)
+    port = free_port()
+    server = start_server(port)
+
+    try:
+        idle = percentiles(probe_health(port, 5))
+
+        stop = threading.Event()
+        statuses = Counter()
+        lock = threading.Lock()
+        clients = [
+            threading.Thread(target=saturate, args=(port, images, stop, statuses, lock))
+            for _ in range(args.clients)
+        ]
+        for t in clients:
+            t.start()
+
+        time.sleep(1)
+        loaded = percentiles(probe_health(port, args.duration))
+
+        stop.set()
+        for t in clients:
+            t.join()
+    finally:
+        stop_server(server)
+
+    print(f"\n/health au repos   : p50 {idle['p50']:.2f} ms | p99 {idle['p99']:.2f} ms")
+    print(f"/health sous charge: p50 {loaded['p50']:.2f} ms | p99 {loaded['p99']:.2f} ms")
+    print(f"\nReponses /predict ({args.clients} clients) : {dict(statuses)}")
+    print(f"Requetes rejetees (503) : {statuses.get(503, 0)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import argparse
+
+import train_models_complete as training
+from tf_data_pipeline import profile_epoch
+
+def main():
+    """Temps d'entree vs temps de calcul par epoque : ImageDataGenerator vs tf.data"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--model', choices=['cnn', 'ann'], default='cnn')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BENCHMARK DU PIPELINE D'ENTREE")
+    print("="*70)
+
+    create = training.create_cnn_model if args.model == 'cnn' else training.create_ann_model
+
+    for pipeline in ('generator', 'tfdata'):
+        training.INPUT_PIPELINE = pipeline
+        train_data, _ = training.load_data()
+        model = create()
+
+        print(f"\n{pipeline}")
+        print(f"{'Epoque':>6} {'Entree':>9} {'Calcul':>9} {'Total':>9}  Limite par")
+        for epoch in range(args.epochs):
+            p = profile_epoch(model, train_data)
+            print(f"{epoch + 1:>6} {p['input_s']:8.2f}s {p['compute_s']:8.2f}s "
+                  f"{p['total_s']:8.2f}s  {p['bound']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import io
+import os
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from bench_utils import CLASSES, read_images
+from preprocessing import preprocess_image
+
+def preprocess_image_legacy(image_bytes, target_size=(224, 224)):
+    """Ancienne version : decodage pleine resolution puis redimensionnement"""
+    img = Image.open(io.BytesIO(image_bytes))
+    img = img.convert('RGB')
+    img = img.resize(target_size)
+
+    x = np.array(img, dtype=np.float32) / 255.0
+    x = np.expand_dims(x, axis=0)
+
+    return x
+
+def large_jpeg(image_bytes, size=(4000, 3000)):
+    """Re-encode une image en JPEG multi-megapixel (photo de telephone)"""
+    img = Image.open(io.BytesIO(image_bytes)).convert('RGB').resize(size)
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+def measure(fn, images, repeat):
+    """Temps moyen par image (ms) et pic memoire (Mo)"""
+    fn(images[0])
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in images:
+            fn(data)
+    elapsed = (time.perf_counter() - start) / (repeat * len(images))
+
+    tracemalloc.start()
+    for data in images:
+        fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed * 1000, peak / 1024 / 1024
+
+def check_predictions(images, model_path):
+    """Compare le top-1 des deux pretraitements sur data/test"""
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    changed = 0
+    for path, _, data in images:
+        old = np.argmax(model.predict(preprocess_image_legacy(data), verbose=0)[0])
+        new = np.argmax(model.predict(preprocess_image(data), verbose=0)[0])
+        if old != new:
+            changed += 1
+            print(f"  {path} : {CLASSES[old]} -> {CLASSES[new]}")
+    return changed
+
+def main():
+    """Compare decodage legacy et decodage draft + tampon prealloue"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--split', default='data/test')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--model', default='models/cnn_model.h5')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BENCHMARK DU PRETRAITEMENT")
+    print("="*70)
+
+    images = read_images(args.split)
+    raw = [data for _, _, data in images]
+    large = [large_jpeg(data) for data in raw[:10]]
+    buffer = np.empty((1, 224, 224, 3), dtype=np.float32)
+
+    datasets = [(f"{args.split} ({len(raw)} images)", raw), ("JPEG 4000x3000 (10 images)", large)]
+    variants = [
+        ("Legacy", preprocess_image_legacy),
+        ("Draft", preprocess_image),
+        ("Draft + tampon", lambda data: preprocess_image(data, out=buffer)),
+    ]
+
+    for label, data in datasets:
+        print(f"\n{label}")
+        print("-"*70)
+        for name, fn in variants:
+            ms, peak = measure(fn, data, args.repeat)
+            print(f"{name:<16} {ms:8.2f} ms/image | pic memoire {peak:7.2f} Mo")
+
+    diff = max(
+        float(np.abs(preprocess_image_legacy(data) - preprocess_image(data)).max())
+        for data in raw
+    )
+    print(f"\nEcart max des pixels (legacy vs draft) : {diff:.4f}")
+
+    if os.path.exists(args.model):
+        print(f"\nVerification du top-1 avec {args.model}...")
+        changed = check_predictions(images, args.model)
+        print(f"Predictions modifiees : {changed}/{len(images)}")
+    else:
+        print(f"\nModele non trouve ({args.model}), verification du top-1 ignoree")
+
+if __name__ == "__main__":
+    main()
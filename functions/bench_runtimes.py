@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from bench_utils import CLASSES, percentiles, read_images
+from model_inputs import FULL_SIZE, input_spec, pixels_to_input
+from preprocessing import decode_image
+from runtimes import TFLITE_VARIANTS, TFLiteModel, tflite_path_for
+
+def rss_mb():
+    """Pic de memoire residente du processus (Mo)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure_variant(h5_path, runtime, split):
+    """Charge une variante et mesure latence, memoire et precision"""
+    images = read_images(split)
+    # Decodage avant la mesure memoire, entree du modele construite apres chargement
+    pixels = [decode_image(data, FULL_SIZE)[None] for _, _, data in images]
+    baseline_rss = rss_mb()
+
+    start = time.perf_counter()
+    if runtime == "keras":
+        import tensorflow as tf
+        model = tf.keras.models.load_model(h5_path)
+        path = h5_path
+    else:
+        path = tflite_path_for(h5_path, runtime)
+        model = TFLiteModel(path)
+    load_time = time.perf_counter() - start
+
+    spec = input_spec(model.input_shape)
+    inputs = [pixels_to_input(p, spec) for p in pixels]
+    model.predict_on_batch(inputs[0])
+
+    latencies = []
+    correct = 0
+    for (_, cls, _), x in zip(images, inputs):
+        start = time.perf_counter()
+        probs = np.asarray(model.predict_on_batch(x))[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        correct += CLASSES[int(np.argmax(probs))] == cls
+
+    return {
+        "runtime": runtime,
+        "file": path,
+        "file_mb": os.path.getsize(path) / 1024 / 1024,
+        "load_s": load_time,
+        "latency_ms": percentiles(latencies),
+        "rss_mb": rss_mb(),
+        "rss_model_mb": rss_mb() - baseline_rss,
+        "accuracy": correct / len(images)
+    }
+
+def main():
+    """Compare Keras et les variantes TFLite (latence, RSS, precision sur data/test)"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='models/cnn_model.h5')
+    parser.add_argument('--split', default='data/test')
+    parser.add_argument('--runtime', help="usage interne : mesure une seule variante")
+    args = parser.parse_args()
+
+    if args.runtime:
+        print(json.dumps(measure_variant(args.model, args.runtime, args.split)))
+        return
+
+    print("="*70)
+    print(f"BENCHMARK DES RUNTIMES : {args.model}")
+    print("="*70)
+
+    results = []
+    for runtime in ["keras", *TFLITE_VARIANTS]:
+        if runtime != "keras" and not os.path.exists(tflite_path_for(args.model, runtime)):
+            print(f"{runtime} : fichier absent (python export_tflite.py)")
+            continue
+        # Un processus par variante pour que le RSS soit mesure isolement
+        output = subprocess.run(
+            [sys.executable, __file__, '--model', args.model, '--split', args.split,
+             '--runtime', runtime],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    keras_acc = results[0]["accuracy"] if results and results[0]["runtime"] == "keras" else None
+
+    print(f"\n{'Runtime':<12} {'Fichier':>9} {'Chargement':>11} {'p50':>8} {'p99':>8} "
+          f"{'RSS':>9} {'Precision':>10} {'Delta':>8}")
+    for r in results:
+        delta = f"{(r['accuracy'] - keras_acc) * 100:+.2f}" if keras_acc is not None else "-"
+        print(f"{r['runtime']:<12} {r['file_mb']:7.2f}Mo {r['load_s']:10.2f}s "
+              f"{r['latency_ms']['p50']:6.2f}ms {r['latency_ms']['p99']:6.2f}ms "
+              f"{r['rss_mb']:7.1f}Mo {r['accuracy'] * 100:9.2f}% {delta:>8}")
+
+if __name__ == "__main__":
+    main()
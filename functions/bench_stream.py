@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+
+import numpy as np
+import websockets
+from PIL import Image
+
+from bench_utils import ResourceSampler, free_port, percentiles, read_images, start_server, stop_server
+
+def camera_frames(images, size, frame_format, quality=80, count=60):
+    """Frames de previsualisation camera : images du split reduites a `size`, JPEG ou RGB brut"""
+    frames = []
+    for _, _, data in images[:count]:
+        img = Image.open(io.BytesIO(data)).convert('RGB').resize(size)
+        if frame_format == "rgb":
+            frames.append(np.asarray(img).tobytes())
+        else:
+            buf = io.BytesIO()
+            img.save(buf, format='JPEG', quality=quality)
+            frames.append(buf.getvalue())
+    return frames
+
+async def run_session(url, config, frames, fps, duration, offset):
+    """Un client : envoie `fps` frames/s pendant `duration` s, mesure la latence de bout en bout"""
+    sent = {}
+    latencies = []
+    server_latencies = []
+    errors = 0
+    last = {"frame": -1}
+
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps(config))
+        ack = json.loads(await ws.recv())
+        if "config" not in ack:
+            raise RuntimeError(f"Configuration refusee : {ack}")
+
+        async def receiver():
+            nonlocal errors
+            async for message in ws:
+                now = time.perf_counter()
+                data = json.loads(message)
+                if "prediction" in data:
+                    latencies.append((now - sent[data["frame"]]) * 1000)
+                    server_latencies.append(data["latency_ms"])
+                    last["frame"] = data["frame"]
+                elif "frame" in data:
+                    errors += 1
+
+        reader = asyncio.create_task(receiver())
+        # Clients decales : pas tous les frames au meme instant
+        await asyncio.sleep(offset)
+        start = time.perf_counter()
+        interval = 1 / fps if fps else 0
+        index = 0
+        while time.perf_counter() - start < duration:
+            sent[index] = time.perf_counter()
+            await ws.send(frames[index % len(frames)])
+            index += 1
+            await asyncio.sleep(max(0.0, start + index * interval - time.perf_counter()))
+        elapsed = time.perf_counter() - start
+
+        # Laisse arriver la reponse au dernier frame classe
+        deadline = time.perf_counter() + 5
+        while last["frame"] < index - 1 and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        await ws.close()
+        await reader
+
+    return {
+        "sent": index,
+        "classified": len(latencies),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "latencies": latencies,
+        "server_latencies": server_latencies
+    }
+
+async def run_sessions(url, config, frames, sessions, fps, duration):
+    interval = 1 / fps if fps else 0
+    return await asyncio.gather(*(
+        run_session(url, config, frames, fps, duration, interval * i / sessions)
+        for i in range(sessions)
+    ))
+
+def summarize(results, duration):
+    """Debit soutenu (frames classes/s par session et au total), latences, part abandonnee"""
+    sent = sum(r["sent"] for r in results)
+    classified = sum(r["classified"] for r in results)
+    per_session = [r["classified"] / r["elapsed_s"] for r in results]
+    return {
+        "sessions": len(results),
+        "frames_sent": sent,
+        "frames_classified": classified,
+        "errors": sum(r["errors"] for r in results),
+        "dropped_pct": (1 - classified / sent) * 100 if sent else 0.0,
+        "fps_per_session": float(np.mean(per_session)),
+        "fps_per_session_min": float(np.min(per_session)),
+        "fps_total": classified / duration,
+        "latency_ms": percentiles([v for r in results for v in r["latencies"]]),
+        "server_latency_ms": percentiles([v for r in results for v in r["server_latencies"]])
+    }
+
+def main():
+    """Debit et latence de /stream (WebSocket) pour N sessions camera simultanees"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--split', default='data/test')
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 16, 32])
+    parser.add_argument('--formats', nargs='+', default=['image', 'rgb'], help="image (JPEG) ou rgb (brut)")
+    parser.add_argument('--width', type=int, default=320)
+    parser.add_argument('--height', type=int, default=240)
+    parser.add_argument('--fps', type=float, default=15, help="frames envoyes par seconde et par session")
+    parser.add_argument('--duration', type=float, default=10, help="secondes par scenario")
+    parser.add_argument('--model', default='auto', help="auto, cnn, student, ann...")
+    parser.add_argument('--smoothing-ms', type=float, default=300)
+    parser.add_argument('--env', nargs='*', default=[],
+                        help="variables du serveur, ex. MODEL_RUNTIME=tflite BATCH_MAX_WAIT_MS=2")
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BENCHMARK DU FLUX CAMERA (WEBSOCKET /stream)")
+    print("="*70)
+
+    images = read_images(args.split)
+    if not images:
+        print(f"Aucune image trouvee dans {args.split}")
+        return
+    size = (args.width, args.height)
+    frames = {frame_format: camera_frames(images, size, frame_format) for frame_format in args.formats}
+    for frame_format, items in frames.items():
+        print(f"{frame_format:<6} {len(items)} frames {args.width}x{args.height}, "
+              f"{np.mean([len(f) for f in items]) / 1024:7.1f} Ko en moyenne")
+
+    env = dict(item.split('=', 1) for item in args.env)
+    env.setdefault("STREAM_MAX_SESSIONS", str(max(args.sessions)))
+    port = free_port()
+    server = start_server(port, env=env)
+    url = f"ws://127.0.0.1:{port}/stream"
+
+    results = {}
+    try:
+        for frame_format, items in frames.items():
+            config = {"format": frame_format, "model": args.model, "smoothing_ms": args.smoothing_ms}
+            if frame_format == "rgb":
+                config.update(width=args.width, height=args.height)
+            # Echauffement : graphes traces, premiers lots
+            asyncio.run(run_sessions(url, config, items, 2, args.fps, 2))
+
+            for sessions in args.sessions:
+                with ResourceSampler(server.pid) as sampler:
+                    raw = asyncio.run(run_sessions(url, config, items, sessions, args.fps, args.duration))
+                result = {**summarize(raw, args.duration), **sampler.stats()}
+                results[f"{frame_format} x{sessions}"] = result
+                latency = result["latency_ms"]
+                print(f"{frame_format:<6} {sessions:4d} sessions : {result['fps_per_session']:6.1f} fps/session "
+                      f"({result['fps_total']:7.1f} au total) | bout en bout p50 {latency['p50']:7.1f} "
+                      f"p95 {latency['p95']:7.1f} p99 {latency['p99']:7.1f} ms | "
+                      f"abandonnes {result['dropped_pct']:5.1f}% | CPU {result['cpu_cores']:4.1f}")
+    finally:
+        stop_server(server)
+
+    print(f"\n{'Scenario':<14} {'fps/session':>12} {'fps total':>10} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'serveur p50':>12} {'abandon':>8}")
+    for name, result in results.items():
+        print(f"{name:<14} {result['fps_per_session']:12.1f} {result['fps_total']:10.1f} "
+              f"{result['latency_ms']['p50']:9.1f} {result['latency_ms']['p95']:9.1f} "
+              f"{result['server_latency_ms']['p50']:12.1f} {result['dropped_pct']:7.1f}%")
+
+    output = args.output or os.path.join('reports', f"stream_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({"args": vars(args), "results": results}, f, indent=2)
+    print(f"\nRapport : {output}")
+
+if __name__ == "__main__":
+    main()
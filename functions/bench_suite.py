@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from bench_preprocess import large_jpeg
+from bench_utils import (
+    ResourceSampler, encode_multipart, free_port, percentiles, read_images, request,
+    start_server, stop_server
+)
+
+REPORTS_DIR = 'reports'
+SPLITS = ['data/test', 'data/validation']
+MODEL_FILES = ['models/cnn_model.h5', 'models/student_model.h5', 'models/ann_model.h5']
+FORWARD_BATCH_SIZES = [1, 8, 32]
+
+def parse_mix(text):
+    """'original:0.8,large:0.2' -> {'original': 0.8, 'large': 0.2}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition(':')
+        mix[name] = float(weight or 1)
+    return mix
+
+def mix_name(mix):
+    return ",".join(f"{name}:{weight:g}" for name, weight in mix.items())
+
+def build_pools(images, large_count):
+    """Images par classe de taille : originales, et re-encodees en 4000x3000"""
+    pools = {"original": [(path, data) for path, _, data in images]}
+    if large_count:
+        step = max(1, len(images) // large_count)
+        pools["large"] = [
+            (path, large_jpeg(data)) for path, _, data in images[::step][:large_count]
+        ]
+    return pools
+
+def build_schedule(pools, mix, count, seed):
+    """Suite deterministe de `count` requetes tirees selon le melange de tailles"""
+    rng = random.Random(seed)
+    names = [name for name in mix if name in pools]
+    weights = [mix[name] for name in names]
+    return [rng.choice(pools[rng.choices(names, weights)[0]]) for _ in range(count)]
+
+def run_scenario(port, pid, endpoint, schedule, concurrency):
+    """Rejoue la suite de requetes avec `concurrency` clients en boucle fermee"""
+    # Corps multipart encodes a l'avance : le client ne doit pas etre le goulot
+    field = "files" if endpoint == "/predict/batch" else "file"
+    bodies = [encode_multipart([(os.path.basename(path), data)], field=field) for path, data in schedule]
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    position = iter(range(len(bodies)))
+
+    def client():
+        local, local_statuses = [], Counter()
+        while True:
+            with lock:
+                index = next(position, None)
+            if index is None:
+                break
+            body, content_type = bodies[index]
+            start = time.perf_counter()
+            try:
+                status, _, _ = request("POST", port, endpoint, body,
+                                       {"Content-Type": content_type}, timeout=300)
+            except OSError:
+                status = "connexion"
+            local_statuses[status] += 1
+            if status == 200:
+                local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    with ResourceSampler(pid) as sampler:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(bodies),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "errors": sum(v for k, v in statuses.items() if k != 200),
+        "duration_s": round(elapsed, 2),
+        "throughput_rps": len(latencies) / elapsed,
+        "upload_mb": sum(len(body) for body, _ in bodies) / 1024 / 1024,
+        "latency_ms": percentiles(latencies),
+        **sampler.stats()
+    }
+
+def time_calls(fn, repeat, warmup=2):
+    """Latences (ms) de `repeat` appels de fn, apres `warmup` appels non mesures"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return percentiles(times)
+
+def run_microbenchmarks(pools, repeat):
+    """Decodage, pretraitement et passe avant (une image vs lot) dans le processus"""
+    from preprocessing import decode_image, preprocess_image
+    from model_inputs import build_inputs, input_spec, spec_name
+    from runtimes import load_any_model
+
+    results = {}
+    for pool, items in pools.items():
+        data = [d for _, d in items]
+        cycle = iter(data * (repeat + 2))
+        results[f"decode/{pool}"] = time_calls(lambda: decode_image(next(cycle)), repeat)
+        cycle = iter(data * (repeat + 2))
+        results[f"preprocess/{pool}"] = time_calls(lambda: preprocess_image(next(cycle)), repeat)
+
+    sample = pools["original"][0][1]
+    for path in MODEL_FILES:
+        if not os.path.exists(path):
+            print(f"Modele non trouve : {path}")
+            continue
+        model = load_any_model(path)
+        spec = input_spec(model.input_shape)
+        name = os.path.splitext(os.path.basename(path))[0]
+        results[f"inputs/{name} ({spec_name(spec)})"] = time_calls(
+            lambda: build_inputs(sample, [spec]), repeat
+        )
+        x = build_inputs(sample, [spec])[spec]
+        for batch_size in FORWARD_BATCH_SIZES:
+            batch = np.repeat(x, batch_size, axis=0)
+            timing = time_calls(lambda: model.predict_on_batch(batch), repeat)
+            # Par image, pour comparer directement une image seule et un lot
+            results[f"forward/{name}/batch{batch_size}"] = {
+                key: value / batch_size for key, value in timing.items()
+            }
+    return results
+
+def headline_metrics(report):
+    """Metriques suivies d'un run a l'autre : {cle: (valeur, plus_grand_est_mieux)}"""
+    metrics = {}
+    for name, result in report.get("load", {}).items():
+        metrics[f"load/{name}/throughput_rps"] = (result["throughput_rps"], True)
+        metrics[f"load/{name}/p50_ms"] = (result["latency_ms"]["p50"], False)
+        metrics[f"load/{name}/p95_ms"] = (result["latency_ms"]["p95"], False)
+        metrics[f"load/{name}/p99_ms"] = (result["latency_ms"]["p99"], False)
+        metrics[f"load/{name}/rss_peak_mb"] = (result["rss_peak_mb"], False)
+    for name, timing in report.get("micro", {}).items():
+        metrics[f"micro/{name}/p50_ms"] = (timing["p50"], False)
+    return metrics
+
+def compare(report, baseline, threshold):
+    """Ecarts par rapport a un run de reference ; retourne les regressions"""
+    current = headline_metrics(report)
+    previous = headline_metrics(baseline)
+    regressions = []
+
+    print(f"\n{'Metrique':<60} {'Reference':>10} {'Actuel':>10} {'Ecart':>8}")
+    print("-"*92)
+    for key in sorted(set(current) & set(previous)):
+        value, higher_is_better = current[key]
+        before = previous[key][0]
+        if not before:
+            continue
+        change = (value - before) / before
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > threshold:
+            flag = "  REGRESSION"
+            regressions.append({"metric": key, "baseline": before, "current": value,
+                                "change": change})
+        print(f"{key:<60} {before:10.2f} {value:10.2f} {change * 100:+7.1f}%{flag}")
+    return regressions
+
+def environment(args):
+    """Contexte du run, pour savoir ce qui est compare"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": vars(args)
+    }
+
+def server_runtime(port):
+    """Runtime demande et runtime reellement servi pour chaque modele (/models/info)"""
+    status, _, body = request("GET", port, "/models/info")
+    if status != 200:
+        return None
+    info = json.loads(body)
+    return {
+        "requested": info.get("runtime"),
+        "models": {name: model["runtime"] for name, model in info.items()
+                   if isinstance(model, dict) and model.get("loaded")}
+    }
+
+def main():
+    """Suite de benchmarks reproductible : charge HTTP sur app.py et microbenchmarks"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--splits', nargs='+', default=SPLITS)
+    parser.add_argument('--endpoints', nargs='+', default=['/predict'],
+                        help="/predict, /predict/cnn, /predict/ann, /predict/student, /predict/color, /compare, /predict/batch")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--mixes', nargs='+', default=['original', 'original:0.9,large:0.1'],
+                        help="melanges de tailles de requete (original, large)")
+    parser.add_argument('--requests', type=int, default=400, help="requetes par scenario")
+    parser.add_argument('--large-count', type=int, default=20,
+                        help="images re-encodees en 4000x3000 (0 : aucune)")
+    parser.add_argument('--repeat', type=int, default=50, help="repetitions des microbenchmarks")
+    parser.add_argument('--env', nargs='*', default=[],
+                        help="variables du serveur, ex. MODEL_RUNTIME=tflite-fp16 BATCHING_ENABLED=0")
+    parser.add_argument('--script', help="lancer via serve.py (plusieurs workers) au lieu d'uvicorn")
+    parser.add_argument('--server-args', nargs='*', default=[])
+    parser.add_argument('--cache', action='store_true',
+                        help="laisser le cache de predictions (desactive par defaut)")
+    parser.add_argument('--no-load', action='store_true')
+    parser.add_argument('--no-micro', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    parser.add_argument('--baseline', help="rapport JSON de reference")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="degradation relative toleree avant echec (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    print("="*70)
+    print("SUITE DE BENCHMARKS DU SERVICE DE CLASSIFICATION")
+    print("="*70)
+
+    images = [image for split in args.splits for image in read_images(split)]
+    if not images:
+        print("Aucune image trouvee dans", ", ".join(args.splits))
+        sys.exit(1)
+    pools = build_pools(images, args.large_count)
+    for name, items in pools.items():
+        size = np.mean([len(d) for _, d in items]) / 1024
+        print(f"{name:<10} {len(items):5d} images, {size:8.1f} Ko en moyenne")
+
+    report = {"environment": environment(args)}
+
+    if not args.no_load:
+        env = dict(item.split('=', 1) for item in args.env)
+        if not args.cache:
+            # Sans cache, sinon les images rejouees seraient gratuites
+            env.setdefault("CACHE_ENABLED", "0")
+        port = free_port()
+        server = start_server(port, env=env, script=args.script, args=args.server_args)
+        report["load"] = {}
+        try:
+            # Ce que le serveur sert vraiment, pas seulement les variables passees
+            runtime = report["environment"]["server_runtime"] = server_runtime(port)
+            if runtime:
+                print("Runtime servi : " + ", ".join(
+                    f"{name} {value}" for name, value in runtime["models"].items()
+                ))
+            for endpoint in args.endpoints:
+                for text in args.mixes:
+                    mix = parse_mix(text)
+                    schedule = build_schedule(pools, mix, args.requests, args.seed)
+                    # Echauffement : graphes traces et caches du systeme de fichiers
+                    run_scenario(port, server.pid, endpoint, schedule[:20], 4)
+                    for concurrency in args.concurrency:
+                        name = f"{endpoint} c{concurrency} {mix_name(mix)}"
+                        result = run_scenario(port, server.pid, endpoint, schedule, concurrency)
+                        report["load"][name] = result
+                        latency = result["latency_ms"]
+                        print(f"{name:<45} {result['throughput_rps']:8.1f} req/s "
+                              f"p50 {latency['p50']:7.1f} p95 {latency['p95']:7.1f} "
+                              f"p99 {latency['p99']:7.1f} ms | CPU {result['cpu_cores']:4.1f} "
+                              f"| RSS {result['rss_peak_mb']:7.1f} Mo | {result['errors']} erreurs")
+        finally:
+            stop_server(server)
+
+    if not args.no_micro:
+        report["micro"] = run_microbenchmarks(pools, args.repeat)
+        print(f"\n{'Microbenchmark':<45} {'p50':>9} {'p95':>9}  (ms, par image)")
+        for name, timing in report["micro"].items():
+            print(f"{name:<45} {timing['p50']:9.3f} {timing['p95']:9.3f}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        report["baseline"] = {"file": args.baseline, "threshold": args.threshold,
+                              "regressions": regressions}
+
+    output = args.output or os.path.join(
+        REPORTS_DIR, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nRapport : {output}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) au-dela de {args.threshold * 100:.0f}%")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import io
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+from PIL import Image
+
+from bench_utils import ResourceSampler, free_port, post_image, start_server, stop_server
+
+# Serveur sans aucune limite, pour comparaison
+NO_LIMITS = {"MAX_UPLOAD_MB": "0", "MAX_BATCH_UPLOAD_MB": "0", "MAX_IMAGE_MPX": "0"}
+
+def large_jpeg(width, height):
+    """Photo valide de grande taille (bruit : peu compressible)"""
+    pixels = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format='JPEG', quality=95)
+    return buf.getvalue()
+
+def png_bomb(side):
+    """PNG noir side x side : quelques centaines de Ko, des Go une fois decode"""
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    compressor = zlib.compressobj(9)
+    row = b"\0" * (side * 3 + 1)
+    idat = b"".join(compressor.compress(row) for _ in range(side)) + compressor.flush()
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", side, side, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", idat) + chunk(b"IEND", b""))
+
+def flood(port, payload, clients, requests_per_client, pid):
+    """`clients` clients envoient le meme payload en boucle ; statuts, duree, pic de RSS"""
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(requests_per_client):
+            try:
+                status, _, _ = post_image(port, "/predict", "upload.jpg", payload, timeout=300)
+            except OSError:
+                status = "connexion coupee"
+            with lock:
+                statuses[status] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    with ResourceSampler(pid) as sampler:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "duration_s": round(elapsed, 2),
+        "rss_before_mb": round(sampler.rss_start_mb, 1),
+        "rss_peak_mb": round(sampler.rss_peak_mb, 1),
+        "rss_growth_mb": round(sampler.rss_peak_mb - sampler.rss_start_mb, 1)
+    }
+
+def main():
+    """Pic de RSS du serveur sous un flot de gros uploads, avec et sans limites"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=4, help="requetes par client")
+    parser.add_argument('--body-mb', type=int, default=64, help="taille du corps trop gros")
+    parser.add_argument('--bomb-side', type=int, default=20000, help="cote de la bombe PNG")
+    parser.add_argument('--no-baseline', action='store_true', help="sans le serveur sans limites")
+    parser.add_argument('--output', help="rapport JSON")
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BENCHMARK DES UPLOADS : PIC DE RSS SOUS UN FLOT DE GROS FICHIERS")
+    print("="*70)
+
+    payloads = {
+        "jpeg 6000x4000": large_jpeg(6000, 4000),
+        f"bombe png {args.bomb_side}x{args.bomb_side}": png_bomb(args.bomb_side),
+        f"corps {args.body_mb} Mo": b"\xff\xd8\xff" + os.urandom(args.body_mb * 1024 * 1024),
+        "pas une image": os.urandom(4 * 1024 * 1024),
+    }
+    for name, payload in payloads.items():
+        print(f"{name:<24} {len(payload) / 1024 / 1024:8.2f} Mo")
+
+    configs = {"limites": {}}
+    if not args.no_baseline:
+        configs["sans limites"] = NO_LIMITS
+
+    results = {}
+    for config, env in configs.items():
+        port = free_port()
+        # Sans cache : chaque requete doit etre traitee
+        server = start_server(port, env={"CACHE_ENABLED": "0", **env})
+        try:
+            for name, payload in payloads.items():
+                result = flood(port, payload, args.clients, args.requests, server.pid)
+                results.setdefault(config, {})[name] = result
+                print(f"[{config}] {name:<24} pic {result['rss_peak_mb']:8.1f} Mo "
+                      f"(+{result['rss_growth_mb']:.1f}) en {result['duration_s']:6.2f}s "
+                      f"{result['statuses']}")
+        finally:
+            stop_server(server)
+
+    print(f"\n{'Payload':<24} " + " ".join(f"{c + ' (Mo)':>20}" for c in configs))
+    for name in payloads:
+        print(f"{name:<24} " + " ".join(
+            f"{results[c][name]['rss_peak_mb']:20.1f}" for c in configs
+        ))
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({"clients": args.clients, "requests": args.requests, "results": results},
+                      f, indent=2)
+        print(f"\nRapport : {args.output}")
+
+if __name__ == "__main__":
+    main()
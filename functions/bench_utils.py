@@ -0,0 +1,209 @@
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import numpy as np
+
+CLASSES = ['apple', 'banana', 'carrot', 'orange', 'tomato']
+
+def list_images(split='data/test'):
+    """Liste (chemin, classe) des images d'un split"""
+    images = []
+    for cls in CLASSES:
+        folder = os.path.join(split, cls)
+        if not os.path.exists(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            images.append((os.path.join(folder, name), cls))
+    return images
+
+def read_images(split='data/test'):
+    """Charge les octets bruts des images d'un split"""
+    result = []
+    for path, cls in list_images(split):
+        with open(path, 'rb') as f:
+            result.append((path, cls, f.read()))
+    return result
+
+def percentiles(values_ms):
+    """p50/p95/p99 d'une liste de latences en millisecondes"""
+    values = np.asarray(values_ms, dtype=np.float64)
+    if not len(values):
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "mean": float(values.mean()),
+        "max": float(values.max())
+    }
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port, env=None, wait_path="/ready", timeout=300, args=None, script=None):
+    """Lance app.py (sous uvicorn, ou via `script`) dans un sous-processus et attend qu'il reponde"""
+    server_env = dict(os.environ)
+    server_env.update(env or {})
+    if script:
+        cmd = [sys.executable, script, "--host", "127.0.0.1", "--port", str(port)]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "app:app",
+               "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd + list(args or []), env=server_env)
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Le serveur s'est arrete au demarrage")
+        try:
+            status, _, _ = request("GET", port, wait_path, timeout=1)
+            if status == 200:
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.1)
+
+    proc.terminate()
+    raise RuntimeError("Le serveur n'a pas demarre a temps")
+
+def process_memory(pid):
+    """RSS et PSS (memoire partagee repartie entre processus) en Mo, via /proc"""
+    memory = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss", "Shared_Clean", "Private_Dirty"):
+                memory[key.lower()] = int(value.split()[0]) / 1024
+    return memory
+
+def process_cpu_seconds(pid):
+    """Temps CPU (utilisateur + systeme) consomme par un processus, en secondes"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+class ResourceSampler:
+    """Pic de RSS et CPU consomme par un processus et ses enfants pendant un bloc with
+
+    Le RSS est releve toutes les `interval` secondes (somme du processus et de
+    ses workers) ; le CPU est la difference de temps CPU entre l'entree et la
+    sortie, divisee par la duree (en coeurs).
+    """
+
+    def __init__(self, pid, interval=0.02):
+        self.pid = pid
+        self.interval = interval
+        self.rss_start_mb = 0.0
+        self.rss_peak_mb = 0.0
+        self.cpu_s = 0.0
+        self.cpu_cores = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _pids(self):
+        return [self.pid] + child_pids(self.pid)
+
+    def _rss(self):
+        total = 0.0
+        for pid in self._pids():
+            try:
+                total += process_memory(pid)["rss"]
+            except OSError:
+                pass
+        return total
+
+    def _cpu(self):
+        total = 0.0
+        for pid in self._pids():
+            try:
+                total += process_cpu_seconds(pid)
+            except OSError:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.rss_peak_mb = max(self.rss_peak_mb, self._rss())
+
+    def __enter__(self):
+        self.rss_start_mb = self.rss_peak_mb = self._rss()
+        self._cpu_start = self._cpu()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        elapsed = time.perf_counter() - self._started
+        self.cpu_s = self._cpu() - self._cpu_start
+        self.cpu_cores = self.cpu_s / elapsed if elapsed else 0.0
+        self.rss_peak_mb = max(self.rss_peak_mb, self._rss())
+
+    def stats(self):
+        return {
+            "rss_start_mb": round(self.rss_start_mb, 1),
+            "rss_peak_mb": round(self.rss_peak_mb, 1),
+            "cpu_s": round(self.cpu_s, 2),
+            "cpu_cores": round(self.cpu_cores, 2)
+        }
+
+def child_pids(pid):
+    """PIDs des processus enfants directs"""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+def encode_multipart(files, field="file"):
+    """Encode une liste de (nom, octets) en multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, data in files:
+        parts.append(
+            f"--{boundary}\r\n"
+            f"Content-Disposition: form-data; name=\"{field}\"; filename=\"{os.path.basename(name)}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n".encode()
+        )
+        parts.append(data)
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+def request(method, port, path, body=None, headers=None, timeout=60):
+    """Requete HTTP simple, retourne (status, en-tetes, corps)"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+def post_image(port, path, name, data, timeout=60):
+    body, content_type = encode_multipart([(name, data)])
+    return request("POST", port, path, body, {"Content-Type": content_type}, timeout)
@@ -0,0 +1,87 @@
+import argparse
+import json
+import threading
+import time
+
+from bench_utils import (
+    child_pids, free_port, percentiles, post_image, process_memory, read_images,
+    request, start_server, stop_server
+)
+
+def wait_all_ready(port, workers, timeout=300):
+    """Attend que chaque worker ait repondu 200 sur /ready"""
+    ready = set()
+    deadline = time.time() + timeout
+    while len(ready) < workers and time.time() < deadline:
+        status, _, body = request("GET", port, "/ready")
+        if status == 200:
+            ready.add(json.loads(body)["pid"])
+        else:
+            time.sleep(0.2)
+
+def run_load(port, images, clients, duration):
+    """Clients concurrents sur /predict pendant `duration` secondes"""
+    latencies = []
+    lock = threading.Lock()
+    stop = time.time() + duration
+
+    def client(offset):
+        local = []
+        i = offset
+        while time.time() < stop:
+            path, _, data = images[i % len(images)]
+            start = time.perf_counter()
+            status, _, _ = post_image(port, "/predict", path, data)
+            if status == 200:
+                local.append((time.perf_counter() - start) * 1000)
+            i += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return len(latencies) / duration, percentiles(latencies)
+
+def main():
+    """Debit et memoire par worker en fonction du nombre de workers"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--runtime', default='keras')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0)
+    args = parser.parse_args()
+
+    print("="*70)
+    print(f"BENCHMARK MULTI-WORKERS ({args.runtime}, {args.threads} thread(s)/worker)")
+    print("="*70)
+
+    images = read_images('data/validation')
+    print(f"\n{'Workers':>7} {'images/s':>10} {'p50':>9} {'p99':>9} {'RSS/worker':>11} {'PSS/worker':>11}")
+
+    for workers in args.workers:
+        port = free_port()
+        server = start_server(
+            port, script="serve.py", env={"CACHE_ENABLED": "0"},
+            args=["--workers", str(workers), "--threads", str(args.threads),
+                  "--runtime", args.runtime]
+        )
+        try:
+            wait_all_ready(port, workers)
+            run_load(port, images, args.clients, 3)
+            throughput, latency = run_load(port, images, args.clients, args.duration)
+            memory = [process_memory(pid) for pid in child_pids(server.pid)]
+        finally:
+            stop_server(server)
+
+        rss = sum(m["rss"] for m in memory) / max(len(memory), 1)
+        pss = sum(m["pss"] for m in memory) / max(len(memory), 1)
+        print(f"{workers:>7} {throughput:10.1f} {latency['p50']:7.1f}ms {latency['p99']:7.1f}ms "
+              f"{rss:9.1f}Mo {pss:9.1f}Mo")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+def content_hash(image_bytes):
+    """Hash rapide des octets envoyes"""
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+def perceptual_hash(x, hash_size=8):
+    """dHash calcule sur l'image deja decodee et reduite
+
+    Deux re-encodages quasi identiques d'une meme photo donnent le meme
+    dHash, donc la meme entree de cache.
+    """
+    pixels = np.asarray(x)
+    if pixels.ndim == 4:
+        pixels = pixels[0]
+    if pixels.dtype != np.uint8:
+        pixels = np.clip(pixels * 255.0, 0, 255).astype(np.uint8)
+
+    gray = Image.fromarray(pixels).convert('L').resize((hash_size + 1, hash_size))
+    gray = np.asarray(gray, dtype=np.int16)
+    bits = (gray[:, 1:] > gray[:, :-1]).flatten()
+
+    return np.packbits(bits).tobytes().hex()
+
+def cache_key(kind, digest, model_name, model_version):
+    """Cle de cache : type de hash + hash + identite et version du modele"""
+    return f"{model_name}:{model_version}:{kind}:{digest}"
+
+class PredictionCache:
+    """Cache LRU + TTL des predictions, borne en nombre d'entrees et en memoire"""
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, ttl=3600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "perceptual_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+
+    def get(self, key, perceptual=False, count_miss=True):
+        """Retourne la valeur en cache ou None
+
+        count_miss=False quand une seconde recherche (perceptuelle) suit.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < time.monotonic():
+                self._remove(key)
+                self._counters["expirations"] += 1
+                entry = None
+
+            if entry is None:
+                if count_miss:
+                    self._counters["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._counters["perceptual_hits" if perceptual else "hits"] += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = len(key) + len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        """Vide le cache (nouveaux poids charges)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._counters["invalidations"] += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["perceptual_hits"] + self._counters["misses"]
+            hits = self._counters["hits"] + self._counters["perceptual_hits"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hit_rate": hits / lookups if lookups else 0.0
+            }
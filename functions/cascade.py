@@ -0,0 +1,237 @@
+import argparse
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+from fallback import COLOR_MODEL_PATH
+
+CASCADE_PATH = 'models/cascade.json'
+REPORTS_DIR = 'reports'
+# Du moins cher au plus cher : noms des modeles servis par app.py
+STAGES = {
+    "COLOR": COLOR_MODEL_PATH,
+    "ANN": 'models/ann_model.h5',
+    "STUDENT": 'models/student_model.h5',
+    "CNN": 'models/cnn_model.h5',
+}
+GATES = ("confidence", "margin")
+
+def gate_scores(probs, gate):
+    """Score de confiance par image : probabilite top-1 ou ecart top-1 / top-2"""
+    probs = np.atleast_2d(probs)
+    top = np.sort(probs, axis=1)[:, ::-1]
+    if gate == "margin":
+        return top[:, 0] - top[:, 1]
+    return top[:, 0]
+
+class CascadePolicy:
+    """Cascade de modeles : chaque etage repond s'il est assez sur, sinon on escalade
+
+    `stages` : noms des modeles du moins cher au plus cher ; `thresholds` :
+    seuil du score (`gate`) de chaque etage sauf le dernier, qui repond
+    toujours.
+    """
+
+    def __init__(self, stages, thresholds, gate="confidence", calibration=None):
+        self.stages = list(stages)
+        self.thresholds = dict(thresholds)
+        self.gate = gate
+        self.calibration = calibration or {}
+
+    def accepts(self, stage, probs):
+        """True si l'etage `stage` peut repondre avec ces probabilites"""
+        threshold = self.thresholds.get(stage)
+        if threshold is None:
+            return True
+        return bool(gate_scores(probs, self.gate)[0] >= threshold)
+
+    def to_dict(self):
+        return {"stages": self.stages, "gate": self.gate, "thresholds": self.thresholds,
+                "calibration": self.calibration}
+
+    def save(self, path=CASCADE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path=CASCADE_PATH):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["stages"], data["thresholds"], data.get("gate", "confidence"),
+                   data.get("calibration"))
+
+def simulate(stage_probs, labels, thresholds, gate, costs):
+    """Rejoue la cascade sur des probabilites deja calculees
+
+    `stage_probs` : liste de (nom, probabilites (N, C)) dans l'ordre de la
+    cascade. Retourne precision, cout moyen par requete (somme des etages
+    executes) et part des images tranchees par chaque etage.
+    """
+    n = len(labels)
+    remaining = np.ones(n, dtype=bool)
+    predictions = np.zeros(n, dtype=int)
+    cost = np.zeros(n)
+    answered = {}
+
+    for i, (name, probs) in enumerate(stage_probs):
+        cost[remaining] += costs[name]
+        if i == len(stage_probs) - 1:
+            accept = remaining
+        else:
+            accept = remaining & (gate_scores(probs, gate) >= thresholds[name])
+        predictions[accept] = probs[accept].argmax(axis=1)
+        answered[name] = float(accept.mean()) if n else 0.0
+        remaining &= ~accept
+
+    return {
+        "accuracy": float((predictions == labels).mean()) if n else 0.0,
+        "mean_cost_ms": float(cost.mean()) if n else 0.0,
+        "answered": answered
+    }
+
+def calibrate(stage_probs, labels, costs, target_accuracy, grid=41):
+    """Seuils de cout moyen minimal atteignant `target_accuracy` sur ces donnees
+
+    Pour chaque type de score, recherche exhaustive sur une grille de seuils
+    par etage (quantiles des scores, plus un seuil qui n'accepte jamais :
+    l'etage est alors saute en pratique). Si aucun reglage n'atteint la
+    cible, retourne le plus precis.
+    """
+    best = None
+    gated = [name for name, _ in stage_probs[:-1]]
+
+    for gate in GATES:
+        candidates = [
+            sorted(set(np.quantile(gate_scores(probs, gate), np.linspace(0, 1, grid)).tolist())) + [1.01]
+            for _, probs in stage_probs[:-1]
+        ]
+        for values in itertools.product(*candidates):
+            thresholds = dict(zip(gated, values))
+            result = simulate(stage_probs, labels, thresholds, gate, costs)
+            feasible = result["accuracy"] >= target_accuracy
+            key = (feasible, -result["mean_cost_ms"] if feasible else result["accuracy"])
+            if best is None or key > best[0]:
+                best = (key, gate, thresholds, result)
+
+    _, gate, thresholds, result = best
+    return gate, {name: float(v) for name, v in thresholds.items()}, result
+
+def single_image_cost(model, x, repeat=30):
+    """Latence mediane (ms) d'une passe avant sur une image, comme dans le serveur"""
+    x = x[:1]
+    model.predict_on_batch(x)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict_on_batch(x)
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+def main():
+    """Calibre les seuils de la cascade sur data/validation, compare au CNN seul sur data/test"""
+    from evaluate import score_models, split_batches
+    from model_inputs import input_spec, pixels_to_input
+    from runtimes import load_any_model
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calibration', default='data/validation')
+    parser.add_argument('--test', default='data/test')
+    parser.add_argument('--target', type=float,
+                        help="precision visee sur la calibration (defaut : dernier etage - tolerance)")
+    parser.add_argument('--tolerance', type=float, default=0.005,
+                        help="perte de precision toleree par rapport au dernier etage")
+    parser.add_argument('--output', default=CASCADE_PATH)
+    args = parser.parse_args()
+
+    print("="*70)
+    print("CALIBRATION DE LA CASCADE DE MODELES")
+    print("="*70)
+
+    models = {}
+    for name, path in STAGES.items():
+        if os.path.exists(path):
+            models[name] = load_any_model(path)
+        else:
+            print(f"Etage {name} ignore : {path} non trouve")
+    if len(models) < 2:
+        print("Il faut au moins deux modeles pour une cascade")
+        return
+
+    calibration_probs, calibration_labels, _ = score_models(models, split_batches(args.calibration))
+    test_probs, test_labels, _ = score_models(models, split_batches(args.test))
+    if not len(calibration_labels):
+        print(f"Aucune image dans {args.calibration}")
+        return
+
+    pixels, _ = next(split_batches(args.calibration, batch_size=1))
+    costs = {}
+    for name, model in models.items():
+        x = pixels_to_input(pixels, input_spec(model.input_shape))
+        costs[name] = single_image_cost(model, x)
+
+    stages = list(models)
+    final = stages[-1]
+    final_accuracy = float((calibration_probs[final].argmax(axis=1) == calibration_labels).mean())
+    target = args.target if args.target is not None else final_accuracy - args.tolerance
+
+    calibration_stage_probs = [(name, calibration_probs[name]) for name in stages]
+    gate, thresholds, _ = calibrate(calibration_stage_probs, calibration_labels, costs, target)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": stages,
+        "gate": gate,
+        "thresholds": thresholds,
+        "target_accuracy": target,
+        "costs_ms": costs,
+        "params": {name: int(model.count_params()) for name, model in models.items()},
+        "splits": {}
+    }
+    for split, probs, labels in ((args.calibration, calibration_probs, calibration_labels),
+                                 (args.test, test_probs, test_labels)):
+        if not len(labels):
+            continue
+        stage_probs = [(name, probs[name]) for name in stages]
+        report["splits"][split] = {
+            "cascade": simulate(stage_probs, labels, thresholds, gate, costs),
+            # Reference : toujours le dernier etage (le CNN)
+            "baseline": simulate(stage_probs[-1:], labels, {}, gate, costs)
+        }
+
+    print(f"\nEtages : {' -> '.join(stages)}, score '{gate}', cible {target * 100:.2f}%")
+    for name in stages[:-1]:
+        print(f"  {name:<6} repond si {gate} >= {thresholds[name]:.3f}")
+    print("\nCout d'une passe avant (ms, une image) : "
+          + ", ".join(f"{name} {cost:.2f}" for name, cost in costs.items()))
+
+    print(f"\n{'Split':<18} {'Mode':<10} {'Precision':>10} {'Cout moyen':>12}  Repartition")
+    for split, results in report["splits"].items():
+        for mode in ("baseline", "cascade"):
+            result = results[mode]
+            answered = ", ".join(f"{name} {share * 100:.0f}%" for name, share in result["answered"].items())
+            label = f"{final} seul" if mode == "baseline" else "cascade"
+            print(f"{split:<18} {label:<10} {result['accuracy'] * 100:9.2f}% "
+                  f"{result['mean_cost_ms']:10.2f}ms  {answered}")
+        saving = 1 - results["cascade"]["mean_cost_ms"] / results["baseline"]["mean_cost_ms"]
+        print(f"{'':<18} calcul economise : {saving * 100:.1f}%")
+
+    policy = CascadePolicy(stages, thresholds, gate, calibration={
+        "created_at": report["created_at"], "target_accuracy": target,
+        "splits": report["splits"], "costs_ms": costs
+    })
+    policy.save(args.output)
+
+    output = os.path.join(REPORTS_DIR, f"cascade_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nPolitique : {args.output}")
+    print(f"Rapport : {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import os
+import pickle
+import random
+import shutil
+
+import numpy as np
+import tensorflow as tf
+
+CHECKPOINT_DIR = 'checkpoints'
+# Attributs d'etat des callbacks Keras (EarlyStopping, ReduceLROnPlateau)
+CALLBACK_STATE = ('wait', 'best', 'best_epoch', 'stopped_epoch', 'cooldown_counter')
+
+def save_model_atomic(model, path):
+    """model.save dans un fichier temporaire puis os.replace
+
+    Un serveur qui charge models/*.h5 pendant l'ecriture voit l'ancien
+    fichier ou le nouveau, jamais un fichier a moitie ecrit.
+    """
+    base, ext = os.path.splitext(path)
+    tmp = f"{base}.tmp{ext}"
+    model.save(tmp)
+    os.replace(tmp, path)
+
+def _dump(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(data, f)
+    os.replace(tmp, path)
+
+def rng_state(data=None):
+    """Etat des generateurs aleatoires python, numpy, tensorflow (et du generateur de lots)"""
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "tensorflow": tf.random.get_global_generator().state.numpy(),
+    }
+    if hasattr(data, 'rng'):
+        state["data"] = data.rng.bit_generator.state
+    return state
+
+def set_rng_state(state, data=None):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    tf.random.get_global_generator().reset(state["tensorflow"])
+    if "data" in state and hasattr(data, 'rng'):
+        data.rng.bit_generator.state = state["data"]
+
+class TrainingCheckpoint(tf.keras.callbacks.Callback):
+    """Checkpoint periodique d'un entrainement, reprenable
+
+    Sauvegarde a la fin de chaque `every` epoque : poids et etat de
+    l'optimiseur (tf.train.Checkpoint), compteur d'epoque, historique, etat
+    des callbacks suivis (EarlyStopping, ReduceLROnPlateau) et des
+    generateurs aleatoires. Les shuffles tf.data utilisent des graines par
+    operation et ne sont pas restaures.
+
+    Utilisation :
+        checkpoint = TrainingCheckpoint('cnn', callbacks, data=train_gen, resume=True)
+        initial_epoch = checkpoint.prepare(model)
+        if not checkpoint.finished:
+            model.fit(..., callbacks=checkpoint.callbacks, initial_epoch=initial_epoch)
+    """
+
+    def __init__(self, name, callbacks=(), data=None, resume=False, every=1,
+                 directory=CHECKPOINT_DIR):
+        super().__init__()
+        self.name = name
+        self.directory = os.path.join(directory, name)
+        self.tracked = list(callbacks)
+        self.data = data
+        self.resume = resume
+        self.every = every
+        self.initial_epoch = 0
+        self.finished = False
+        self.epoch = 0
+        self.history = {}
+        self._manager = None
+        self._pending = None
+        self._saved_best = None
+
+    @property
+    def callbacks(self):
+        """Callbacks a passer a fit : le checkpoint en dernier, apres ceux qu'il suit"""
+        return self.tracked + [self]
+
+    @property
+    def state_path(self):
+        return os.path.join(self.directory, 'state.pkl')
+
+    def exists(self):
+        return os.path.exists(self.state_path)
+
+    def _checkpoint(self):
+        if self._manager is None:
+            checkpoint = tf.train.Checkpoint(model=self.model, optimizer=self.model.optimizer)
+            self._manager = tf.train.CheckpointManager(checkpoint, self.directory, max_to_keep=2)
+        return self._manager
+
+    def prepare(self, model):
+        """Reprend le dernier checkpoint si `resume`, sinon repart de zero
+
+        Retourne l'epoque initiale a passer a fit.
+        """
+        self.set_model(model)
+        if not self.resume or not self.exists():
+            shutil.rmtree(self.directory, ignore_errors=True)
+            return 0
+
+        with open(self.state_path, 'rb') as f:
+            state = pickle.load(f)
+
+        self._checkpoint().checkpoint.restore(state["checkpoint"]).expect_partial()
+        set_rng_state(state["rng"], self.data)
+        self.initial_epoch = self.epoch = state["epoch"]
+        self.finished = state["finished"]
+        self.history = state["history"]
+        self._pending = state["callbacks"]
+
+        best_path = os.path.join(self.directory, 'best_weights.npz')
+        weights = None
+        if os.path.exists(best_path):
+            with np.load(best_path) as best:
+                weights = [best[f"w{i}"] for i in range(len(best.files))]
+        for callback_state in self._pending:
+            if callback_state.pop("best_weights", False) and weights is not None:
+                callback_state["best_weights"] = weights
+
+        status = "termine" if self.finished else f"reprise a l'epoque {self.initial_epoch + 1}"
+        print(f"Checkpoint {self.name} : {status}")
+        return self.initial_epoch
+
+    def on_train_begin(self, logs=None):
+        # Apres le on_train_begin des callbacks suivis, qui remettent leur etat a zero
+        if self._pending is not None:
+            for callback, state in zip(self.tracked, self._pending):
+                for key, value in state.items():
+                    setattr(callback, key, value)
+            self._pending = None
+        if self.finished:
+            self.model.stop_training = True
+
+    def on_epoch_end(self, epoch, logs=None):
+        for key, value in (logs or {}).items():
+            self.history.setdefault(key, []).append(float(value))
+        self.epoch = epoch + 1
+        if self.epoch % self.every == 0:
+            self.save(self.epoch)
+
+    def on_train_end(self, logs=None):
+        # EarlyStopping a deja restaure les meilleurs poids
+        self.save(self.epoch, finished=True)
+
+    def save(self, epoch, finished=False):
+        path = self._checkpoint().save(checkpoint_number=epoch)
+
+        callbacks_state = []
+        for callback in self.tracked:
+            state = {key: getattr(callback, key) for key in CALLBACK_STATE if hasattr(callback, key)}
+            best_weights = getattr(callback, 'best_weights', None)
+            if best_weights is not None:
+                state["best_weights"] = True
+                if best_weights is not self._saved_best:
+                    self._save_best(best_weights)
+            callbacks_state.append(state)
+
+        _dump(self.state_path, {
+            "epoch": epoch,
+            "finished": finished,
+            "checkpoint": path,
+            "history": self.history,
+            "callbacks": callbacks_state,
+            "rng": rng_state(self.data),
+        })
+
+    def _save_best(self, weights):
+        path = os.path.join(self.directory, 'best_weights.npz')
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **{f"w{i}": w for i, w in enumerate(weights)})
+        os.replace(path + '.tmp', path)
+        self._saved_best = weights
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import math
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+CACHE_DIR = 'cache'
+# Memes extensions que flow_from_directory
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.ppm', '.tif', '.tiff')
+
+def list_split(split_dir, classes):
+    """Liste (chemin relatif, label) d'un split, dans l'ordre de flow_from_directory"""
+    files = []
+    for label, cls in enumerate(classes):
+        folder = os.path.join(split_dir, cls)
+        if not os.path.exists(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                files.append((os.path.join(cls, name), label))
+    return files
+
+def split_fingerprint(split_dir, classes):
+    """Empreinte d'un split (chemins, tailles, dates) pour invalider les caches derives"""
+    digest = hashlib.blake2b(digest_size=8)
+    for rel_path, label in list_split(split_dir, classes):
+        stat = os.stat(os.path.join(split_dir, rel_path))
+        digest.update(f"{rel_path}:{label}:{stat.st_size}:{stat.st_mtime}\n".encode())
+    return digest.hexdigest()
+
+def load_resized(path, image_size):
+    """Decode et redimensionne comme load_img de Keras (interpolation nearest)"""
+    with Image.open(path) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if img.size != image_size:
+            img = img.resize(image_size, Image.NEAREST)
+        return np.asarray(img, dtype=np.uint8)
+
+def cache_paths(split_dir, image_size, cache_dir=CACHE_DIR):
+    name = f"{os.path.basename(os.path.normpath(split_dir))}_{image_size[0]}x{image_size[1]}"
+    return os.path.join(cache_dir, f"{name}.npy"), os.path.join(cache_dir, f"{name}.json")
+
+def build_cache(split_dir, classes, image_size=(224, 224), cache_dir=CACHE_DIR):
+    """Decode chaque image une seule fois dans un tableau uint8 memmap sur disque
+
+    Le manifeste associe chaque fichier a sa ligne, sa taille et sa date de
+    modification : seules les images nouvelles ou modifiees sont redecodees.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    array_path, manifest_path = cache_paths(split_dir, image_size, cache_dir)
+
+    old_manifest = {}
+    old_array = None
+    if os.path.exists(manifest_path) and os.path.exists(array_path):
+        with open(manifest_path) as f:
+            old_manifest = json.load(f)["files"]
+        old_array = np.load(array_path, mmap_mode='r')
+
+    files = list_split(split_dir, classes)
+    entries = {}
+    to_decode = []
+    for rel_path, label in files:
+        stat = os.stat(os.path.join(split_dir, rel_path))
+        entry = {"label": label, "mtime": stat.st_mtime, "size": stat.st_size}
+        old = old_manifest.get(rel_path)
+        if old is not None and old["mtime"] == entry["mtime"] and old["size"] == entry["size"]:
+            entry["source"] = old["index"]
+        else:
+            to_decode.append(rel_path)
+        entries[rel_path] = entry
+
+    if not to_decode and len(old_manifest) == len(entries):
+        return array_path, manifest_path
+
+    start = time.perf_counter()
+    tmp_path = array_path + '.tmp.npy'
+    array = np.lib.format.open_memmap(
+        tmp_path, mode='w+', dtype=np.uint8, shape=(len(files), image_size[1], image_size[0], 3)
+    )
+    for index, (rel_path, _) in enumerate(files):
+        entry = entries[rel_path]
+        source = entry.pop("source", None)
+        if source is not None:
+            array[index] = old_array[source]
+        else:
+            array[index] = load_resized(os.path.join(split_dir, rel_path), image_size)
+        entry["index"] = index
+    array.flush()
+    del array, old_array
+
+    os.replace(tmp_path, array_path)
+    tmp_manifest = manifest_path + '.tmp'
+    with open(tmp_manifest, 'w') as f:
+        json.dump({"split": split_dir, "image_size": list(image_size), "classes": classes,
+                   "files": entries}, f)
+    os.replace(tmp_manifest, manifest_path)
+
+    print(f"Cache {array_path} : {len(to_decode)} images decodees, "
+          f"{len(files) - len(to_decode)} reutilisees ({time.perf_counter() - start:.1f}s)")
+
+    return array_path, manifest_path
+
+def load_cache(split_dir, classes, image_size=(224, 224), cache_dir=CACHE_DIR):
+    """Construit le cache si besoin puis retourne (images uint8 memmap, labels)"""
+    array_path, manifest_path = build_cache(split_dir, classes, image_size, cache_dir)
+    with open(manifest_path) as f:
+        files = json.load(f)["files"]
+
+    images = np.load(array_path, mmap_mode='r')
+    labels = np.zeros(len(files), dtype=np.float32)
+    for entry in files.values():
+        labels[entry["index"]] = entry["label"]
+
+    return images, labels
+
+def make_sequence_class():
+    """Cree la classe Sequence (import de tensorflow differe)"""
+    import tensorflow as tf
+
+    class CachedImageSequence(tf.keras.utils.Sequence):
+        """Equivalent de flow_from_directory lisant le cache uint8
+
+        Chaque lot est lu depuis le memmap, converti en float32 puis augmente
+        par le meme ImageDataGenerator (random_transform + standardize).
+        """
+
+        def __init__(self, images, labels, datagen, batch_size, shuffle, seed=None):
+            super().__init__()
+            self.images = images
+            self.labels = labels
+            self.datagen = datagen
+            self.batch_size = batch_size
+            self.shuffle = shuffle
+            self.samples = len(images)
+            self.rng = np.random.default_rng(seed)
+            self.indices = np.arange(self.samples)
+            self.on_epoch_end()
+
+        def __len__(self):
+            return math.ceil(self.samples / self.batch_size)
+
+        def __getitem__(self, idx):
+            batch = np.sort(self.indices[idx * self.batch_size:(idx + 1) * self.batch_size])
+            x = self.images[batch].astype(np.float32)
+            for i in range(len(x)):
+                x[i] = self.datagen.random_transform(x[i])
+                x[i] = self.datagen.standardize(x[i])
+            return x, self.labels[batch]
+
+        def on_epoch_end(self):
+            if self.shuffle:
+                self.rng.shuffle(self.indices)
+
+    return CachedImageSequence
+
+def cached_generators(train_datagen, val_datagen, classes, image_size, batch_size,
+                      train_dir='data/train', val_dir='data/validation'):
+    """Remplace flow_from_directory pour train / validation par le cache"""
+    CachedImageSequence = make_sequence_class()
+
+    x_train, y_train = load_cache(train_dir, classes, image_size)
+    x_val, y_val = load_cache(val_dir, classes, image_size)
+
+    train_generator = CachedImageSequence(x_train, y_train, train_datagen, batch_size, shuffle=True)
+    val_generator = CachedImageSequence(x_val, y_val, val_datagen, batch_size, shuffle=False)
+
+    return train_generator, val_generator
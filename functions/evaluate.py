@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from dataset_cache import load_cache
+from model_inputs import input_spec, pixels_to_input
+from runtimes import load_any_model
+
+CLASSES = ['apple', 'banana', 'carrot', 'orange', 'tomato']
+REPORTS_DIR = 'reports'
+# Role attendu pour chaque emplacement servi par app.py (--promote --target)
+SLOT_ROLES = {
+    'cnn_model.h5': 'cnn',
+    'student_model.h5': 'cnn',
+    'ann_model.h5': 'ann'
+}
+
+def model_role(model):
+    """'cnn' (reseau convolutif), 'ann' (couches denses seules) ou 'color' (classifieur couleur)"""
+    if not hasattr(model, 'layers'):
+        return 'color'
+    stack = list(model.layers)
+    while stack:
+        layer = stack.pop()
+        if 'Conv' in type(layer).__name__:
+            return 'cnn'
+        stack.extend(getattr(layer, 'layers', []))
+    return 'ann'
+
+def split_batches(split_dir, batch_size=32, image_size=(224, 224)):
+    """Lots (pixels uint8, y) d'un split, decodes une seule fois via le cache de dataset"""
+    images, labels = load_cache(split_dir, CLASSES, image_size)
+    for start in range(0, len(images), batch_size):
+        yield np.asarray(images[start:start + batch_size]), labels[start:start + batch_size]
+
+def score_models(models, batches):
+    """Passe chaque lot a tous les modeles, retourne probabilites, labels et temps
+
+    `models` : {nom: modele avec predict_on_batch}. Le split n'est lu qu'une
+    fois ; chaque modele recoit son entree (image 224, reduite ou histogramme)
+    derivee des memes pixels.
+    """
+    specs = {name: input_spec(model.input_shape) for name, model in models.items()}
+    probs = {name: [] for name in models}
+    timings = {name: [] for name in models}
+    labels = []
+
+    for pixels, y in batches:
+        labels.append(np.asarray(y).astype(int))
+        inputs = {spec: pixels_to_input(pixels, spec) for spec in set(specs.values())}
+        for name, model in models.items():
+            x = inputs[specs[name]]
+            start = time.perf_counter()
+            p = np.asarray(model.predict_on_batch(x))
+            timings[name].append((time.perf_counter() - start, len(x)))
+            probs[name].append(p)
+
+    labels = np.concatenate(labels) if labels else np.zeros(0, dtype=int)
+    probs = {name: np.concatenate(p) for name, p in probs.items() if p}
+    return probs, labels, timings
+
+def expected_calibration_error(probs, labels, bins=15):
+    """ECE : ecart moyen entre confiance et precision, par tranche de confiance"""
+    confidence = probs.max(axis=1)
+    correct = probs.argmax(axis=1) == labels
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    ece = 0.0
+    for low, high in zip(edges[:-1], edges[1:]):
+        mask = (confidence > low) & (confidence <= high)
+        if mask.any():
+            ece += mask.mean() * abs(confidence[mask].mean() - correct[mask].mean())
+    return float(ece)
+
+def classification_metrics(probs, labels, top_k=(1, 2, 3)):
+    """Precision / rappel par classe, matrice de confusion, top-k, ECE, log loss"""
+    n_classes = probs.shape[1]
+    predicted = probs.argmax(axis=1)
+
+    confusion = np.zeros((n_classes, n_classes), dtype=int)
+    np.add.at(confusion, (labels, predicted), 1)
+
+    per_class = {}
+    for i, cls in enumerate(CLASSES[:n_classes]):
+        tp = confusion[i, i]
+        predicted_count = confusion[:, i].sum()
+        actual_count = confusion[i, :].sum()
+        precision = tp / predicted_count if predicted_count else 0.0
+        recall = tp / actual_count if actual_count else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_class[cls] = {
+            "precision": float(precision),
+            "recall": float(recall),
+            "f1": float(f1),
+            "support": int(actual_count)
+        }
+
+    ranked = np.argsort(-probs, axis=1)
+    top_k_accuracy = {
+        f"top_{k}": float((ranked[:, :k] == labels[:, None]).any(axis=1).mean())
+        for k in top_k if k <= n_classes
+    }
+
+    eps = 1e-7
+    log_loss = float(-np.log(np.clip(probs[np.arange(len(labels)), labels], eps, 1.0)).mean())
+
+    return {
+        "samples": int(len(labels)),
+        "accuracy": float((predicted == labels).mean()),
+        **top_k_accuracy,
+        "log_loss": log_loss,
+        "ece": expected_calibration_error(probs, labels),
+        "macro_f1": float(np.mean([m["f1"] for m in per_class.values()])),
+        "per_class": per_class,
+        "confusion_matrix": confusion.tolist()
+    }
+
+def latency_metrics(timings):
+    """Latence par lot / par image et debit d'un modele"""
+    if not timings:
+        return {}
+    seconds = np.array([t for t, _ in timings])
+    images = np.array([n for _, n in timings])
+    return {
+        "batches": int(len(timings)),
+        "batch_ms_p50": float(np.percentile(seconds, 50) * 1000),
+        "batch_ms_p95": float(np.percentile(seconds, 95) * 1000),
+        "image_ms_mean": float(seconds.sum() / images.sum() * 1000),
+        "images_per_sec": float(images.sum() / seconds.sum())
+    }
+
+def evaluate(models, splits, batch_size=32):
+    """Evalue tous les modeles sur chaque split, en un seul passage par split"""
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "classes": CLASSES,
+        "models": {},
+        "splits": {}
+    }
+
+    for name, (model, path) in models.items():
+        report["models"][name] = {"file": path, "size_mb": os.path.getsize(path) / 1024 / 1024,
+                                  "role": model_role(model)}
+
+    for split_dir in splits:
+        split = os.path.basename(os.path.normpath(split_dir))
+        probs, labels, timings = score_models(
+            {name: model for name, (model, _) in models.items()},
+            split_batches(split_dir, batch_size)
+        )
+        report["splits"][split] = {
+            name: {**classification_metrics(probs[name], labels),
+                   "latency": latency_metrics(timings[name])}
+            for name in probs
+        }
+
+    report["recommendation"] = recommend(report)
+    return report
+
+def save_report(report, output):
+    """Ecrit le rapport JSON (dossier cree au besoin) et retourne son chemin"""
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    return output
+
+def recommend(report, split="test", metric="accuracy", candidates=None):
+    """Meilleur modele selon un split et une metrique du rapport (parmi `candidates`)"""
+    results = report["splits"].get(split) or next(iter(report["splits"].values()), {})
+    if candidates is not None:
+        results = {name: m for name, m in results.items() if name in candidates}
+    if not results:
+        return None
+    best = max(results, key=lambda name: results[name][metric])
+    return {"split": split, "metric": metric, "model": best,
+            "file": report["models"][best]["file"], "value": results[best][metric]}
+
+def file_role(path):
+    """Role d'un fichier de modele ; seuls les .h5 Keras peuvent etre promus"""
+    if not path.endswith('.h5'):
+        return None
+    if not os.path.exists(path):
+        raise ValueError(f"Modele introuvable : {path}")
+    return model_role(load_any_model(path))
+
+def promote(report_path, target='models/cnn_model.h5', split="test", metric="accuracy"):
+    """Copie le meilleur modele d'un rapport vers `target`, sans refaire d'inference
+
+    Seuls les modeles Keras .h5 du role de l'emplacement sont candidats
+    (pas de .tflite, de classifieur couleur .npz, ni d'ANN a la place du
+    CNN) ; ValueError s'il n'y en a aucun dans le rapport.
+    """
+    role = SLOT_ROLES.get(os.path.basename(target))
+    if role is None:
+        raise ValueError(f"Emplacement inconnu : {target} ({', '.join(SLOT_ROLES)})")
+
+    with open(report_path) as f:
+        report = json.load(f)
+    candidates = set()
+    for name, entry in report["models"].items():
+        if entry["file"].endswith('.h5') and entry.get("role", role) == role:
+            # Le fichier a pu changer depuis le rapport : on verifie son role actuel
+            if file_role(entry["file"]) == role:
+                candidates.add(name)
+    if not candidates:
+        raise ValueError(f"Aucun modele Keras .h5 de role {role} dans {report_path} "
+                         f"pour {target}")
+
+    choice = recommend(report, split, metric, candidates)
+    source = choice["file"]
+    if os.path.abspath(source) != os.path.abspath(target):
+        tmp = target + '.tmp'
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, target)
+
+    print(f"{choice['model']} ({source}) -> {target} "
+          f"[{metric} {split} = {choice['value']*100:.2f}%]")
+    return choice
+
+def print_report(report):
+    for split, results in report["splits"].items():
+        print(f"\n{split}")
+        print("-"*70)
+        print(f"{'Modele':<24} {'Acc':>7} {'Top-2':>7} {'F1':>7} {'ECE':>7} {'ms/img':>8} {'img/s':>8}")
+        for name, m in results.items():
+            print(f"{name:<24} {m['accuracy']*100:6.2f}% {m.get('top_2', 0)*100:6.2f}% "
+                  f"{m['macro_f1']:7.3f} {m['ece']:7.3f} {m['latency']['image_ms_mean']:8.2f} "
+                  f"{m['latency']['images_per_sec']:8.1f}")
+    if report.get("recommendation"):
+        r = report["recommendation"]
+        print(f"\nMeilleur modele ({r['metric']} sur {r['split']}) : {r['model']} ({r['file']})")
+
+def main():
+    """Evaluation de tous les modeles en un passage par split, rapport JSON"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('models', nargs='*', default=['models/cnn_model.h5', 'models/ann_model.h5'])
+    parser.add_argument('--splits', nargs='+', default=['data/validation', 'data/test'])
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--output', help="chemin du rapport JSON (defaut : reports/eval_<date>.json)")
+    parser.add_argument('--promote', metavar='RAPPORT',
+                        help="promouvoir le meilleur modele d'un rapport existant")
+    parser.add_argument('--target', default='models/cnn_model.h5')
+    args = parser.parse_args()
+
+    if args.promote:
+        try:
+            promote(args.promote, args.target)
+        except ValueError as e:
+            raise SystemExit(f"Promotion refusee : {e}")
+        return
+
+    print("="*70)
+    print("EVALUATION DES MODELES")
+    print("="*70)
+
+    models = {}
+    for path in args.models:
+        if os.path.exists(path):
+            models[os.path.basename(path)] = (load_any_model(path), path)
+        else:
+            print(f"Modele non trouve : {path}")
+    if not models:
+        return
+
+    report = evaluate(models, args.splits, args.batch_size)
+    print_report(report)
+
+    output = args.output or os.path.join(REPORTS_DIR, f"eval_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    print(f"\nRapport : {save_report(report, output)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+class Overloaded(Exception):
+    """File d'attente pleine : la requete doit etre rejetee avec un 503"""
+
+    def __init__(self, name, retry_after=1):
+        super().__init__(f"File '{name}' pleine, reessayez plus tard")
+        self.name = name
+        self.retry_after = retry_after
+
+class BoundedExecutor:
+    """Pool de threads ou de processus avec un nombre borne de taches en attente
+
+    Au-dela de max_workers + max_pending taches en cours, submit leve
+    Overloaded au lieu de mettre la tache en file indefiniment.
+    """
+
+    def __init__(self, name, max_workers, max_pending, kind="thread", retry_after=1):
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+
+        if kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix=name
+            )
+
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """Soumet une tache, leve Overloaded si la file est pleine"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise Overloaded(self.name, self.retry_after)
+
+        with self._lock:
+            self._in_flight += 1
+
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Execute fn dans le pool sans bloquer la boucle asyncio"""
+        if kwargs:
+            fn = functools.partial(fn, **kwargs)
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "rejected": self._rejected
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+def default_workers():
+    return os.cpu_count() or 1
@@ -0,0 +1,75 @@
+import argparse
+import os
+
+import tensorflow as tf
+
+from bench_utils import list_images
+from model_inputs import FULL_SPEC, build_inputs, input_spec
+from runtimes import TFLITE_VARIANTS, tflite_path_for
+
+CALIBRATION_DIR = 'data/validation'
+
+def representative_dataset(split=CALIBRATION_DIR, spec=FULL_SPEC, limit=200):
+    """Entrees de calibration pour la quantification int8 (meme pretraitement que le serveur)"""
+    def generator():
+        for path, _ in list_images(split)[:limit]:
+            with open(path, 'rb') as f:
+                yield [build_inputs(f.read(), [spec])[spec]]
+    return generator
+
+def convert(model, variant, spec):
+    """Convertit un modele Keras en TFLite (inference seule, BN fusionnee, sans Dropout)"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if variant == "tflite-fp16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "tflite-int8":
+        # Poids et activations int8, entrees / sorties float32 pour rester compatible
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(spec=spec)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    return converter.convert()
+
+def export_model(h5_path, variants=tuple(TFLITE_VARIANTS)):
+    """Exporte un .h5 vers toutes les variantes TFLite demandees"""
+    print(f"\nExport TFLite de {h5_path}...")
+    model = tf.keras.models.load_model(h5_path)
+    spec = input_spec(model.input_shape)
+
+    for variant in variants:
+        path = tflite_path_for(h5_path, variant)
+        try:
+            data = convert(model, variant, spec)
+        except Exception as e:
+            print(f"  {variant} : erreur {e}")
+            continue
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        print(f"  {variant:<12} {path} ({len(data) / 1024 / 1024:.2f} Mo)")
+
+def main():
+    """Exporte les modeles entraines vers TFLite float32 / float16 / int8"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('models', nargs='*', default=['models/cnn_model.h5', 'models/ann_model.h5'])
+    parser.add_argument('--variants', nargs='+', default=list(TFLITE_VARIANTS),
+                        choices=list(TFLITE_VARIANTS))
+    args = parser.parse_args()
+
+    print("="*70)
+    print("EXPORT DES MODELES POUR L'INFERENCE")
+    print("="*70)
+
+    for path in args.models:
+        if os.path.exists(path):
+            export_model(path, args.variants)
+        else:
+            print(f"\nModele non trouve : {path}")
+
+if __name__ == "__main__":
+    main()
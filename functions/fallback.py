@@ -0,0 +1,185 @@
+from PIL import Image
+import numpy as np
+import argparse
+import os
+import time
+
+from model_inputs import color_histogram
+from preprocessing import open_buffer
+
+CLASSES = ['apple', 'banana', 'carrot', 'orange', 'tomato']
+COLOR_MODEL_PATH = 'models/color_centroids.npz'
+HISTOGRAM_BINS = 8
+
+class ColorClassifier:
+    """Classifieur couleur vectorise : histogramme RGB + centroide le plus proche
+
+    Chaque image est representee par la racine de son histogramme RGB joint
+    (vecteur unitaire, distance de Hellinger). Un centroide par classe est
+    appris sur data/train ; les probabilites sont un softmax des similarites
+    cosinus, avec une temperature ajustee sur l'entrainement. Meme interface
+    que les modeles Keras (input_shape, predict_on_batch) : il prend en entree
+    l'histogramme produit par le pretraitement partage (model_inputs).
+    """
+
+    def __init__(self, centroids, scale, bins=HISTOGRAM_BINS, classes=CLASSES):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.scale = float(scale)
+        self.bins = bins
+        self.classes = list(classes)
+
+    @property
+    def input_shape(self):
+        return (None, self.bins ** 3)
+
+    def count_params(self):
+        return int(self.centroids.size + 1)
+
+    def logits(self, histograms):
+        features = np.sqrt(np.asarray(histograms, dtype=np.float32))
+        return features @ self.centroids.T * self.scale
+
+    def predict_on_batch(self, histograms):
+        logits = self.logits(histograms)
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def predict(self, histograms, verbose=0):
+        return self.predict_on_batch(histograms)
+
+    @classmethod
+    def fit(cls, histograms, labels, bins=HISTOGRAM_BINS):
+        """Centroides par classe puis temperature minimisant la log-vraisemblance"""
+        features = np.sqrt(np.asarray(histograms, dtype=np.float32))
+        labels = np.asarray(labels).astype(int)
+
+        centroids = np.stack([
+            features[labels == k].mean(axis=0) if (labels == k).any() else np.zeros(features.shape[1])
+            for k in range(len(CLASSES))
+        ])
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-12
+
+        similarity = features @ centroids.T
+        best_scale, best_nll = 1.0, np.inf
+        for scale in np.logspace(0, 3, 60):
+            logits = similarity * scale
+            logits -= logits.max(axis=1, keepdims=True)
+            log_probs = logits - np.log(np.exp(logits).sum(axis=1, keepdims=True))
+            nll = -log_probs[np.arange(len(labels)), labels].mean()
+            if nll < best_nll:
+                best_scale, best_nll = scale, nll
+
+        return cls(centroids, best_scale, bins)
+
+    def save(self, path=COLOR_MODEL_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, centroids=self.centroids, scale=self.scale, bins=self.bins,
+                     classes=np.array(self.classes))
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path=COLOR_MODEL_PATH):
+        with np.load(path) as data:
+            return cls(data['centroids'], float(data['scale']), int(data['bins']),
+                       [str(c) for c in data['classes']])
+
+def split_histograms(split_dir, bins=HISTOGRAM_BINS, chunk=256):
+    """Histogrammes de tout un split, depuis le cache uint8 de dataset_cache"""
+    from dataset_cache import load_cache
+
+    images, labels = load_cache(split_dir, CLASSES)
+    histograms = np.concatenate([
+        color_histogram(np.asarray(images[start:start + chunk]), bins)
+        for start in range(0, len(images), chunk)
+    ]) if len(images) else np.zeros((0, bins ** 3), dtype=np.float32)
+    return histograms, labels
+
+def fit_color_classifier(train_dir='data/train', path=COLOR_MODEL_PATH):
+    """Apprend les centroides sur data/train et les sauvegarde"""
+    histograms, labels = split_histograms(train_dir)
+    classifier = ColorClassifier.fit(histograms, labels)
+    classifier.save(path)
+    print(f"Classifieur couleur : {len(labels)} images, temperature {classifier.scale:.1f}, "
+          f"sauvegarde {path}")
+    return classifier
+
+def smart_color_prediction(image_bytes):
+    """Prediction de secours basee sur les couleurs (si aucun classifieur n'est appris)"""
+    img = Image.open(open_buffer(image_bytes))
+    img = img.convert('RGB')
+    img_small = img.resize((50, 50))
+    pixels = np.array(img_small)
+
+    avg_color = pixels.mean(axis=(0, 1))
+    r, g, b = avg_color
+
+    scores = {
+        'tomato': 0,
+        'apple': 0,
+        'banana': 0,
+        'carrot': 0,
+        'orange': 0
+    }
+
+    if r > 150 and g < 100 and b < 100:
+        scores['tomato'] = 80 + (r - g) / 10
+
+    if (r > 150 and g < 120) or (g > r and g > 100):
+        scores['apple'] = 75 + abs(r - g) / 10
+
+    if r > 180 and g > 150 and b < 120:
+        scores['banana'] = 85
+
+    if r > 150 and 80 < g < 140 and b < 100:
+        scores['carrot'] = 70
+
+    if r > 180 and g > 120 and b < 100:
+        scores['orange'] = 75
+
+    predicted = max(scores, key=scores.get)
+    confidence = min(scores[predicted], 85.0)
+
+    return {
+        "label": predicted,
+        "confidence": f"{confidence:.2f}%",
+        "model": "Detection couleur (fallback)",
+        "all_predictions": scores
+    }
+
+def main():
+    """Apprend le classifieur couleur puis mesure precision et debit"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--splits', nargs='+', default=['data/validation', 'data/test'])
+    parser.add_argument('--output', default=COLOR_MODEL_PATH)
+    args = parser.parse_args()
+
+    print("="*70)
+    print("CLASSIFIEUR COULEUR (HISTOGRAMMES + CENTROIDES)")
+    print("="*70)
+
+    classifier = fit_color_classifier(path=args.output)
+
+    for split in args.splits:
+        histograms, labels = split_histograms(split)
+        if not len(labels):
+            continue
+        probs = classifier.predict_on_batch(histograms)
+        accuracy = (probs.argmax(axis=1) == labels).mean()
+        print(f"{split} : precision {accuracy * 100:.2f}% sur {len(labels)} images")
+
+    # Debit : histogramme (pretraitement partage) puis classification, par lots de 256
+    pixels = np.random.default_rng(0).integers(0, 256, (256, 224, 224, 3), dtype=np.uint8)
+    start = time.perf_counter()
+    histograms = color_histogram(pixels, classifier.bins)
+    features_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(100):
+        classifier.predict_on_batch(histograms)
+    predict_s = (time.perf_counter() - start) / 100
+    print(f"Debit : histogrammes {len(pixels) / features_s:.0f} img/s, "
+          f"classification {len(pixels) / predict_s:.0f} img/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import bisect
+import collections
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+import numpy as np
+
+# Secondes : de 0.5 ms (conversion d'entree) a 10 s (lot /predict/batch)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILES_DIR = 'profiles'
+
+# Endpoint de la requete en cours, positionne par MetricsMiddleware
+current_endpoint = ContextVar("endpoint", default="none")
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base des metriques : nom, aide, noms des labels, valeurs par tuple de labels"""
+
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=(), collect=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        # collect() -> {tuple de labels: valeur}, lu au moment du scrape
+        self.collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def values(self):
+        with self._lock:
+            values = dict(self._values)
+        if self.collect:
+            try:
+                values.update(self.collect())
+            except Exception:
+                pass
+        return values
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{format_labels(self.labels, labels)} {format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+class Histogram(Metric):
+    """Histogramme cumulatif : compte par borne, somme et nombre d'observations"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = {labels: (list(counts), total, n) for labels, (counts, total, n) in self._values.items()}
+
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, (counts, total, n) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket"
+                             f"{format_labels(self.labels, labels, [('le', format_value(float(bound)))])} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {n}")
+        return lines
+
+class MetricsRegistry:
+    """Metriques du serveur, rendues au format texte de Prometheus (version 0.0.4)
+
+    Sans dependance : chaque observation coute un verrou et une recherche
+    dichotomique, negligeable devant un decodage d'image.
+    """
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=(), collect=None):
+        return self._add(Counter(self.prefix + name, help, labels, collect))
+
+    def gauge(self, name, help, labels=(), collect=None):
+        return self._add(Gauge(self.prefix + name, help, labels, collect))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self.prefix + name, help, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+def process_rss_bytes():
+    """RSS du processus, via /proc (0 si indisponible)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+def model_memory_bytes(model):
+    """Taille des poids d'un modele (Keras), sinon parametres x 4 octets"""
+    weights = getattr(model, "weights", None)
+    if weights:
+        return sum(int(np.prod(w.shape)) * w.dtype.size for w in weights)
+    return int(model.count_params()) * 4
+
+def fold_stack(frame):
+    """Pile d'un thread au format "folded" (racine d'abord, separee par des ;)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class SamplingProfiler:
+    """Echantillonneur de piles pour les requetes lentes, activable a chaud
+
+    Une fois active, un thread releve les piles de tous les threads
+    (sys._current_frames) toutes les `interval_ms`. Quand une requete dure
+    plus de `threshold_ms`, les echantillons de sa fenetre sont ecrits au
+    format "folded" (flamegraph.pl, speedscope) dans PROFILES_DIR. Les
+    requetes concurrentes apparaissent aussi dans la fenetre : le nom du
+    thread est la racine de chaque pile pour les distinguer.
+    """
+
+    def __init__(self, output_dir=PROFILES_DIR, interval_ms=5.0, threshold_ms=500.0,
+                 history_s=30.0, max_dumps=100):
+        self.output_dir = output_dir
+        self.interval_ms = interval_ms
+        self.threshold_ms = threshold_ms
+        self.history_s = history_s
+        self.max_dumps = max_dumps
+        self.enabled = False
+        self._samples = deque()
+        self._dumps = deque(maxlen=max_dumps)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def configure(self, enabled, interval_ms=None, threshold_ms=None):
+        if interval_ms:
+            self.interval_ms = interval_ms
+        if threshold_ms is not None:
+            self.threshold_ms = threshold_ms
+        if enabled and not self.enabled:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+        elif not enabled and self.enabled:
+            self._stop.set()
+            self._thread.join()
+            with self._lock:
+                self._samples.clear()
+        self.enabled = enabled
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_ms / 1000):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            now = time.perf_counter()
+            stacks = [
+                f"{names.get(ident, ident)};{fold_stack(frame)}"
+                for ident, frame in sys._current_frames().items() if ident != own
+            ]
+            with self._lock:
+                self._samples.append((now, stacks))
+                while self._samples and self._samples[0][0] < now - self.history_s:
+                    self._samples.popleft()
+
+    def is_slow(self, duration):
+        return self.enabled and duration * 1000 >= self.threshold_ms
+
+    def dump(self, endpoint, started, duration):
+        """Ecrit les piles echantillonnees pendant la requete, retourne le chemin"""
+        with self._lock:
+            window = [stacks for t, stacks in self._samples if started <= t <= started + duration]
+        folded = collections.Counter(stack for stacks in window for stack in stacks)
+        if not folded:
+            return None
+
+        name = endpoint.strip("/").replace("/", "_") or "root"
+        path = os.path.join(self.output_dir,
+                            f"{time.strftime('%Y%m%d_%H%M%S')}_{name}_{duration * 1000:.0f}ms.folded")
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            for stack, count in folded.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(path + ".tmp", path)
+
+        with self._lock:
+            if len(self._dumps) == self._dumps.maxlen:
+                old = self._dumps.popleft()
+                if os.path.exists(old["path"]):
+                    os.remove(old["path"])
+            self._dumps.append({"path": path, "endpoint": endpoint,
+                                "duration_ms": round(duration * 1000, 1), "samples": len(window)})
+        return path
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "interval_ms": self.interval_ms,
+                "threshold_ms": self.threshold_ms,
+                "samples": len(self._samples),
+                "dumps": list(self._dumps)
+            }
+
+class MetricsMiddleware:
+    """Middleware ASGI : duree, statut et requetes en cours par endpoint
+
+    Positionne aussi current_endpoint pour les mesures par etape faites plus
+    bas, et passe les requetes lentes au profileur s'il est actif.
+    `paths()` : chemins connus ; les autres sont regroupes sous "other" pour
+    borner le nombre de series.
+    """
+
+    def __init__(self, app, paths, latency, in_flight, errors, profiler=None):
+        self.app = app
+        self.paths = paths
+        self.latency = latency
+        self.in_flight = in_flight
+        self.errors = errors
+        self.profiler = profiler
+        self._known = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        if self._known is None:
+            self._known = set(self.paths())
+        endpoint = scope["path"] if scope["path"] in self._known else "other"
+        token = current_endpoint.set(endpoint)
+        status = {"code": 500}
+
+        async def tracked_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        self.in_flight.inc(endpoint)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, tracked_send)
+        except Exception as e:
+            self.errors.inc(endpoint, type(e).__name__)
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            self.in_flight.dec(endpoint)
+            self.latency.observe(duration, endpoint, scope["method"], str(status["code"]))
+            current_endpoint.reset(token)
+            if self.profiler and self.profiler.is_slow(duration):
+                threading.Thread(
+                    target=self.profiler.dump, args=(endpoint, started, duration), daemon=True
+                ).start()
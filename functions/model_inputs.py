@@ -0,0 +1,205 @@
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from preprocessing import decode_image
+
+# Resolution d'entrainement : toutes les entrees sont derivees de ce decodage
+FULL_SIZE = (224, 224)
+FULL_SPEC = ("image", FULL_SIZE)
+PIXEL_SCALE = np.float32(1.0 / 255.0)
+
+def parse_spec(text):
+    """'full', 'pixels:32' (image reduite) ou 'histogram:8' (histogramme RGB 8x8x8)"""
+    kind, _, value = text.partition(':')
+    if kind == 'full':
+        return FULL_SPEC
+    if kind == 'pixels':
+        size = int(value)
+        return ("image", (size, size))
+    if kind == 'histogram':
+        return ("histogram", int(value or 8))
+    raise ValueError(f"Entree inconnue : {text}")
+
+def input_spec(input_shape):
+    """Spec d'entree d'un modele d'apres sa forme d'entree (batch compris)"""
+    shape = tuple(int(d) for d in input_shape[1:])
+    if len(shape) == 3:
+        return ("image", (shape[1], shape[0]))
+    return ("histogram", round(shape[0] ** (1 / 3)))
+
+def spec_shape(spec):
+    """Forme d'entree (sans batch) correspondant a une spec"""
+    kind, value = spec
+    if kind == "image":
+        return (value[1], value[0], 3)
+    return (value ** 3,)
+
+def spec_name(spec):
+    kind, value = spec
+    if kind == "image":
+        return "full" if value == FULL_SIZE else f"pixels:{value[0]}"
+    return f"histogram:{value}"
+
+def color_histogram(pixels, bins):
+    """Histogramme RGB joint normalise de pixels uint8 (N, H, W, 3) -> (N, bins**3)"""
+    q = (pixels.astype(np.uint16) * bins) >> 8
+    idx = ((q[..., 0] * bins + q[..., 1]) * bins + q[..., 2]).reshape(len(pixels), -1)
+    n = bins ** 3
+    offsets = np.arange(len(pixels))[:, None] * n
+    counts = np.bincount((idx + offsets).ravel(), minlength=len(pixels) * n)
+    return (counts.reshape(len(pixels), n) / idx.shape[1]).astype(np.float32)
+
+def pixels_to_input(pixels, spec, scaled=True):
+    """Entree d'un modele a partir de pixels uint8 (N, 224, 224, 3) deja decodes
+
+    `scaled=False` : les images restent en uint8 (redimensionnees), la
+    conversion float32 est faite par stack_inputs au moment de l'inference.
+    """
+    kind, value = spec
+    if kind == "histogram":
+        return color_histogram(pixels, value)
+
+    if value != (pixels.shape[2], pixels.shape[1]):
+        # BOX = moyenne des pixels, comme l'interpolation 'area' de l'entrainement
+        pixels = np.stack([
+            np.asarray(Image.fromarray(p).resize(value, Image.BOX)) for p in pixels
+        ])
+    if not scaled:
+        return pixels
+    return np.multiply(pixels, PIXEL_SCALE, dtype=np.float32)
+
+def stack_inputs(arrays, out):
+    """Copie des entrees (une par ligne de `out`) dans le tampon float32 `out`
+
+    Les pixels uint8 sont ramenes dans [0, 1] pendant la copie : une seule
+    passe, sans tableau float32 intermediaire. Retourne out[:len(arrays)].
+    """
+    for row, x in zip(out, arrays):
+        x = x.reshape(row.shape)
+        if x.dtype == np.uint8:
+            np.multiply(x, PIXEL_SCALE, out=row)
+        else:
+            row[...] = x
+    return out[:len(arrays)]
+
+class InputBuffers:
+    """Tampons float32 des lots envoyes aux modeles, reutilises d'un appel a l'autre
+
+    Un tampon par thread et par forme d'entree : le lot est rempli puis
+    consomme par la passe avant dans le meme thread (executeur d'inference),
+    il peut donc etre reecrit des l'appel suivant.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def stack(self, arrays):
+        """Entrees (1, ...) -> lot float32 (N, ...) dans le tampon du thread courant"""
+        shape = arrays[0].shape[1:]
+        buffers = self._local.__dict__.setdefault("buffers", {})
+        buffer = buffers.get(shape)
+        if buffer is None or len(buffer) < len(arrays):
+            buffer = buffers[shape] = np.empty((len(arrays), *shape), dtype=np.float32)
+        return stack_inputs(arrays, buffer)
+
+def build_inputs(image_bytes, specs):
+    """Decode l'image une seule fois et produit l'entree de chaque spec
+
+    Retourne {spec: tableau (1, ...)}.
+    """
+    pixels = decode_image(image_bytes, FULL_SIZE)[None]
+    return {spec: pixels_to_input(pixels, spec) for spec in set(specs)}
+
+def build_inputs_timed(image_bytes, specs, scaled=True):
+    """build_inputs avec la duree de chaque etape (decode, resize, convert) en secondes
+
+    Les durees sont renvoyees plutot qu'enregistrees : la fonction peut
+    tourner dans un executeur en processus. Le serveur passe scaled=False
+    (voir pixels_to_input).
+    """
+    timings = {}
+    pixels = decode_image(image_bytes, FULL_SIZE, timings)[None]
+    start = time.perf_counter()
+    inputs = {spec: pixels_to_input(pixels, spec, scaled) for spec in set(specs)}
+    timings["convert"] = time.perf_counter() - start
+    return inputs, timings
+
+def raw_inputs_timed(frame, size, specs, scaled=True):
+    """build_inputs_timed pour des pixels RGB bruts deja decodes, `size` = (largeur, hauteur)"""
+    width, height = size
+    pixels = np.frombuffer(frame, dtype=np.uint8)
+    if pixels.size != width * height * 3:
+        raise ValueError(f"Frame RGB de {pixels.size} octets, attendu {width}x{height}x3")
+
+    timings = {}
+    start = time.perf_counter()
+    pixels = pixels.reshape(height, width, 3)
+    if size != FULL_SIZE:
+        pixels = np.asarray(Image.fromarray(pixels).resize(FULL_SIZE))
+    pixels = pixels[None]
+    resized = time.perf_counter()
+    timings["resize"] = resized - start
+    inputs = {spec: pixels_to_input(pixels, spec, scaled) for spec in set(specs)}
+    timings["convert"] = time.perf_counter() - resized
+    return inputs, timings
+
+def adapter_layer(spec):
+    """Couche Keras qui produit l'entree de `spec` depuis un lot 224x224 dans [0, 1]
+
+    Sert a l'entrainement : le modele d'entrainement est adaptateur + modele
+    servi, et seul le modele servi est sauvegarde (voir serving_model).
+    """
+    import tensorflow as tf
+
+    kind, value = spec
+    if kind == "image":
+        return tf.keras.layers.Resizing(value[1], value[0], interpolation='area', name='downsample')
+
+    class ColorHistogram(tf.keras.layers.Layer):
+        """Meme calcul que color_histogram, sur les pixels ramenes en uint8"""
+
+        def __init__(self, bins, **kwargs):
+            super().__init__(trainable=False, **kwargs)
+            self.bins = bins
+
+        def call(self, x):
+            bins = self.bins
+            n = bins ** 3
+            q = tf.cast(tf.round(tf.clip_by_value(x, 0.0, 1.0) * 255.0), tf.int32) * bins // 256
+            idx = (q[..., 0] * bins + q[..., 1]) * bins + q[..., 2]
+            batch = tf.shape(idx)[0]
+            idx = tf.reshape(idx, [batch, -1])
+            offsets = tf.range(batch)[:, None] * n
+            counts = tf.math.bincount(
+                tf.reshape(idx + offsets, [-1]), minlength=batch * n, maxlength=batch * n,
+                dtype=tf.float32
+            )
+            return tf.reshape(counts, [batch, n]) / tf.cast(tf.shape(idx)[1], tf.float32)
+
+        def get_config(self):
+            return {**super().get_config(), "bins": self.bins}
+
+    return ColorHistogram(value, name='color_histogram')
+
+def with_adapter(model, spec):
+    """Modele d'entrainement 224x224 : adaptateur puis `model` (rien si spec complete)"""
+    if spec == FULL_SPEC:
+        return model
+    import tensorflow as tf
+
+    wrapped = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=spec_shape(FULL_SPEC)),
+        adapter_layer(spec),
+        model
+    ], name=f"{model.name}_train")
+    wrapped.compile(optimizer=model.optimizer, loss=model.loss, metrics=['accuracy'])
+    return wrapped
+
+def serving_model(model):
+    """Modele a sauvegarder : sans l'adaptateur d'entrainement s'il y en a un"""
+    if model.name.endswith('_train'):
+        return model.layers[-1]
+    return model
@@ -0,0 +1,147 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tensorflow as tf
+
+from tf_data_pipeline import iter_batches
+
+def metric_logs(model):
+    """Metriques d'un modele (loss, accuracy...) cumulees depuis le dernier reset_metrics
+
+    Keras 3 ne remet pas les metriques a zero entre deux train_on_batch : on
+    les lit apres chaque lot et on les remet a zero a chaque epoque.
+    """
+    logs = {}
+    for metric in model.metrics:
+        result = metric.result()
+        if isinstance(result, dict):
+            logs.update(result)
+        else:
+            logs[metric.name] = result
+    return {name: float(value) for name, value in logs.items()}
+
+class ModelRun:
+    """Etat d'un modele entraine dans le flux commun"""
+
+    def __init__(self, name, model, callbacks, epochs, steps, initial_epoch=0):
+        self.name = name
+        self.model = model
+        # Premiere epoque a entrainer : les precedentes sont deja dans son checkpoint
+        self.initial_epoch = initial_epoch
+        self.history = tf.keras.callbacks.History()
+        self.callbacks = tf.keras.callbacks.CallbackList(
+            list(callbacks) + [self.history],
+            model=model, epochs=epochs, steps=steps, verbose=0
+        )
+        self.logs = {}
+        self.active = True
+        self.stopped_epoch = None
+        self.train_time = 0.0
+
+    def train_step(self, step, x, y):
+        start = time.perf_counter()
+        self.callbacks.on_train_batch_begin(step)
+        self.model.train_on_batch(x, y)
+        self.logs = metric_logs(self.model)
+        self.callbacks.on_train_batch_end(step, self.logs)
+        self.train_time += time.perf_counter() - start
+
+    def val_step(self, x, y):
+        start = time.perf_counter()
+        self.model.test_on_batch(x, y)
+        self.logs = metric_logs(self.model)
+        self.train_time += time.perf_counter() - start
+
+def _steps(data):
+    try:
+        return len(data)
+    except TypeError:
+        return None
+
+def train_lockstep(runs, train_data, val_data, epochs, parallel=True, initial_epoch=0):
+    """Entraine plusieurs modeles Keras sur un seul flux de lots augmentes
+
+    `runs` : {nom: (modele compile, liste de callbacks)}. Chaque lot est lu,
+    decode et augmente une seule fois puis donne a tous les modeles actifs
+    (en parallele si `parallel`). Chaque modele garde son optimiseur et ses
+    callbacks (EarlyStopping, ReduceLROnPlateau, ModelCheckpoint...) ; un
+    modele qui s'arrete quitte le flux, les autres continuent. Un callback
+    peut arreter un modele des on_train_begin (checkpoint deja termine).
+
+    `initial_epoch` : entier, ou {nom: epoque} pour reprendre des
+    checkpoints a des epoques differentes. Le flux part de la plus petite ;
+    un modele en avance ne rejoint le flux qu'a sa propre epoque (ni lots,
+    ni callbacks avant).
+
+    Retourne {nom: History}.
+    """
+    steps = _steps(train_data)
+    if not isinstance(initial_epoch, dict):
+        initial_epoch = dict.fromkeys(runs, initial_epoch)
+    runs = [ModelRun(name, model, callbacks, epochs, steps, initial_epoch.get(name, 0))
+            for name, (model, callbacks) in runs.items()]
+    pool = ThreadPoolExecutor(max_workers=len(runs)) if parallel and len(runs) > 1 else None
+    epoch = None
+
+    def for_active(fn):
+        active = [run for run in runs if run.active and epoch >= run.initial_epoch]
+        if pool:
+            list(pool.map(fn, active))
+        else:
+            for run in active:
+                fn(run)
+
+    for run in runs:
+        run.model.stop_training = False
+        run.callbacks.on_train_begin()
+        if run.model.stop_training:
+            run.active = False
+
+    try:
+        first_epoch = min([run.initial_epoch for run in runs if run.active], default=epochs)
+        for epoch in range(first_epoch, epochs):
+            if not any(run.active for run in runs):
+                break
+
+            epoch_start = time.perf_counter()
+            for_active(lambda run: run.model.reset_metrics())
+            for_active(lambda run: run.callbacks.on_epoch_begin(epoch))
+
+            for step, (x, y) in enumerate(iter_batches(train_data)):
+                for_active(lambda run: run.train_step(step, x, y))
+
+            current = [run for run in runs if run.active and epoch >= run.initial_epoch]
+            train_logs = {run.name: dict(run.logs) for run in current}
+
+            for_active(lambda run: run.model.reset_metrics())
+            for x, y in iter_batches(val_data):
+                for_active(lambda run: run.val_step(x, y))
+
+            for run in current:
+                logs = {k: float(v) for k, v in train_logs[run.name].items()}
+                logs.update({f"val_{k}": float(v) for k, v in run.logs.items()})
+                run.callbacks.on_epoch_end(epoch, logs)
+
+                print(f"Epoque {epoch + 1}/{epochs} {run.name} - "
+                      + " - ".join(f"{k}: {v:.4f}" for k, v in logs.items()))
+
+                if run.model.stop_training:
+                    run.active = False
+                    run.stopped_epoch = epoch + 1
+                    run.callbacks.on_train_end(logs)
+                    print(f"{run.name} arrete a l'epoque {epoch + 1}")
+
+            print(f"Epoque {epoch + 1} : {time.perf_counter() - epoch_start:.1f}s")
+    finally:
+        if pool:
+            pool.shutdown()
+
+    for run in runs:
+        if run.active:
+            run.callbacks.on_train_end(run.logs)
+
+    for run in runs:
+        stopped = f"arret a l'epoque {run.stopped_epoch}" if run.stopped_epoch else "toutes les epoques"
+        print(f"{run.name} : {run.train_time:.1f}s de calcul, {stopped}")
+
+    return {run.name: run.history for run in runs}
@@ -0,0 +1,91 @@
+from PIL import Image
+import numpy as np
+import io
+import time
+
+class BufferReader(io.RawIOBase):
+    """Fichier en lecture seule sur un buffer (memoryview, mmap)
+
+    io.BytesIO copie tout buffer qui n'est pas un bytes ; ici seuls les
+    morceaux demandes par le decodeur sont copies.
+    """
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer).cast('B')
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = max(0, min(len(b), len(self.view) - self.pos))
+        b[:n] = self.view[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += len(self.view)
+        self.pos = max(0, offset)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+def open_buffer(image_bytes):
+    """Fichier lisible sur des octets d'image, sans copie (bytes, memoryview ou mmap)"""
+    if isinstance(image_bytes, bytes):
+        return io.BytesIO(image_bytes)
+    return io.BufferedReader(BufferReader(image_bytes))
+
+def decode_image(image_bytes, target_size=(224, 224), timings=None):
+    """Decode l'image directement a la taille cible, en uint8 (H, W, 3)
+
+    Pour les JPEG, le mode draft fait la reduction dans le domaine DCT
+    (facteurs 1/2, 1/4, 1/8) : on ne decode jamais plus de pixels que
+    necessaire. La conversion RGB est sautee si l'image l'est deja.
+    `timings` (dict) recoit les durees "decode" et "resize" en secondes.
+    """
+    if timings is not None:
+        start = time.perf_counter()
+
+    img = Image.open(open_buffer(image_bytes))
+
+    if img.format == 'JPEG':
+        img.draft('RGB', target_size)
+
+    if timings is not None:
+        img.load()
+        decoded = time.perf_counter()
+        timings["decode"] = decoded - start
+
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    if img.size != target_size:
+        img = img.resize(target_size)
+
+    pixels = np.asarray(img)
+    if timings is not None:
+        timings["resize"] = time.perf_counter() - decoded
+    return pixels
+
+def preprocess_image(image_bytes, target_size=(224, 224), out=None):
+    """Pretraite l'image pour la prediction
+
+    Si `out` est fourni (tableau float32 de forme (1, H, W, 3)), le resultat
+    y est ecrit au lieu d'allouer un nouveau tableau.
+    """
+    pixels = decode_image(image_bytes, target_size)
+
+    if out is None:
+        out = np.empty((1, target_size[1], target_size[0], 3), dtype=np.float32)
+
+    np.multiply(pixels, np.float32(1.0 / 255.0), out=out[0])
+
+    return out
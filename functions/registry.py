@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+def file_version(path):
+    """Version d'un fichier de poids : date de modification (ns), inode et taille
+
+    L'inode change a chaque os.replace (save_model_atomic) : un modele
+    reentraine de meme taille, ecrit dans la meme seconde, est une nouvelle
+    version.
+    """
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_ino}-{stat.st_size}"
+
+class ServedModel:
+    """Une version chargee d'un modele, avec son micro-batcher eventuel
+
+    Les requetes tiennent la version qu'elles ont prise (with served:) : une
+    version remplacee n'est fermee qu'une fois ses requetes en cours terminees.
+    """
+
+    def __init__(self, name, model, path, version, batcher=None):
+        self.name = name
+        self.model = model
+        self.path = path
+        self.version = version
+        self.batcher = batcher
+        self.loaded_at = time.time()
+        self._in_flight = 0
+        self._idle = threading.Condition()
+
+    def __enter__(self):
+        with self._idle:
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._idle:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._idle.notify_all()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def retire(self, timeout=None):
+        """Attend la fin des requetes en cours puis arrete le micro-batcher"""
+        with self._idle:
+            self._idle.wait_for(lambda: not self._in_flight, timeout=timeout)
+        if self.batcher:
+            self.batcher.close()
+
+    def info(self):
+        return {
+            "version": self.version,
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "in_flight": self._in_flight
+        }
+
+class ModelRegistry:
+    """Modeles servis, rechargeables a chaud
+
+    `sources` : {nom: fichier .h5}, dans l'ordre de preference. `resolve`
+    donne le fichier reellement servi (ex. variante .tflite), `loader` le
+    charge, `warm_up` l'echauffe et `make_batcher` cree son micro-batcher.
+    Une nouvelle version est chargee et echauffee a cote de l'ancienne, puis
+    remplace l'ancienne par une seule affectation : les requetes deja
+    commencees terminent sur l'ancienne version.
+    """
+
+    def __init__(self, sources, loader, resolve=None, warm_up=None, make_batcher=None,
+                 retire_timeout=60):
+        self.sources = dict(sources)
+        self.loader = loader
+        self.resolve = resolve or (lambda path: path)
+        self.warm_up = warm_up
+        self.make_batcher = make_batcher
+        self.retire_timeout = retire_timeout
+        self._models = {}
+        self._errors = {}
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.reloads = 0
+
+    def get(self, name):
+        return self._models.get(name)
+
+    @contextmanager
+    def use(self, name):
+        """Prend la version courante d'un modele pour la duree d'une requete (None si absent)"""
+        while True:
+            served = self._models.get(name)
+            if served is None:
+                yield None
+                return
+            with served:
+                # Remplacee entre get et __enter__ : elle peut deja etre fermee
+                if self._models.get(name) is served:
+                    yield served
+                    return
+
+    def items(self):
+        """(nom, version servie) des modeles charges, du prefere au moins bon"""
+        models = self._models
+        return [(name, models[name]) for name in self.sources if name in models]
+
+    def versions(self):
+        return {name: served.version for name, served in self.items()}
+
+    def _load(self, name, with_batcher=True, warm_up=True):
+        path = self.resolve(self.sources[name])
+        # Version lue avant le chargement : un fichier remplace pendant le
+        # chargement sera vu comme nouveau au prochain rechargement
+        version = file_version(path)
+        model = self.loader(path)
+        if warm_up and self.warm_up:
+            self.warm_up(model)
+        batcher = self.make_batcher(model, name) if with_batcher and self.make_batcher else None
+        return ServedModel(name, model, path, version, batcher)
+
+    def _swap(self, served):
+        old = self._models.get(served.name)
+        self._models = {**self._models, served.name: served}
+        if old is not None:
+            threading.Thread(
+                target=old.retire, args=(self.retire_timeout,),
+                name=f"retire-{served.name}", daemon=True
+            ).start()
+        return old
+
+    def load_all(self, with_batchers=True, warm_up=False):
+        """Chargement initial de tous les modeles presents"""
+        with self._reload_lock:
+            for name, path in self.sources.items():
+                if not os.path.exists(self.resolve(path)):
+                    print(f"Modele {name} non trouve : {path}")
+                    continue
+                try:
+                    served = self._load(name, with_batchers, warm_up)
+                    self._swap(served)
+                    self._errors.pop(name, None)
+                    print(f"Modele {name} charge depuis {served.path} (version {served.version})")
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    print(f"Erreur {name} : {e}")
+
+    def start_batchers(self):
+        """(Re)cree les micro-batchers des versions servies (ex. apres un fork)"""
+        for name, served in self.items():
+            if served.batcher:
+                served.batcher.close()
+            served.batcher = self.make_batcher(served.model, name) if self.make_batcher else None
+
+    def warm_up_all(self):
+        if self.warm_up:
+            for _, served in self.items():
+                self.warm_up(served.model)
+
+    def reload(self, force=False):
+        """Recharge les modeles dont le fichier a change (tous si force)
+
+        Retourne {nom: statut}. En cas d'erreur l'ancienne version reste servie.
+        """
+        results = {}
+        with self._reload_lock:
+            for name, path in self.sources.items():
+                resolved = self.resolve(path)
+                current = self._models.get(name)
+                if not os.path.exists(resolved):
+                    results[name] = {"status": "missing"}
+                    continue
+                version = file_version(resolved)
+                if not force and current is not None and current.version == version:
+                    results[name] = {"status": "unchanged", "version": version}
+                    continue
+
+                start = time.perf_counter()
+                try:
+                    served = self._load(name)
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    results[name] = {"status": "failed", "error": str(e),
+                                     "version": current.version if current else None}
+                    print(f"Rechargement {name} echoue, version conservee : {e}")
+                    continue
+
+                old = self._swap(served)
+                self._errors.pop(name, None)
+                self.reloads += 1
+                results[name] = {
+                    "status": "reloaded",
+                    "version": served.version,
+                    "previous_version": old.version if old else None,
+                    "load_s": round(time.perf_counter() - start, 3)
+                }
+                print(f"Modele {name} recharge : version {served.version}")
+        return results
+
+    def watch(self, interval):
+        """Surveille le dossier des modeles et recharge en arriere-plan"""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"Surveillance des modeles : {e}")
+
+        self._watcher = threading.Thread(target=run, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            "models": {name: served.info() for name, served in self.items()},
+            "errors": dict(self._errors),
+            "reloads": self.reloads,
+            "watching": self._watcher is not None
+        }
@@ -0,0 +1,94 @@
+import os
+import threading
+
+import numpy as np
+
+# Suffixe du fichier .tflite pour chaque runtime (MODEL_RUNTIME)
+TFLITE_VARIANTS = {
+    "tflite": "",
+    "tflite-fp16": "_fp16",
+    "tflite-int8": "_int8",
+}
+# Valeurs acceptees pour MODEL_RUNTIME
+RUNTIMES = ("keras", *TFLITE_VARIANTS)
+
+def tflite_path_for(h5_path, runtime):
+    """models/cnn_model.h5 -> models/cnn_model_int8.tflite pour tflite-int8"""
+    base, _ = os.path.splitext(h5_path)
+    return f"{base}{TFLITE_VARIANTS[runtime]}.tflite"
+
+def path_runtime(path):
+    """Runtime d'un fichier servi : variante TFLite d'apres le suffixe, 'color' (.npz) ou 'keras'"""
+    if path.endswith('.tflite'):
+        base = path[:-len('.tflite')]
+        for runtime, suffix in TFLITE_VARIANTS.items():
+            if suffix and base.endswith(suffix):
+                return runtime
+        return 'tflite'
+    if path.endswith('.npz'):
+        return 'color'
+    return 'keras'
+
+def load_interpreter(path, num_threads=None):
+    """Interprete TFLite, via tflite_runtime si installe (plus leger que tensorflow)"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=path, num_threads=num_threads)
+
+class TFLiteModel:
+    """Modele .tflite avec la meme interface que Keras pour app.py
+
+    L'interprete n'est pas thread-safe : les appels sont serialises. La
+    dimension batch est redimensionnee a la demande.
+    """
+
+    def __init__(self, path, num_threads=None):
+        self.path = path
+        self.interpreter = load_interpreter(path, num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        self._lock = threading.Lock()
+
+    @property
+    def input_shape(self):
+        return (None, *[int(d) for d in self._input['shape'][1:]])
+
+    def count_params(self):
+        """Nombre approximatif de poids (tenseurs constants du graphe)"""
+        total = 0
+        for detail in self.interpreter.get_tensor_details():
+            if detail['index'] not in (self._input['index'], self._output['index']):
+                total += int(np.prod(detail['shape'])) if len(detail['shape']) else 1
+        return total
+
+    def predict_on_batch(self, x):
+        x = np.asarray(x, dtype=self._input['dtype'])
+        with self._lock:
+            if x.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input['index'], x.shape)
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = x.shape[0]
+
+            self.interpreter.set_tensor(self._input['index'], x)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output['index']).copy()
+
+    def predict(self, x, verbose=0):
+        return self.predict_on_batch(x)
+
+def load_any_model(path, num_threads=None):
+    """Charge un .tflite (TFLiteModel), un classifieur couleur .npz ou un .h5 Keras"""
+    if path.endswith('.tflite'):
+        return TFLiteModel(path, num_threads)
+    if path.endswith('.npz'):
+        from fallback import ColorClassifier
+        return ColorClassifier.load(path)
+    import tensorflow as tf
+    return tf.keras.models.load_model(path, compile=False)
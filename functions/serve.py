@@ -0,0 +1,122 @@
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serveur multi-workers")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, default=1,
+                        help="threads intra-op par worker (inter-op : 1)")
+    parser.add_argument('--runtime', default=os.environ.get("MODEL_RUNTIME", "keras"))
+    parser.add_argument('--preload', choices=['auto', 'yes', 'no'], default='auto',
+                        help="charger les poids avant le fork (copy-on-write)")
+    return parser.parse_args()
+
+def configure_threads(args):
+    """Limite les threads de chaque worker pour ne pas surcharger le CPU
+
+    Doit etre fait avant l'import de numpy / tensorflow.
+    """
+    threads = str(args.threads)
+    os.environ["MODEL_RUNTIME"] = args.runtime
+    os.environ["INTRA_OP_THREADS"] = threads
+    os.environ["INTER_OP_THREADS"] = "1"
+    os.environ["TFLITE_THREADS"] = threads
+    os.environ["OMP_NUM_THREADS"] = threads
+    os.environ["DECODE_WORKERS"] = os.environ.get("DECODE_WORKERS", threads)
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(sock):
+    """Processus enfant : sert l'application sur la socket partagee"""
+    import uvicorn
+    import app
+
+    config = uvicorn.Config(app.app, log_level="warning")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+def spawn(sock):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            run_worker(sock)
+        finally:
+            os._exit(0)
+    return pid
+
+def main():
+    """Lance N workers uvicorn qui partagent une socket et, si possible, les poids
+
+    Avec MODEL_RUNTIME=tflite*, l'interprete lit le fichier .tflite par mmap :
+    les pages des poids sont partagees entre workers via le cache de pages,
+    et en mono-thread les modeles sont en plus charges avant le fork
+    (copy-on-write). Le runtime TensorFlow et les pools de threads XNNPACK ne
+    sont pas fork-safe une fois initialises : dans ces cas chaque worker
+    charge ses modeles apres le fork (--preload auto).
+    """
+    args = parse_args()
+    configure_threads(args)
+
+    import app
+
+    preload = args.preload == 'yes' or (
+        args.preload == 'auto' and args.runtime != 'keras' and args.threads == 1
+    )
+
+    print("\n" + "="*60)
+    print(f"Serveur multi-workers : {args.workers} workers, {args.threads} thread(s) chacun")
+    print(f"Runtime : {args.runtime} | Poids partages (pre-fork) : {'oui' if preload else 'non'}")
+    print(f"URL : http://{args.host}:{args.port}")
+    print("="*60)
+
+    if preload:
+        app.load_models(with_batchers=False)
+        app.STARTUP_MODE = "preloaded"
+
+    sock = bind_socket(args.host, args.port)
+    workers = {spawn(sock) for _ in range(args.workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} arrete (statut {status}), redemarrage")
+            time.sleep(1)
+            workers.add(spawn(sock))
+
+    sock.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from model_inputs import raw_inputs_timed
+from uploads import checked_inputs
+
+# Demi-vie du lissage temporel des probabilites (0 = pas de lissage)
+DEFAULT_SMOOTHING_MS = 300.0
+FRAME_FORMATS = ("image", "rgb")
+
+class TemporalSmoother:
+    """Moyenne mobile exponentielle des probabilites, ponderee par le temps
+
+    Le poids de l'historique depend du temps ecoule et non du nombre de
+    frames : le lissage est le meme a 5 ou a 30 images par seconde.
+    """
+
+    def __init__(self, half_life_ms=DEFAULT_SMOOTHING_MS):
+        self.half_life_ms = half_life_ms
+        self.state = None
+        self.updated_at = None
+
+    def reset(self):
+        self.state = None
+        self.updated_at = None
+
+    def update(self, probs, now):
+        probs = np.asarray(probs, dtype=np.float64)
+        if self.state is None or self.half_life_ms <= 0:
+            self.state = probs
+        else:
+            keep = 0.5 ** ((now - self.updated_at) * 1000 / self.half_life_ms)
+            self.state = keep * self.state + (1 - keep) * probs
+        self.updated_at = now
+        return self.state
+
+class StreamSession:
+    """Etat d'un client de /stream : dernier frame recu, messages de controle, lissage
+
+    Un seul frame en attente : un frame arrive pendant que le precedent est
+    classe le remplace (le plus ancien est abandonne). Le client qui envoie
+    plus vite que le serveur ne classe voit donc toujours son image la plus
+    recente, sans file qui s'allonge.
+
+    Les messages de controle sont appliques des leur reception : chaque
+    frame garde le format (layout) en vigueur quand il est arrive, meme si
+    un changement de format le suit avant qu'il soit classe.
+    """
+
+    def __init__(self, model="auto", smoothing_ms=DEFAULT_SMOOTHING_MS):
+        self.model = model
+        self.layout = None
+        self.smoother = TemporalSmoother(smoothing_ms)
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.closed = False
+        self.started = time.perf_counter()
+        self._frame = None
+        self._notices = deque()
+        self._event = asyncio.Event()
+
+    def put_frame(self, data):
+        """Depose un frame ; True si un frame non traite a ete remplace"""
+        replaced = self._frame is not None
+        if replaced:
+            self.dropped += 1
+        self._frame = (self.received, time.perf_counter(), data, self.layout)
+        self.received += 1
+        self._event.set()
+        return replaced
+
+    def reject_frame(self, error):
+        """Frame refuse a la reception : son numero est consomme, l'erreur renvoyee au client"""
+        self.put_notice({"frame": self.received, "error": error})
+        self.received += 1
+
+    def put_control(self, text):
+        """Applique un message de controle ; l'acquittement (ou l'erreur) part en notice"""
+        try:
+            self.put_notice({"config": self.configure(text)})
+        except ValueError as e:
+            self.put_notice({"error": str(e)})
+
+    def put_notice(self, message):
+        """Message du serveur a envoyer au client (erreur detectee a la reception)"""
+        self._notices.append(message)
+        self._event.set()
+
+    def close(self):
+        self.closed = True
+        self._event.set()
+
+    async def wait(self):
+        """Attend un frame, un message du serveur, ou la fermeture"""
+        while self._frame is None and not self._notices and not self.closed:
+            self._event.clear()
+            await self._event.wait()
+
+    def take_notices(self):
+        messages = list(self._notices)
+        self._notices.clear()
+        return messages
+
+    def take_frame(self):
+        """(numero, instant de reception, octets, layout) du dernier frame, ou None"""
+        frame, self._frame = self._frame, None
+        return frame
+
+    def configure(self, text):
+        """Applique un message JSON {"format", "width", "height", "model", "smoothing_ms"}
+
+        format "image" : frames JPEG/PNG/WEBP... ; "rgb" : pixels bruts
+        largeur x hauteur x 3 octets, ligne par ligne. Retourne la
+        configuration effective ; ValueError si le message est invalide.
+        """
+        try:
+            config = json.loads(text)
+        except ValueError:
+            raise ValueError("Message de controle JSON invalide")
+        if not isinstance(config, dict):
+            raise ValueError("Message de controle JSON invalide")
+
+        frame_format = config.get("format", "rgb" if self.layout else "image")
+        if frame_format not in FRAME_FORMATS:
+            raise ValueError(f"Format inconnu : {frame_format} ({', '.join(FRAME_FORMATS)})")
+        try:
+            if frame_format == "rgb":
+                layout = (int(config.get("width", 0)), int(config.get("height", 0)))
+                if min(layout) <= 0:
+                    raise ValueError
+            smoothing_ms = float(config.get("smoothing_ms", self.smoother.half_life_ms))
+        except (TypeError, ValueError):
+            raise ValueError("Format rgb : width et height entiers requis, smoothing_ms numerique")
+
+        self.layout = layout if frame_format == "rgb" else None
+        if "model" in config:
+            self.model = str(config["model"])
+        self.smoother.half_life_ms = smoothing_ms
+        self.smoother.reset()
+        return self.config()
+
+    def config(self):
+        return {
+            "format": "rgb" if self.layout else "image",
+            "width": self.layout[0] if self.layout else None,
+            "height": self.layout[1] if self.layout else None,
+            "model": self.model,
+            "smoothing_ms": self.smoother.half_life_ms
+        }
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "fps": round(self.processed / elapsed, 2) if elapsed > 0 else 0.0
+        }
+
+def frame_inputs(frame, layout, specs, max_pixels, scaled=True):
+    """Entrees des modeles pour un frame : image compressee, ou RGB brut si `layout` est fixe
+
+    Retourne (entrees, durees) comme build_inputs_timed ; executable dans
+    un executeur en processus.
+    """
+    if layout is None:
+        return checked_inputs(frame, specs, max_pixels, scaled)
+    return raw_inputs_timed(frame, layout, specs, scaled)
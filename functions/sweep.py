@@ -0,0 +1,246 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dataset_cache import build_cache
+
+CLASSES = ['apple', 'banana', 'carrot', 'orange', 'tomato']
+IMG_SIZE = (224, 224)
+REPORTS_DIR = 'reports'
+SWEEP_MODELS_DIR = 'models/sweep'
+
+# Espaces de recherche : arguments des fonctions create_*_model + taille de lot
+SPACES = {
+    "cnn": {
+        "learning_rate": [1e-3, 5e-4, 1e-4],
+        "conv_dropout": [0.1, 0.25],
+        "dense_units": [128, 256],
+        "dense_dropout": [0.3, 0.5],
+        "batch_size": [16, 32],
+    },
+    "ann": {
+        "learning_rate": [1e-3, 5e-4, 1e-4],
+        "dropout": [0.3, 0.5],
+        "ann_input": ["pixels:32", "pixels:56", "histogram:8"],
+        "batch_size": [16, 32],
+    },
+    "transfer": {
+        "learning_rate": [1e-3, 5e-4],
+        "dropout": [0.3, 0.5],
+        "head_units": [64, 128, 256],
+        "head_dropout": [0.2, 0.3],
+        "batch_size": [16, 32],
+    },
+}
+
+def sample_trials(space, trials, seed=0):
+    """Tire `trials` combinaisons distinctes de la grille (toutes si trials <= 0)"""
+    keys = list(space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+    if 0 < trials < len(grid):
+        grid = random.Random(seed).sample(grid, trials)
+    return grid
+
+def init_worker(threads):
+    """Limite les threads CPU du processus, avant l'import de tensorflow"""
+    threads = str(threads)
+    os.environ["OMP_NUM_THREADS"] = threads
+    os.environ["TF_NUM_INTRAOP_THREADS"] = threads
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(int(threads))
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+def should_prune(curve, others, epoch, grace, min_trials, floor):
+    """Regle de l'arret median
+
+    Apres `grace` epoques, un essai est arrete si sa meilleure precision de
+    validation est sous `floor` (a peine mieux que le hasard) ou sous la
+    mediane des meilleures precisions des autres essais a la meme epoque.
+    """
+    if epoch + 1 < grace:
+        return False
+    best = max(curve[:epoch + 1])
+    if best < floor:
+        return True
+
+    peers = sorted(max(c[:epoch + 1]) for c in others if len(c) > epoch)
+    if len(peers) < min_trials:
+        return False
+    return best < statistics.median(peers)
+
+def build_model(kind, params):
+    """Modele du type demande, avec les hyperparametres de l'essai"""
+    params = {k: v for k, v in params.items() if k != 'batch_size'}
+    if kind == "transfer":
+        import train_transfer_learning as module
+        model, _ = module.create_transfer_learning_model(**params)
+        return model
+    import train_models_complete as module
+    create = module.create_cnn_model if kind == "cnn" else module.create_ann_model
+    return create(**params)
+
+def run_trial(trial_id, kind, params, epochs, curves, prune, save):
+    """Un essai dans un processus du pool, sur le cache de dataset partage"""
+    import tensorflow as tf
+    import train_models_complete as training
+    from checkpoints import save_model_atomic
+    from model_inputs import serving_model
+
+    # Memmap uint8 deja construit par le processus parent : pas de redecodage
+    training.USE_DATASET_CACHE = True
+    training.INPUT_PIPELINE = 'generator'
+    training.BATCH_SIZE = params["batch_size"]
+    train_gen, val_gen = training.load_data()
+
+    model = build_model(kind, params)
+    curves[trial_id] = []
+    status = {"value": "completed"}
+
+    class Pruner(tf.keras.callbacks.Callback):
+        def on_epoch_end(self, epoch, logs=None):
+            curve = curves[trial_id] + [float(logs.get('val_accuracy', 0.0))]
+            curves[trial_id] = curve
+            others = [c for i, c in curves.items() if i != trial_id]
+            if prune and should_prune(curve, others, epoch, **prune):
+                status["value"] = "pruned"
+                self.model.stop_training = True
+
+    callbacks = [
+        tf.keras.callbacks.EarlyStopping(monitor='val_accuracy', patience=5,
+                                         restore_best_weights=True),
+        Pruner()
+    ]
+
+    start = time.perf_counter()
+    history = model.fit(train_gen, epochs=epochs, validation_data=val_gen,
+                        callbacks=callbacks, verbose=0).history
+    elapsed = time.perf_counter() - start
+
+    val_acc = history.get('val_accuracy', [0.0])
+    best_epoch = max(range(len(val_acc)), key=val_acc.__getitem__)
+    result = {
+        "trial": trial_id,
+        "model": kind,
+        "params": params,
+        "status": status["value"],
+        "epochs": len(val_acc),
+        "best_epoch": best_epoch + 1,
+        "val_accuracy": float(val_acc[best_epoch]),
+        "val_loss": float(history['val_loss'][best_epoch]),
+        "train_accuracy": float(history['accuracy'][best_epoch]),
+        "train_s": round(elapsed, 1),
+        "params_count": int(model.count_params()),
+        "curve": [float(v) for v in val_acc],
+    }
+
+    if save and status["value"] == "completed":
+        path = os.path.join(SWEEP_MODELS_DIR, f"{kind}_trial{trial_id:03d}.h5")
+        os.makedirs(SWEEP_MODELS_DIR, exist_ok=True)
+        save_model_atomic(serving_model(model), path)
+        result["file"] = path
+
+    return result
+
+def print_leaderboard(results, top=None):
+    ranked = sorted(results, key=lambda r: r["val_accuracy"], reverse=True)
+    print(f"\n{'#':>3} {'Essai':>5} {'Statut':<10} {'Val acc':>8} {'Epoques':>8} {'Temps':>7}  Parametres")
+    print("-"*70)
+    for rank, r in enumerate(ranked[:top], 1):
+        params = ", ".join(f"{k}={v}" for k, v in r["params"].items())
+        print(f"{rank:>3} {r['trial']:>5} {r['status']:<10} {r['val_accuracy']*100:7.2f}% "
+              f"{r['epochs']:>8} {r['train_s']:6.0f}s  {params}")
+    return ranked
+
+def main():
+    """Recherche d'hyperparametres en parallele, classement unique"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', choices=list(SPACES), default='cnn')
+    parser.add_argument('--trials', type=int, default=12, help="0 : toute la grille")
+    parser.add_argument('--epochs', type=int, default=15)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int,
+                        help="threads CPU par essai (defaut : coeurs / workers)")
+    parser.add_argument('--grace', type=int, default=3, help="epoques avant tout elagage")
+    parser.add_argument('--no-prune', action='store_true')
+    parser.add_argument('--save', action='store_true',
+                        help=f"sauvegarder les essais termines dans {SWEEP_MODELS_DIR}/")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+    trials = sample_trials(SPACES[args.model], args.trials, args.seed)
+
+    print("="*70)
+    print(f"RECHERCHE D'HYPERPARAMETRES : {args.model.upper()}")
+    print("="*70)
+    print(f"{len(trials)} essais, {args.workers} processus x {threads} threads, "
+          f"{args.epochs} epoques max")
+
+    # Decodage unique des images, partage par tous les essais (memmap)
+    for split in ('data/train', 'data/validation'):
+        build_cache(split, CLASSES, IMG_SIZE)
+
+    prune = None if args.no_prune else {
+        "grace": args.grace, "min_trials": 2, "floor": 1.5 / len(CLASSES)
+    }
+
+    # spawn : tensorflow n'est pas fork-safe une fois initialise
+    context = multiprocessing.get_context('spawn')
+    manager = context.Manager()
+    curves = manager.dict()
+    results = []
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context,
+                             initializer=init_worker, initargs=(threads,)) as pool:
+        futures = {
+            pool.submit(run_trial, i, args.model, params, args.epochs, curves, prune, args.save): i
+            for i, params in enumerate(trials)
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Essai {futures[future]} en erreur : {e}")
+                continue
+            results.append(result)
+            print(f"Essai {result['trial']} {result['status']} : "
+                  f"{result['val_accuracy']*100:.2f}% en {result['epochs']} epoques")
+
+    manager.shutdown()
+    total = time.perf_counter() - start
+
+    ranked = print_leaderboard(results)
+    pruned = sum(r["status"] == "pruned" for r in results)
+    print(f"\n{len(results)} essais en {total:.0f}s, {pruned} elagues")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "model": args.model,
+        "epochs": args.epochs,
+        "workers": args.workers,
+        "threads_per_worker": threads,
+        "prune": prune,
+        "total_s": round(total, 1),
+        "leaderboard": ranked
+    }
+    output = args.output or os.path.join(
+        REPORTS_DIR, f"sweep_{args.model}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Classement : {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules du serveur et de l'entrainement sont a plat dans functions/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
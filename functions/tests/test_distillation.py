@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+import train_distillation as distillation
+from checkpoints import save_model_atomic
+from model_inputs import input_spec
+from runtimes import load_any_model
+
+def tiny_teacher():
+    teacher = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(224, 224, 3)),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(len(distillation.CLASSES), activation='softmax')
+    ])
+    teacher.compile(loss='sparse_categorical_crossentropy')
+    return teacher
+
+def random_batches(count, batch_size=4, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.random((count * batch_size, 224, 224, 3), dtype=np.float32)
+    y = rng.integers(0, len(distillation.CLASSES), count * batch_size).astype(np.float32)
+    return tf.data.Dataset.from_tensor_slices((x, y)).batch(batch_size)
+
+def test_soft_loss_is_kl_divergence():
+    distiller = distillation.Distiller(distillation.create_student_model(), tiny_teacher(),
+                                       temperature=2.0)
+    teacher = tf.constant([[0.7, 0.1, 0.1, 0.05, 0.05]])
+    student = tf.constant([[0.2, 0.2, 0.2, 0.2, 0.2]])
+
+    teacher_log = distiller.soften(teacher)
+    soft = tf.reduce_sum(tf.exp(teacher_log) * (teacher_log - distiller.soften(student)), axis=-1)
+    expected = tf.keras.losses.KLDivergence()(tf.exp(teacher_log), tf.exp(distiller.soften(student)))
+
+    np.testing.assert_allclose(soft.numpy()[0], expected.numpy(), rtol=1e-4)
+    assert distiller.soften(teacher).numpy().max() < 0  # log-probabilites
+
+def test_distill_runs_one_fit_step(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    student, history = distillation.distill(
+        tiny_teacher(), random_batches(1), random_batches(1, seed=1), epochs=1
+    )
+
+    assert input_spec(student.input_shape) == ("image", (96, 96))
+    assert np.isfinite(history["loss"][0])
+    assert "val_accuracy" in history
+    probs = student.predict_on_batch(np.zeros((1, 96, 96, 3), dtype=np.float32))
+    np.testing.assert_allclose(probs.sum(), 1.0, rtol=1e-5)
+
+    save_model_atomic(student, str(tmp_path / "student_model.h5"))
+    reloaded = load_any_model(str(tmp_path / "student_model.h5"))
+    np.testing.assert_allclose(
+        reloaded.predict_on_batch(np.zeros((1, 96, 96, 3), dtype=np.float32)), probs, rtol=1e-5
+    )
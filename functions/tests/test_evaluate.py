@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+import evaluate as evaluation
+from checkpoints import save_model_atomic
+
+def small_cnn():
+    return tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(16, 16, 3)),
+        tf.keras.layers.Conv2D(4, 3),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(5, activation='softmax')
+    ])
+
+def small_ann():
+    return tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(16, 16, 3)),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(5, activation='softmax')
+    ])
+
+def write_report(tmp_path, accuracies):
+    """Rapport minimal : {nom: (fichier, precision test)}"""
+    report = {
+        "models": {name: {"file": str(path)} for name, (path, _) in accuracies.items()},
+        "splits": {"test": {name: {"accuracy": acc} for name, (_, acc) in accuracies.items()}}
+    }
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps(report))
+    return str(path)
+
+@pytest.fixture
+def model_files(tmp_path):
+    files = {"cnn": tmp_path / "candidate_cnn.h5", "ann": tmp_path / "candidate_ann.h5"}
+    save_model_atomic(small_cnn(), str(files["cnn"]))
+    save_model_atomic(small_ann(), str(files["ann"]))
+    return files
+
+def test_model_role_sees_nested_convolutions():
+    inputs = tf.keras.layers.Input(shape=(16, 16, 3))
+    outputs = tf.keras.layers.Dense(5)(small_cnn().layers[0](inputs))
+    assert evaluation.model_role(tf.keras.Model(inputs, outputs)) == 'cnn'
+    assert evaluation.model_role(small_ann()) == 'ann'
+
+def test_promote_skips_other_roles_and_formats(tmp_path, model_files):
+    report = write_report(tmp_path, {
+        "ann": (model_files["ann"], 0.99),
+        "color": (tmp_path / "color_model.npz", 0.98),
+        "tflite": (tmp_path / "cnn_model_int8.tflite", 0.97),
+        "cnn": (model_files["cnn"], 0.80)
+    })
+    target = tmp_path / "models" / "cnn_model.h5"
+    target.parent.mkdir()
+
+    choice = evaluation.promote(report, str(target))
+    assert choice["model"] == "cnn"
+    assert target.read_bytes() == model_files["cnn"].read_bytes()
+
+    ann_target = tmp_path / "models" / "ann_model.h5"
+    assert evaluation.promote(report, str(ann_target))["model"] == "ann"
+
+def test_promote_refuses_without_candidate(tmp_path, model_files):
+    report = write_report(tmp_path, {
+        "ann": (model_files["ann"], 0.99),
+        "color": (tmp_path / "color_model.npz", 0.98)
+    })
+    target = tmp_path / "cnn_model.h5"
+    with pytest.raises(ValueError, match="role cnn"):
+        evaluation.promote(report, str(target))
+    assert not target.exists()
+
+    with pytest.raises(ValueError, match="Emplacement inconnu"):
+        evaluation.promote(report, str(tmp_path / "other.h5"))
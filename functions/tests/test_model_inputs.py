@@ -0,0 +1,52 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from batcher import MicroBatcher
+from model_inputs import FULL_SPEC, InputBuffers, build_inputs_timed, stack_inputs
+
+class EchoModel:
+    """Renvoie son lot d'entree (copie) : montre ce que le modele a recu"""
+
+    def predict_on_batch(self, x):
+        return np.array(x)
+
+def jpeg_bytes(seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 256, (180, 240, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format='JPEG')
+    return buf.getvalue()
+
+def test_unscaled_inputs_match_scaled_after_stacking():
+    specs = [FULL_SPEC, ("image", (96, 96)), ("histogram", 8)]
+    scaled, _ = build_inputs_timed(jpeg_bytes(), specs)
+    raw, _ = build_inputs_timed(jpeg_bytes(), specs, scaled=False)
+
+    assert raw[FULL_SPEC].dtype == np.uint8
+    assert raw[("histogram", 8)].dtype == np.float32
+    for spec in specs:
+        out = np.empty((2, *scaled[spec].shape[1:]), dtype=np.float32)
+        stacked = stack_inputs([raw[spec]], out)
+        assert stacked.shape == scaled[spec].shape
+        np.testing.assert_allclose(stacked, scaled[spec], atol=1e-7)
+
+def test_input_buffers_reuse_the_thread_buffer():
+    buffers = InputBuffers()
+    images = [np.full((1, 4, 4, 3), value, dtype=np.uint8) for value in (0, 255, 51)]
+
+    first = buffers.stack(images)
+    np.testing.assert_allclose(first[:, 0, 0, 0], [0.0, 1.0, 0.2], atol=1e-7)
+    second = buffers.stack(images[:2])
+    assert second.dtype == np.float32 and len(second) == 2
+    assert np.shares_memory(first, second)
+
+def test_batcher_scales_uint8_inputs():
+    batcher = MicroBatcher(EchoModel(), "echo", max_batch_size=4, max_wait_ms=1)
+    try:
+        x = np.full((1, 4, 4, 3), 255, dtype=np.uint8)
+        result = batcher.submit(x).result(timeout=5)
+    finally:
+        batcher.close()
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result, 1.0)
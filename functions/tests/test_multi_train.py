@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+import train_models_complete as training
+from checkpoints import TrainingCheckpoint
+from multi_train import train_lockstep
+
+def random_batches(count, batch_size=4, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.random((count * batch_size, 224, 224, 3), dtype=np.float32)
+    y = rng.integers(0, len(training.CLASSES), count * batch_size).astype(np.float32)
+    return tf.data.Dataset.from_tensor_slices((x, y)).batch(batch_size)
+
+def test_train_lockstep_runs_one_epoch():
+    train, val = random_batches(2), random_batches(1, seed=1)
+    histories = train_lockstep(
+        {
+            "CNN": (training.create_cnn_model(dense_units=8), training.create_callbacks()),
+            "ANN": (training.create_ann_model(), training.create_callbacks())
+        },
+        train, val, epochs=1
+    )
+
+    for history in histories.values():
+        for key in ("loss", "accuracy", "val_loss", "val_accuracy"):
+            assert len(history.history[key]) == 1
+            assert np.isfinite(history.history[key][0])
+
+def test_train_lockstep_models_saves_both_models(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(training, "EPOCHS", 1)
+
+    training.train_lockstep_models(random_batches(2), random_batches(1, seed=1))
+
+    assert (tmp_path / "models" / "cnn_model.h5").exists()
+    assert (tmp_path / "models" / "ann_model.h5").exists()
+
+def small_model():
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(224, 224, 3)),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(len(training.CLASSES), activation='softmax')
+    ])
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+class Interrupt(tf.keras.callbacks.Callback):
+    """Arrete le processus a la fin d'une epoque, apres le checkpoint de ce modele"""
+
+    def __init__(self, epoch):
+        super().__init__()
+        self.epoch = epoch
+
+    def on_epoch_end(self, epoch, logs=None):
+        if epoch == self.epoch:
+            raise KeyboardInterrupt
+
+def test_train_lockstep_resumes_checkpoints_at_different_epochs(tmp_path):
+    train, val = random_batches(1), random_batches(1, seed=1)
+
+    def checkpoints(resume):
+        return {name: TrainingCheckpoint(name, [tf.keras.callbacks.ReduceLROnPlateau(patience=5)],
+                                         resume=resume, directory=str(tmp_path))
+                for name in ("A", "B")}
+
+    # Interrompu apres le checkpoint de A a l'epoque 2, avant celui de B
+    first = checkpoints(resume=False)
+    runs = {name: (small_model(), c.callbacks) for name, c in first.items()}
+    for name, (model, _) in runs.items():
+        first[name].prepare(model)
+    runs["A"][1].append(Interrupt(1))
+    with pytest.raises(KeyboardInterrupt):
+        train_lockstep(runs, train, val, epochs=3, parallel=False)
+
+    resumed = checkpoints(resume=True)
+    models = {name: small_model() for name in resumed}
+    initial = {name: c.prepare(models[name]) for name, c in resumed.items()}
+    assert initial == {"A": 2, "B": 1}
+
+    histories = train_lockstep(
+        {name: (models[name], c.callbacks) for name, c in resumed.items()},
+        train, val, epochs=3, parallel=False, initial_epoch=initial
+    )
+
+    assert histories["A"].epoch == [2]
+    assert histories["B"].epoch == [1, 2]
+    for c in resumed.values():
+        assert len(c.history["val_loss"]) == 3
@@ -0,0 +1,34 @@
+import os
+
+from registry import ModelRegistry, file_version
+
+def replace_file(path, data):
+    """Ecriture atomique, comme save_model_atomic"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def test_reload_sees_same_size_rewrite_within_one_second(tmp_path):
+    path = str(tmp_path / "model.h5")
+    replace_file(path, b"old weights")
+    registry = ModelRegistry({"CNN": path}, loader=lambda p: open(p, 'rb').read())
+    registry.load_all(with_batchers=False)
+    loaded = os.stat(path)
+
+    replace_file(path, b"new weights")
+    # Meme seconde, meme taille : seuls les nanosecondes et l'inode different
+    os.utime(path, ns=(loaded.st_atime_ns, loaded.st_mtime_ns + 1))
+
+    assert registry.reload()["CNN"]["status"] == "reloaded"
+    assert registry.get("CNN").model == b"new weights"
+    assert registry.reload()["CNN"]["status"] == "unchanged"
+
+def test_file_version_changes_on_in_place_rewrite(tmp_path):
+    path = tmp_path / "model.h5"
+    path.write_bytes(b"old weights")
+    stat = os.stat(path)
+    before = file_version(path)
+    path.write_bytes(b"new weights")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert file_version(path) != before
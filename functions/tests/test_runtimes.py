@@ -0,0 +1,7 @@
+from runtimes import TFLITE_VARIANTS, path_runtime, tflite_path_for
+
+def test_path_runtime_round_trips_tflite_variants():
+    for runtime in TFLITE_VARIANTS:
+        assert path_runtime(tflite_path_for('models/cnn_model.h5', runtime)) == runtime
+    assert path_runtime('models/cnn_model.h5') == 'keras'
+    assert path_runtime('models/color_model.npz') == 'color'
@@ -0,0 +1,36 @@
+import io
+import json
+
+import numpy as np
+from PIL import Image
+
+from model_inputs import FULL_SPEC
+from streaming import StreamSession, frame_inputs
+
+def jpeg_frame(size=(64, 48)):
+    pixels = np.random.default_rng(0).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format='JPEG')
+    return buf.getvalue()
+
+def test_frame_keeps_its_format_when_control_follows():
+    session = StreamSession()
+    session.put_frame(jpeg_frame())
+    session.put_control(json.dumps({"format": "rgb", "width": 4, "height": 2}))
+
+    index, _, data, layout = session.take_frame()
+    assert index == 0 and layout is None
+    inputs, _ = frame_inputs(data, layout, [FULL_SPEC], 0)
+    assert inputs[FULL_SPEC].shape == (1, 224, 224, 3)
+
+    session.put_frame(bytes(4 * 2 * 3))
+    assert session.take_frame()[3] == (4, 2)
+    assert session.take_notices() == [{"config": session.config()}]
+
+def test_invalid_control_is_reported_without_changing_format():
+    session = StreamSession()
+    session.put_control(json.dumps({"format": "rgb"}))
+    notices = session.take_notices()
+    assert len(notices) == 1 and "error" in notices[0]
+    session.put_frame(jpeg_frame())
+    assert session.take_frame()[3] is None
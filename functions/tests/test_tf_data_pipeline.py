@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+pytest.importorskip("scipy")
+image_preprocessing = pytest.importorskip("keras.src.legacy.preprocessing.image")
+
+from tf_data_pipeline import adjust_brightness, affine_matrices
+
+def smooth_image(height, width, seed=0):
+    """Degrades lisses : l'interpolation bilineaire de TF et scipy y coincide"""
+    rows, cols = np.meshgrid(np.linspace(0, 1, height), np.linspace(0, 1, width), indexing='ij')
+    rng = np.random.default_rng(seed)
+    weights = rng.random((3, 3))
+    return np.stack([w[0] * rows + w[1] * cols + w[2] * rows * cols for w in weights],
+                    axis=-1).astype(np.float32)
+
+def transform(image, **params):
+    height, width = image.shape[:2]
+    matrix = affine_matrices(
+        *(tf.constant([float(params.get(name, default))])
+          for name, default in (("theta", 0), ("tx", 0), ("ty", 0), ("shear", 0),
+                                ("zx", 1), ("zy", 1))),
+        float(height), float(width)
+    )
+    out = tf.raw_ops.ImageProjectiveTransformV3(
+        images=image[None], transforms=matrix, output_shape=[height, width],
+        fill_value=0.0, interpolation="BILINEAR", fill_mode="NEAREST"
+    )
+    return out[0].numpy()
+
+@pytest.mark.parametrize("params", [
+    {"theta": 25},
+    {"tx": 6},
+    {"ty": -4},
+    {"shear": 15},
+    {"zx": 0.8, "zy": 1.2},
+    {"theta": -30, "tx": 3, "ty": 5, "shear": 10, "zx": 1.1, "zy": 0.9},
+])
+def test_affine_matches_keras(params):
+    image = smooth_image(40, 40)
+    expected = image_preprocessing.apply_affine_transform(
+        image, row_axis=0, col_axis=1, channel_axis=2, fill_mode='nearest', order=1, **params
+    )
+    np.testing.assert_allclose(transform(image, **params), expected, atol=1e-4)
+
+def test_height_shift_moves_columns_like_keras():
+    image = np.zeros((20, 20, 1), dtype=np.float32)
+    image[:, 10] = 1.0
+    shifted = transform(image, tx=3)
+    # Keras : tx (height_shift_range) deplace les colonnes
+    assert shifted[:, 7].min() == 1.0
+    assert shifted[:, 10].max() == 0.0
+
+def test_brightness_matches_keras():
+    rng = np.random.default_rng(0)
+    image = rng.integers(20, 200, (16, 16, 3)).astype(np.float32)
+    for factor in (0.7, 1.0, 1.3):
+        # Keras travaille sur 0..255 puis la mise a l'echelle 1/255 vient apres
+        expected = image_preprocessing.apply_brightness_shift(image, factor) / 255.0
+        result = adjust_brightness(tf.constant(image[None] / 255.0), factor)[0].numpy()
+        # Keras quantifie deux fois en uint8 (array_to_img puis PIL)
+        np.testing.assert_allclose(result, expected, atol=2.5 / 255)
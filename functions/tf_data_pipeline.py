@@ -0,0 +1,216 @@
+import math
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from dataset_cache import list_split, load_cache
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+def augmentation_from_datagen(datagen):
+    """Reprend la configuration d'un ImageDataGenerator existant"""
+    return {
+        "rotation_range": datagen.rotation_range,
+        "width_shift_range": datagen.width_shift_range,
+        "height_shift_range": datagen.height_shift_range,
+        "shear_range": datagen.shear_range,
+        "zoom_range": list(datagen.zoom_range),
+        "horizontal_flip": datagen.horizontal_flip,
+        "vertical_flip": datagen.vertical_flip,
+        "brightness_range": datagen.brightness_range,
+        "rescale": datagen.rescale or 1.0,
+    }
+
+def _uniform(batch_size, low, high):
+    return tf.random.uniform([batch_size], low, high)
+
+def _matrices(rows):
+    """Empile des lignes [B, 3] en matrices [B, 3, 3]"""
+    return tf.stack([tf.stack(row, axis=-1) for row in rows], axis=1)
+
+def affine_matrices(theta, tx, ty, shear, zx, zy, height, width):
+    """Matrices au format de ImageProjectiveTransformV3 pour des parametres donnes
+
+    Meme composition que apply_affine_transform de Keras (angles en degres,
+    `tx` / `ty` en pixels) : rotation, translation, cisaillement puis zoom,
+    centres sur l'image. La matrice de Keras est deja en coordonnees (x, y)
+    (Keras l'echange avant scipy, qui travaille en (ligne, colonne)) : elle
+    s'utilise telle quelle. Comme dans Keras, `tx` (height_shift_range)
+    deplace l'image le long des colonnes.
+    """
+    zeros = tf.zeros_like(theta)
+    ones = tf.ones_like(theta)
+    theta = theta * math.pi / 180
+    shear = shear * math.pi / 180
+
+    rotation = _matrices([[tf.cos(theta), -tf.sin(theta), zeros],
+                          [tf.sin(theta), tf.cos(theta), zeros],
+                          [zeros, zeros, ones]])
+    shift = _matrices([[ones, zeros, tx], [zeros, ones, ty], [zeros, zeros, ones]])
+    shearing = _matrices([[ones, -tf.sin(shear), zeros],
+                          [zeros, tf.cos(shear), zeros],
+                          [zeros, zeros, ones]])
+    zoom = _matrices([[zx, zeros, zeros], [zeros, zy, zeros], [zeros, zeros, ones]])
+
+    # transform_matrix_offset_center de Keras (o_x d'apres la hauteur, o_y d'apres la largeur)
+    o_x = height / 2 - 0.5
+    o_y = width / 2 - 0.5
+    offset = tf.reshape(tf.stack([1.0, 0.0, o_x, 0.0, 1.0, o_y, 0.0, 0.0, 1.0]), [3, 3])
+    reset = tf.reshape(tf.stack([1.0, 0.0, -o_x, 0.0, 1.0, -o_y, 0.0, 0.0, 1.0]), [3, 3])
+
+    m = offset @ rotation @ shift @ shearing @ zoom @ reset
+
+    return tf.stack([m[:, 0, 0], m[:, 0, 1], m[:, 0, 2],
+                     m[:, 1, 0], m[:, 1, 1], m[:, 1, 2],
+                     zeros, zeros], axis=-1)
+
+def affine_transforms(batch_size, height, width, config):
+    """Matrices de transformation par image, tirees comme dans get_random_transform"""
+    theta = _uniform(batch_size, -config["rotation_range"], config["rotation_range"])
+    tx = _uniform(batch_size, -config["height_shift_range"], config["height_shift_range"]) * height
+    ty = _uniform(batch_size, -config["width_shift_range"], config["width_shift_range"]) * width
+    shear = _uniform(batch_size, -config["shear_range"], config["shear_range"])
+    zoom_low, zoom_high = config["zoom_range"]
+    zx = _uniform(batch_size, zoom_low, zoom_high)
+    zy = _uniform(batch_size, zoom_low, zoom_high)
+    return affine_matrices(theta, tx, ty, shear, zx, zy, height, width)
+
+def adjust_brightness(images, factor):
+    """Luminosite comme apply_brightness_shift de Keras, sans l'arrondi en uint8 de PIL
+
+    Keras passe par array_to_img(scale=True) : chaque image est d'abord
+    etiree sur toute la plage (min -> 0, max -> 1), puis multipliee par
+    `factor` et ecretee. Le resultat reste dans [0, 1].
+    """
+    low = tf.reduce_min(images, axis=[1, 2, 3], keepdims=True)
+    high = tf.reduce_max(images, axis=[1, 2, 3], keepdims=True)
+    stretched = tf.math.divide_no_nan(images - low, high - low)
+    return tf.clip_by_value(stretched * factor, 0.0, 1.0)
+
+def augment_batch(images, config):
+    """Augmentation vectorisee d'un lot float32 [B, H, W, 3] dans [0, 1]"""
+    shape = tf.shape(images)
+    batch_size, height, width = shape[0], shape[1], shape[2]
+
+    transforms = affine_transforms(
+        batch_size, tf.cast(height, tf.float32), tf.cast(width, tf.float32), config
+    )
+    images = tf.raw_ops.ImageProjectiveTransformV3(
+        images=images, transforms=transforms, output_shape=shape[1:3],
+        fill_value=0.0, interpolation="BILINEAR", fill_mode="NEAREST"
+    )
+
+    if config["horizontal_flip"]:
+        flip = tf.random.uniform([batch_size, 1, 1, 1]) < 0.5
+        images = tf.where(flip, tf.reverse(images, axis=[2]), images)
+    if config["vertical_flip"]:
+        flip = tf.random.uniform([batch_size, 1, 1, 1]) < 0.5
+        images = tf.where(flip, tf.reverse(images, axis=[1]), images)
+
+    if config["brightness_range"] is not None:
+        low, high = config["brightness_range"]
+        factor = tf.random.uniform([batch_size, 1, 1, 1], low, high)
+        images = adjust_brightness(images, factor)
+
+    return images
+
+def _decode(path, label, image_size):
+    data = tf.io.read_file(path)
+    image = tf.io.decode_image(data, channels=3, expand_animations=False)
+    image = tf.image.resize(image, (image_size[1], image_size[0]), method='nearest')
+    return tf.cast(image, tf.uint8), label
+
+def source_dataset(split_dir, classes, image_size, use_cache):
+    """Images uint8 deja redimensionnees : cache disque ou decodage parallele"""
+    if use_cache:
+        images, labels = load_cache(split_dir, classes, image_size)
+        ds = tf.data.Dataset.from_tensor_slices((np.asarray(images), labels))
+        return ds, len(labels)
+
+    files = list_split(split_dir, classes)
+    paths = [os.path.join(split_dir, rel_path) for rel_path, _ in files]
+    labels = np.array([label for _, label in files], dtype=np.float32)
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    ds = ds.map(lambda p, y: _decode(p, y, image_size), num_parallel_calls=AUTOTUNE)
+    return ds.cache(), len(files)
+
+def make_datasets(train_datagen, val_datagen, classes, image_size, batch_size,
+                  use_cache=True, train_dir='data/train', val_dir='data/validation'):
+    """Pipelines tf.data train / validation equivalents aux generateurs Keras
+
+    Retourne (train_ds, val_ds, nb_train, nb_val).
+    """
+    config = augmentation_from_datagen(train_datagen)
+    val_scale = val_datagen.rescale or 1.0
+
+    train_ds, n_train = source_dataset(train_dir, classes, image_size, use_cache)
+    train_ds = (
+        train_ds
+        .shuffle(n_train, reshuffle_each_iteration=True)
+        .batch(batch_size)
+        .map(lambda x, y: (augment_batch(tf.cast(x, tf.float32) * config["rescale"], config), y),
+             num_parallel_calls=AUTOTUNE)
+        .prefetch(AUTOTUNE)
+    )
+
+    val_ds, n_val = source_dataset(val_dir, classes, image_size, use_cache)
+    val_ds = (
+        val_ds
+        .batch(batch_size)
+        .map(lambda x, y: (tf.cast(x, tf.float32) * val_scale, y), num_parallel_calls=AUTOTUNE)
+        .cache()
+        .prefetch(AUTOTUNE)
+    )
+
+    return train_ds, val_ds, n_train, n_val
+
+def iter_batches(data):
+    """Lots (x, y) d'une epoque, pour un tf.data.Dataset ou un generateur Keras"""
+    if isinstance(data, tf.data.Dataset):
+        yield from data
+        return
+
+    # Generateurs Keras : iterateurs infinis, on s'arrete a len()
+    for i in range(len(data)):
+        yield data[i]
+    if hasattr(data, 'on_epoch_end'):
+        data.on_epoch_end()
+
+def iterate_epoch(train_ds):
+    """Produit tous les lots d'une epoque, retourne (nb de lots, dernier lot)"""
+    steps = 0
+    batch = None
+    for batch in iter_batches(train_ds):
+        steps += 1
+    return steps, batch
+
+def profile_epoch(model, train_ds):
+    """Separe le temps d'entree et le temps de calcul d'une epoque
+
+    - entree : iteration du dataset seule
+    - calcul : model.fit sur un lot deja en memoire, repete autant de fois
+    - total : model.fit reel
+    Fonctionne avec un tf.data.Dataset comme avec un generateur Keras.
+    """
+    start = time.perf_counter()
+    steps, batch = iterate_epoch(train_ds)
+    input_time = time.perf_counter() - start
+
+    repeated = tf.data.Dataset.from_tensors(batch).repeat(steps)
+    start = time.perf_counter()
+    model.fit(repeated, epochs=1, verbose=0)
+    compute_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model.fit(train_ds, epochs=1, verbose=0)
+    total_time = time.perf_counter() - start
+
+    return {
+        "steps": steps,
+        "input_s": input_time,
+        "compute_s": compute_time,
+        "total_s": total_time,
+        "bound": "entree" if input_time > compute_time else "calcul"
+    }
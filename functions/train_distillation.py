@@ -0,0 +1,227 @@
+import tensorflow as tf
+from tensorflow.keras import layers
+import argparse
+import json
+import os
+import time
+
+import train_models_complete as training
+import evaluate as evaluation
+from cascade import single_image_cost
+from checkpoints import TrainingCheckpoint, save_model_atomic
+from export_tflite import export_model
+from model_inputs import (
+    input_spec, parse_spec, pixels_to_input, serving_model, spec_name, spec_shape, with_adapter
+)
+from runtimes import load_any_model
+
+CLASSES = ['apple', 'banana', 'carrot', 'orange', 'tomato']
+TEACHER_PATH = 'models/cnn_model.h5'
+STUDENT_PATH = 'models/student_model.h5'
+REPORTS_DIR = 'reports'
+# Entree de l'eleve : image reduite (l'adaptateur 224 -> N est retire a la sauvegarde)
+STUDENT_INPUT = os.environ.get('STUDENT_INPUT', 'pixels:96')
+TEMPERATURE = float(os.environ.get('DISTILL_TEMPERATURE', 4.0))
+# Poids des vrais labels dans la perte (le reste : cibles adoucies du professeur)
+ALPHA = float(os.environ.get('DISTILL_ALPHA', 0.1))
+
+def create_student_model(student_input=None, filters=(16, 32, 64, 64), dropout=0.2,
+                         learning_rate=0.002):
+    """CNN compact : un conv par bloc, moitie moins de filtres que create_cnn_model, sans Flatten"""
+    spec = parse_spec(student_input or STUDENT_INPUT)
+    stack = [layers.Input(shape=spec_shape(spec))]
+    for i, n in enumerate(filters):
+        stack += [
+            layers.Conv2D(n, (3, 3), padding='same', use_bias=False),
+            layers.BatchNormalization(),
+            layers.ReLU(),
+        ]
+        if i < len(filters) - 1:
+            stack.append(layers.MaxPooling2D((2, 2)))
+    stack += [
+        layers.GlobalAveragePooling2D(),
+        layers.Dropout(dropout),
+        layers.Dense(len(CLASSES), activation='softmax')
+    ]
+
+    student = tf.keras.Sequential(stack, name='student')
+    student.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    return with_adapter(student, spec)
+
+class Distiller(tf.keras.Model):
+    """Entraine l'eleve sur les sorties adoucies du professeur et sur les vrais labels
+
+    Perte : alpha * CE(labels, eleve) + (1 - alpha) * T^2 * KL(prof_T || eleve_T),
+    ou x_T = softmax(log(x) / T). Le professeur voit les memes images
+    augmentees que l'eleve, a chaque pas (pas de cibles figees).
+    """
+
+    def __init__(self, student, teacher, temperature=TEMPERATURE, alpha=ALPHA):
+        super().__init__(name='distiller')
+        self.student = student
+        self.teacher = teacher
+        self.teacher.trainable = False
+        self.temperature = temperature
+        self.alpha = alpha
+        self.loss_tracker = tf.keras.metrics.Mean(name='loss')
+        self.accuracy_tracker = tf.keras.metrics.SparseCategoricalAccuracy(name='accuracy')
+
+    @property
+    def metrics(self):
+        return [self.loss_tracker, self.accuracy_tracker]
+
+    def soften(self, probs):
+        """Log-probabilites adoucies log(x_T), a partir de probabilites (sorties softmax)"""
+        log_probs = tf.math.log(tf.clip_by_value(probs, 1e-7, 1.0))
+        return tf.nn.log_softmax(log_probs / self.temperature)
+
+    def call(self, x, training=False):
+        return self.student(x, training=training)
+
+    def train_step(self, data):
+        x, y = data
+        teacher_probs = self.teacher(x, training=False)
+
+        with tf.GradientTape() as tape:
+            student_probs = self.student(x, training=True)
+            hard = tf.keras.losses.sparse_categorical_crossentropy(y, student_probs)
+            teacher_log = self.soften(teacher_probs)
+            soft = tf.reduce_sum(
+                tf.exp(teacher_log) * (teacher_log - self.soften(student_probs)), axis=-1
+            )
+            loss = tf.reduce_mean(
+                self.alpha * hard + (1 - self.alpha) * self.temperature ** 2 * soft
+            )
+
+        variables = self.student.trainable_variables
+        self.optimizer.apply_gradients(zip(tape.gradient(loss, variables), variables))
+
+        self.loss_tracker.update_state(loss)
+        self.accuracy_tracker.update_state(y, student_probs)
+        return {m.name: m.result() for m in self.metrics}
+
+    def test_step(self, data):
+        x, y = data
+        student_probs = self.student(x, training=False)
+        self.loss_tracker.update_state(
+            tf.reduce_mean(tf.keras.losses.sparse_categorical_crossentropy(y, student_probs))
+        )
+        self.accuracy_tracker.update_state(y, student_probs)
+        return {m.name: m.result() for m in self.metrics}
+
+def distill(teacher, train_gen, val_gen, epochs, resume=False):
+    """Entraine l'eleve par distillation (checkpoint a chaque epoque, reprise avec resume)"""
+    student = create_student_model()
+    distiller = Distiller(student, teacher)
+    distiller.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=0.002))
+
+    checkpoint = TrainingCheckpoint('distill_student', training.create_callbacks(),
+                                    data=train_gen, resume=resume)
+    initial_epoch = checkpoint.prepare(distiller)
+
+    if not checkpoint.finished:
+        distiller.fit(
+            train_gen,
+            epochs=epochs,
+            initial_epoch=initial_epoch,
+            validation_data=val_gen,
+            callbacks=checkpoint.callbacks,
+            verbose=1
+        )
+
+    return serving_model(student), checkpoint.history
+
+def compare_models(models, splits):
+    """Tableau taille / latence / precision : {nom: (modele, chemin)}"""
+    report = evaluation.evaluate(models, splits)
+    pixels, _ = next(evaluation.split_batches(splits[0], batch_size=1))
+
+    rows = {}
+    for name, (model, path) in models.items():
+        spec = input_spec(model.input_shape)
+        rows[name] = {
+            "file": path,
+            "input": spec_name(spec),
+            "params": int(model.count_params()),
+            "size_mb": report["models"][name]["size_mb"],
+            "image_ms": single_image_cost(model, pixels_to_input(pixels, spec)),
+            "images_per_sec": {split: results[name]["latency"]["images_per_sec"]
+                               for split, results in report["splits"].items()},
+            "accuracy": {split: results[name]["accuracy"]
+                         for split, results in report["splits"].items()}
+        }
+
+    split_names = list(report["splits"])
+    print(f"\n{'Modele':<10} {'Entree':<10} {'Parametres':>12} {'Fichier':>10} {'1 image':>10} "
+          f"{'Lot img/s':>10} " + " ".join(f"{s[:10]:>10}" for s in split_names))
+    for name, row in rows.items():
+        print(f"{name:<10} {row['input']:<10} {row['params']:>12,} {row['size_mb']:8.2f}Mo "
+              f"{row['image_ms']:8.2f}ms {row['images_per_sec'][split_names[0]]:10.1f} "
+              + " ".join(f"{row['accuracy'][s] * 100:9.2f}%" for s in split_names))
+
+    if "teacher" in rows and "student" in rows:
+        teacher, student = rows["teacher"], rows["student"]
+        print(f"\nEleve : {student['params'] / teacher['params'] * 100:.1f}% des parametres, "
+              f"{student['size_mb'] / teacher['size_mb'] * 100:.1f}% de la taille, "
+              f"latence x{student['image_ms'] / teacher['image_ms']:.2f}")
+    return rows
+
+def main():
+    """Distillation du modele Transfer Learning (professeur) vers un CNN compact (eleve)"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--teacher', default=TEACHER_PATH,
+                        help="modele professeur (MobileNetV2 de train_transfer_learning.py)")
+    parser.add_argument('--output', default=STUDENT_PATH)
+    parser.add_argument('--epochs', type=int, default=40)
+    parser.add_argument('--resume', action='store_true',
+                        help="reprendre depuis le dernier checkpoint (checkpoints/)")
+    parser.add_argument('--splits', nargs='+', default=['data/validation', 'data/test'])
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("DISTILLATION : PROFESSEUR -> ELEVE COMPACT")
+    print("="*70)
+
+    if not os.path.exists(args.teacher):
+        print(f"Professeur non trouve : {args.teacher}")
+        print("Executez : python train_transfer_learning.py")
+        return
+
+    teacher = load_any_model(args.teacher)
+    print(f"Professeur : {args.teacher} ({teacher.count_params():,} parametres)")
+    print(f"Eleve : entree {STUDENT_INPUT}, temperature {TEMPERATURE}, alpha {ALPHA}")
+
+    # Memes images augmentees que l'entrainement du CNN, en 224x224 (l'adaptateur reduit)
+    train_gen, val_gen = training.load_data()
+
+    student, history = distill(teacher, train_gen, val_gen, args.epochs, args.resume)
+    save_model_atomic(student, args.output)
+    print(f"\nEleve sauvegarde : {args.output} "
+          f"(meilleure precision validation {max(history['val_accuracy']) * 100:.2f}%)")
+
+    # Artefacts d'inference (TFLite float32 / float16 / int8)
+    export_model(args.output)
+
+    print("\n" + "="*70)
+    print("PROFESSEUR vs ELEVE")
+    print("="*70)
+    rows = compare_models({
+        "teacher": (teacher, args.teacher),
+        "student": (load_any_model(args.output), args.output)
+    }, args.splits)
+
+    output = os.path.join(REPORTS_DIR, f"distill_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({"temperature": TEMPERATURE, "alpha": ALPHA, "student_input": STUDENT_INPUT,
+                   "epochs": len(history['val_accuracy']), "models": rows}, f, indent=2)
+    print(f"\nRapport : {output}")
+    print(f"Servi par app.py sous STUDENT ; pour remplacer le CNN : "
+          f"python evaluate.py {args.teacher} {args.output} puis --promote")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,18 @@
 import tensorflow as tf
 from tensorflow.keras import layers
+import argparse
 import numpy as np
 import os
 
+from export_tflite import export_model
+from dataset_cache import cached_generators
+from tf_data_pipeline import make_datasets
+from multi_train import train_lockstep
+from checkpoints import TrainingCheckpoint, save_model_atomic
+from model_inputs import parse_spec, spec_shape, with_adapter, serving_model
+from fallback import fit_color_classifier
+import evaluate as evaluation
+
 print("="*70)
 print("ENTRAINEMENT DES MODELES CNN ET ANN")
 print("="*70)
@@ -12,6 +22,14 @@ IMG_SIZE = (224, 224)
 BATCH_SIZE = 16  # Réduit
 EPOCHS = 30  # Augmenté
 CLASSES = ['apple', 'banana', 'carrot', 'orange', 'tomato']
+# Images decodees une seule fois dans cache/ (DATASET_CACHE=0 pour flow_from_directory)
+USE_DATASET_CACHE = os.environ.get('DATASET_CACHE', '1') == '1'
+# Pipeline d'entree : generator (ImageDataGenerator) ou tfdata (augmentation parallele)
+INPUT_PIPELINE = os.environ.get('INPUT_PIPELINE', 'generator')
+# CNN et ANN entraines ensemble sur les memes lots (LOCKSTEP=0 : l'un apres l'autre)
+LOCKSTEP = os.environ.get('LOCKSTEP', '1') == '1'
+# Entree de l'ANN : pixels:32 (image reduite), histogram:8 (histogramme RGB) ou full (224x224)
+ANN_INPUT = os.environ.get('ANN_INPUT', 'pixels:32')
 
 def check_dataset():
     """Verifie si le dataset existe"""
@@ -61,6 +79,22 @@ def load_data():
         rescale=1./255
     )
 
+    if INPUT_PIPELINE == 'tfdata':
+        train_ds, val_ds, n_train, n_val = make_datasets(
+            train_datagen, val_datagen, CLASSES, IMG_SIZE, BATCH_SIZE, use_cache=USE_DATASET_CACHE
+        )
+        print(f"{n_train} images entrainement (tf.data)")
+        print(f"{n_val} images validation (tf.data)")
+        return train_ds, val_ds
+
+    if USE_DATASET_CACHE:
+        train_generator, val_generator = cached_generators(
+            train_datagen, val_datagen, CLASSES, IMG_SIZE, BATCH_SIZE
+        )
+        print(f"{train_generator.samples} images entrainement (cache)")
+        print(f"{val_generator.samples} images validation (cache)")
+        return train_generator, val_generator
+
     train_generator = train_datagen.flow_from_directory(
         'data/train',
         target_size=IMG_SIZE,
@@ -84,8 +118,8 @@ def load_data():
 
     return train_generator, val_generator
 
-def create_cnn_model():
-    """Cree le modele CNN"""
+def create_cnn_model(learning_rate=0.001, conv_dropout=0.25, dense_units=256, dense_dropout=0.5):
+    """Cree le modele CNN (hyperparametres par defaut : ceux de l'entrainement)"""
     print("\nCreation du modele CNN...")
 
     model = tf.keras.Sequential([
@@ -95,50 +129,43 @@ def create_cnn_model():
         layers.BatchNormalization(),
         layers.Conv2D(32, (3, 3), activation='relu', padding='same'),
         layers.MaxPooling2D((2, 2)),
-        layers.Dropout(0.25),
+        layers.Dropout(conv_dropout),
 
         layers.Conv2D(64, (3, 3), activation='relu', padding='same'),
         layers.BatchNormalization(),
         layers.Conv2D(64, (3, 3), activation='relu', padding='same'),
         layers.MaxPooling2D((2, 2)),
-        layers.Dropout(0.25),
+        layers.Dropout(conv_dropout),
 
         layers.Conv2D(128, (3, 3), activation='relu', padding='same'),
         layers.BatchNormalization(),
         layers.Conv2D(128, (3, 3), activation='relu', padding='same'),
         layers.MaxPooling2D((2, 2)),
-        layers.Dropout(0.25),
+        layers.Dropout(conv_dropout),
 
         layers.Flatten(),
-        layers.Dense(256, activation='relu'),
+        layers.Dense(dense_units, activation='relu'),
         layers.BatchNormalization(),
-        layers.Dropout(0.5),
+        layers.Dropout(dense_dropout),
         layers.Dense(128, activation='relu'),
-        layers.Dropout(0.5),
+        layers.Dropout(dense_dropout),
         layers.Dense(len(CLASSES), activation='softmax')
     ])
 
     model.compile(
-        optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
         loss='sparse_categorical_crossentropy',
         metrics=['accuracy']
     )
 
     return model
 
-def train_cnn(train_gen, val_gen):
-    """Entraine le modele CNN"""
-    print("\n" + "="*70)
-    print("ENTRAINEMENT DU MODELE CNN")
-    print("="*70)
-    print(f"Temps estime : 15-30 minutes")
-    print(f"{EPOCHS} epoques d'entrainement\n")
-
-    model = create_cnn_model()
-
-    callbacks = [
+def create_callbacks():
+    """Callbacks communs au CNN et a l'ANN"""
+    return [
         tf.keras.callbacks.EarlyStopping(
             monitor='val_accuracy',
+            mode='max',
             patience=10,  # Augmenté de 5 à 10
             restore_best_weights=True
         ),
@@ -150,18 +177,34 @@ def train_cnn(train_gen, val_gen):
         )
     ]
 
-    history = model.fit(
-        train_gen,
-        epochs=EPOCHS,
-        validation_data=val_gen,
-        callbacks=callbacks,
-        verbose=1
-    )
+def train_cnn(train_gen, val_gen, resume=False):
+    """Entraine le modele CNN (checkpoint a chaque epoque, reprise avec resume)"""
+    print("\n" + "="*70)
+    print("ENTRAINEMENT DU MODELE CNN")
+    print("="*70)
+    print(f"Temps estime : 15-30 minutes")
+    print(f"{EPOCHS} epoques d'entrainement\n")
 
-    model.save('models/cnn_model.h5')
+    model = create_cnn_model()
+
+    checkpoint = TrainingCheckpoint('cnn', create_callbacks(), data=train_gen, resume=resume)
+    initial_epoch = checkpoint.prepare(model)
+
+    if not checkpoint.finished:
+        model.fit(
+            train_gen,
+            epochs=EPOCHS,
+            initial_epoch=initial_epoch,
+            validation_data=val_gen,
+            callbacks=checkpoint.callbacks,
+            verbose=1
+        )
 
-    final_train_acc = history.history['accuracy'][-1]
-    final_val_acc = history.history['val_accuracy'][-1]
+    save_model_atomic(model, 'models/cnn_model.h5')
+
+    history = checkpoint.history
+    final_train_acc = history['accuracy'][-1]
+    final_val_acc = history['val_accuracy'][-1]
 
     print("\n" + "="*70)
     print("MODELE CNN ENTRAINE ET SAUVEGARDE")
@@ -172,42 +215,47 @@ def train_cnn(train_gen, val_gen):
 
     return model, history
 
-def create_ann_model():
-    """Cree le modele ANN"""
-    print("\nCreation du modele ANN...")
+def create_ann_model(learning_rate=0.001, dropout=0.5, ann_input=None):
+    """Cree le modele ANN (hyperparametres par defaut : ceux de l'entrainement)
+
+    Le modele servi prend l'entree decrite par ANN_INPUT ; le modele retourne
+    accepte des lots 224x224 (adaptateur devant) pour partager les lots du CNN.
+    """
+    spec = parse_spec(ann_input or ANN_INPUT)
+    print(f"\nCreation du modele ANN (entree {ann_input or ANN_INPUT})...")
 
     model = tf.keras.Sequential([
-        layers.Input(shape=(*IMG_SIZE, 3)),
+        layers.Input(shape=spec_shape(spec)),
         layers.Flatten(),
 
         layers.Dense(1024, activation='relu'),
         layers.BatchNormalization(),
-        layers.Dropout(0.5),
+        layers.Dropout(dropout),
 
         layers.Dense(512, activation='relu'),
         layers.BatchNormalization(),
-        layers.Dropout(0.5),
+        layers.Dropout(dropout),
 
         layers.Dense(256, activation='relu'),
         layers.BatchNormalization(),
-        layers.Dropout(0.5),
+        layers.Dropout(dropout),
 
         layers.Dense(128, activation='relu'),
-        layers.Dropout(0.5),
+        layers.Dropout(dropout),
 
         layers.Dense(len(CLASSES), activation='softmax')
-    ])
+    ], name='ann')
 
     model.compile(
-        optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
         loss='sparse_categorical_crossentropy',
         metrics=['accuracy']
     )
 
-    return model
+    return with_adapter(model, spec)
 
-def train_ann(train_gen, val_gen):
-    """Entraine le modele ANN"""
+def train_ann(train_gen, val_gen, resume=False):
+    """Entraine le modele ANN (checkpoint a chaque epoque, reprise avec resume)"""
     print("\n" + "="*70)
     print("ENTRAINEMENT DU MODELE ANN")
     print("="*70)
@@ -216,32 +264,24 @@ def train_ann(train_gen, val_gen):
 
     model = create_ann_model()
 
-    callbacks = [
-        tf.keras.callbacks.EarlyStopping(
-            monitor='val_accuracy',
-            patience=10,
-            restore_best_weights=True
-        ),
-        tf.keras.callbacks.ReduceLROnPlateau(
-            monitor='val_loss',
-            factor=0.5,
-            patience=5,
-            min_lr=0.00001
+    checkpoint = TrainingCheckpoint('ann', create_callbacks(), data=train_gen, resume=resume)
+    initial_epoch = checkpoint.prepare(model)
+
+    if not checkpoint.finished:
+        model.fit(
+            train_gen,
+            epochs=EPOCHS,
+            initial_epoch=initial_epoch,
+            validation_data=val_gen,
+            callbacks=checkpoint.callbacks,
+            verbose=1
         )
-    ]
-
-    history = model.fit(
-        train_gen,
-        epochs=EPOCHS,
-        validation_data=val_gen,
-        callbacks=callbacks,
-        verbose=1
-    )
 
-    model.save('models/ann_model.h5')
+    save_model_atomic(serving_model(model), 'models/ann_model.h5')
 
-    final_train_acc = history.history['accuracy'][-1]
-    final_val_acc = history.history['val_accuracy'][-1]
+    history = checkpoint.history
+    final_train_acc = history['accuracy'][-1]
+    final_val_acc = history['val_accuracy'][-1]
 
     print("\n" + "="*70)
     print("MODELE ANN ENTRAINE ET SAUVEGARDE")
@@ -252,33 +292,62 @@ def train_ann(train_gen, val_gen):
 
     return model, history
 
-def evaluate_models(cnn_model, ann_model, val_gen):
-    """Compare les deux modeles"""
+def train_lockstep_models(train_gen, val_gen, resume=False):
+    """Entraine CNN et ANN ensemble sur un seul flux de lots augmentes"""
     print("\n" + "="*70)
-    print("EVALUATION ET COMPARAISON")
+    print("ENTRAINEMENT SIMULTANE CNN + ANN")
     print("="*70)
+    print(f"{EPOCHS} epoques d'entrainement, un seul passage des donnees par epoque\n")
+
+    cnn_model = create_cnn_model()
+    ann_model = create_ann_model()
+
+    checkpoints = {
+        "CNN": TrainingCheckpoint('cnn', create_callbacks(), data=train_gen, resume=resume),
+        "ANN": TrainingCheckpoint('ann', create_callbacks(), data=train_gen, resume=resume)
+    }
+    checkpoints["CNN"].prepare(cnn_model)
+    checkpoints["ANN"].prepare(ann_model)
+
+    train_lockstep(
+        {
+            "CNN": (cnn_model, checkpoints["CNN"].callbacks),
+            "ANN": (ann_model, checkpoints["ANN"].callbacks)
+        },
+        train_gen, val_gen, EPOCHS,
+        # Chaque modele reprend a son epoque ; les modeles termines restent hors du flux
+        initial_epoch={name: c.initial_epoch for name, c in checkpoints.items()}
+    )
 
-    print("\nEvaluation du modele CNN...")
-    cnn_loss, cnn_acc = cnn_model.evaluate(val_gen, verbose=0)
+    for name, model, path in (("CNN", cnn_model, 'models/cnn_model.h5'),
+                              ("ANN", ann_model, 'models/ann_model.h5')):
+        save_model_atomic(serving_model(model), path)
+        history = checkpoints[name].history
+        print(f"\nModele {name} : precision entrainement {history['accuracy'][-1]*100:.2f}%, "
+              f"validation {history['val_accuracy'][-1]*100:.2f}%")
+        print(f"Sauvegarde : {path}")
 
-    print("Evaluation du modele ANN...")
-    ann_loss, ann_acc = ann_model.evaluate(val_gen, verbose=0)
+    return cnn_model, ann_model
 
+def evaluate_models(cnn_model, ann_model):
+    """Compare les deux modeles sur les memes lots (un seul passage par split)"""
     print("\n" + "="*70)
-    print("RESULTATS FINAUX")
+    print("EVALUATION ET COMPARAISON")
     print("="*70)
-    print(f"\nCNN Model:")
-    print(f"   Precision : {cnn_acc*100:.2f}%")
-    print(f"   Loss : {cnn_loss:.4f}")
 
-    print(f"\nANN Model:")
-    print(f"   Precision : {ann_acc*100:.2f}%")
-    print(f"   Loss : {ann_loss:.4f}")
+    models = {"CNN": (cnn_model, 'models/cnn_model.h5'), "ANN": (ann_model, 'models/ann_model.h5')}
+    splits = [split for split in ('data/validation', 'data/test') if os.path.exists(split)]
+    report = evaluation.evaluate(models, splits)
+
+    report_path = evaluation.save_report(
+        report, os.path.join(evaluation.REPORTS_DIR, 'eval_training.json')
+    )
 
-    if cnn_acc > ann_acc:
-        print(f"\nLe modele CNN est meilleur (+{(cnn_acc-ann_acc)*100:.2f}%)")
-    else:
-        print(f"\nLe modele ANN est meilleur (+{(ann_acc-cnn_acc)*100:.2f}%)")
+    print("\n" + "="*70)
+    print("RESULTATS FINAUX")
+    print("="*70)
+    evaluation.print_report(report)
+    print(f"\nRapport complet : {report_path}")
 
     print("\n" + "="*70)
     print("ENTRAINEMENT TERMINE")
@@ -291,6 +360,11 @@ def evaluate_models(cnn_model, ann_model, val_gen):
 
 def main():
     """Fonction principale"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resume', action='store_true',
+                        help="reprendre depuis le dernier checkpoint (checkpoints/)")
+    args = parser.parse_args()
+
     try:
         os.makedirs('models', exist_ok=True)
 
@@ -298,12 +372,23 @@ def main():
             return
 
         train_gen, val_gen = load_data()
-        cnn_model, cnn_history = train_cnn(train_gen, val_gen)
-        ann_model, ann_history = train_ann(train_gen, val_gen)
-        evaluate_models(cnn_model, ann_model, val_gen)
+        if LOCKSTEP:
+            cnn_model, ann_model = train_lockstep_models(train_gen, val_gen, args.resume)
+        else:
+            cnn_model, cnn_history = train_cnn(train_gen, val_gen, args.resume)
+            ann_model, ann_history = train_ann(train_gen, val_gen, args.resume)
+        evaluate_models(cnn_model, ann_model)
+
+        # Artefacts d'inference (TFLite float32 / float16 / int8)
+        export_model('models/cnn_model.h5')
+        export_model('models/ann_model.h5')
+
+        # Mode degrade du serveur : classifieur couleur sur histogrammes
+        fit_color_classifier()
 
     except KeyboardInterrupt:
         print("\n\nEntrainement interrompu par utilisateur")
+        print("Reprendre : python train_models_complete.py --resume")
     except Exception as e:
         print(f"\n\nErreur : {e}")
         import traceback
@@ -1,8 +1,19 @@
 
 import tensorflow as tf
 from tensorflow.keras import layers
+import argparse
+import numpy as np
 import os
 
+from export_tflite import export_model
+from dataset_cache import cached_generators, split_fingerprint
+from tf_data_pipeline import make_datasets, iter_batches
+from multi_train import train_lockstep
+from checkpoints import TrainingCheckpoint, save_model_atomic
+from model_inputs import parse_spec, spec_shape, with_adapter, serving_model
+from fallback import fit_color_classifier
+import evaluate as evaluation
+
 print("="*70)
 print("ENTRAINEMENT AVEC TRANSFER LEARNING")
 print("="*70)
@@ -11,6 +22,17 @@ IMG_SIZE = (224, 224)
 BATCH_SIZE = 16  # Réduit pour petit dataset
 EPOCHS = 30  # Plus d'époques
 CLASSES = ['apple', 'banana', 'carrot', 'orange', 'tomato']
+# Images décodées une seule fois dans cache/ (DATASET_CACHE=0 pour flow_from_directory)
+USE_DATASET_CACHE = os.environ.get('DATASET_CACHE', '1') == '1'
+# Pipeline d'entrée : generator (ImageDataGenerator) ou tfdata (augmentation parallèle)
+INPUT_PIPELINE = os.environ.get('INPUT_PIPELINE', 'generator')
+# Phase 1 sur des caractéristiques MobileNetV2 pré-calculées (FEATURE_CACHE=0 pour désactiver)
+USE_FEATURE_CACHE = os.environ.get('FEATURE_CACHE', '1') == '1'
+FEATURE_VIEWS = int(os.environ.get('FEATURE_VIEWS', 5))  # Vues augmentées par image
+# ANN entraîné avec le fine-tuning sur les mêmes lots (LOCKSTEP=0 : l'un après l'autre)
+LOCKSTEP = os.environ.get('LOCKSTEP', '1') == '1'
+# Entrée de l'ANN : pixels:32 (image réduite), histogram:8 (histogramme RGB) ou full (224x224)
+ANN_INPUT = os.environ.get('ANN_INPUT', 'pixels:32')
 
 def load_data():
     """Charge les données avec augmentation agressive"""
@@ -34,6 +56,22 @@ def load_data():
         rescale=1./255
     )
 
+    if INPUT_PIPELINE == 'tfdata':
+        train_ds, val_ds, n_train, n_val = make_datasets(
+            train_datagen, val_datagen, CLASSES, IMG_SIZE, BATCH_SIZE, use_cache=USE_DATASET_CACHE
+        )
+        print(f"{n_train} images entrainement (tf.data)")
+        print(f"{n_val} images validation (tf.data)")
+        return train_ds, val_ds
+
+    if USE_DATASET_CACHE:
+        train_generator, val_generator = cached_generators(
+            train_datagen, val_datagen, CLASSES, IMG_SIZE, BATCH_SIZE
+        )
+        print(f"{train_generator.samples} images entrainement (cache)")
+        print(f"{val_generator.samples} images validation (cache)")
+        return train_generator, val_generator
+
     train_generator = train_datagen.flow_from_directory(
         'data/train',
         target_size=IMG_SIZE,
@@ -57,8 +95,8 @@ def load_data():
 
     return train_generator, val_generator
 
-def create_transfer_learning_model():
-    """Crée un modèle avec MobileNetV2 pré-entraîné"""
+def create_transfer_learning_model(learning_rate=0.001, dropout=0.5, head_units=128, head_dropout=0.3):
+    """Crée un modèle avec MobileNetV2 pré-entraîné (hyperparamètres de la tête)"""
     print("\nCréation du modèle Transfer Learning...")
 
     # Charger MobileNetV2 pré-entraîné sur ImageNet
@@ -76,22 +114,111 @@ def create_transfer_learning_model():
         layers.Input(shape=(*IMG_SIZE, 3)),
         base_model,
         layers.GlobalAveragePooling2D(),
-        layers.Dropout(0.5),
-        layers.Dense(128, activation='relu'),
-        layers.Dropout(0.3),
+        layers.Dropout(dropout),
+        layers.Dense(head_units, activation='relu'),
+        layers.Dropout(head_dropout),
         layers.Dense(len(CLASSES), activation='softmax')
     ])
 
     model.compile(
-        optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
         loss='sparse_categorical_crossentropy',
         metrics=['accuracy']
     )
 
     return model, base_model
 
-def fine_tune_model(model, base_model, train_gen, val_gen):
-    """Fine-tuning : débloquer les dernières couches"""
+def extract_features(base_model, data, views=1):
+    """Caractéristiques du backbone gelé, après GlobalAveragePooling2D"""
+    pooling = layers.GlobalAveragePooling2D()
+    features, labels = [], []
+
+    for _ in range(views):
+        for x, y in iter_batches(data):
+            features.append(pooling(base_model(x, training=False)).numpy())
+            labels.append(np.asarray(y))
+
+    return np.concatenate(features), np.concatenate(labels)
+
+def load_features(base_model, data, split_dir, views):
+    """Charge les caractéristiques depuis cache/ ou les calcule une seule fois"""
+    fingerprint = split_fingerprint(split_dir, CLASSES)
+    name = os.path.basename(os.path.normpath(split_dir))
+    path = f'cache/features_mobilenetv2_{name}_{views}v_{fingerprint}.npz'
+
+    if os.path.exists(path):
+        cached = np.load(path)
+        print(f"Caractéristiques {name} chargées depuis {path}")
+        return cached['features'], cached['labels']
+
+    print(f"Calcul des caractéristiques {name} ({views} vue(s) par image)...")
+    features, labels = extract_features(base_model, data, views)
+
+    os.makedirs('cache', exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(f, features=features, labels=labels)
+    os.replace(path + '.tmp', path)
+
+    return features, labels
+
+def train_head_on_features(model, base_model, train_gen, val_gen, resume=False):
+    """Phase 1 : entraîne la tête sur les caractéristiques en cache
+
+    Le backbone gelé tourne en mode inférence (BatchNormalization figée) :
+    ses sorties ne dépendent que de l'image, on les calcule donc une fois
+    pour la validation et pour FEATURE_VIEWS vues augmentées de chaque image
+    d'entraînement. La tête partage ses couches (et donc ses poids) avec le
+    modèle complet, qui part de cette tête pour la phase 2.
+
+    Retourne le checkpoint de la phase (historique dans .history).
+    """
+    train_x, train_y = load_features(base_model, train_gen, 'data/train', FEATURE_VIEWS)
+    val_x, val_y = load_features(base_model, val_gen, 'data/validation', 1)
+
+    # Couches après GlobalAveragePooling2D : Dropout, Dense(128), Dropout, Dense
+    head = tf.keras.Sequential([
+        layers.Input(shape=train_x.shape[1:]),
+        *model.layers[2:]
+    ])
+
+    head.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+
+    callbacks = [
+        tf.keras.callbacks.EarlyStopping(
+            monitor='val_accuracy',
+            patience=8,
+            restore_best_weights=True
+        )
+    ]
+
+    checkpoint = TrainingCheckpoint('transfer_head', callbacks, resume=resume)
+    initial_epoch = checkpoint.prepare(head)
+
+    if not checkpoint.finished:
+        head.fit(
+            train_x, train_y,
+            batch_size=BATCH_SIZE,
+            epochs=20,
+            initial_epoch=initial_epoch,
+            validation_data=(val_x, val_y),
+            callbacks=checkpoint.callbacks,
+            verbose=1
+        )
+
+    return checkpoint
+
+def fine_tune_model(model, base_model, train_gen, val_gen, extra_runs=None, resume=False):
+    """Fine-tuning : débloquer les dernières couches
+
+    extra_runs : {nom: (modèle compilé, callbacks)} entraînés en même temps,
+    sur les mêmes lots (un seul passage des données par époque).
+    Chaque modèle a son checkpoint (checkpoints/transfer_<nom>) ; retourne
+    {nom: checkpoint}, historiques dans .history.
+    """
     print("\nFine-tuning du modèle...")
 
     # Débloquer les 50 dernières couches de MobileNetV2
@@ -121,19 +248,75 @@ def fine_tune_model(model, base_model, train_gen, val_gen):
         )
     ]
 
-    # Entraîner
-    history = model.fit(
-        train_gen,
-        epochs=EPOCHS,
-        validation_data=val_gen,
-        callbacks=callbacks,
-        verbose=1
+    runs = {"CNN": (model, callbacks), **(extra_runs or {})}
+    checkpoints = {}
+    for name, (run_model, run_callbacks) in runs.items():
+        checkpoints[name] = TrainingCheckpoint(
+            f'transfer_{name.lower()}', run_callbacks, data=train_gen, resume=resume
+        )
+        checkpoints[name].prepare(run_model)
+
+    if extra_runs:
+        # Chaque modèle reprend à son époque ; les modèles terminés restent hors du flux
+        train_lockstep(
+            {name: (run_model, checkpoints[name].callbacks)
+             for name, (run_model, _) in runs.items()},
+            train_gen, val_gen, EPOCHS,
+            initial_epoch={name: c.initial_epoch for name, c in checkpoints.items()}
+        )
+    elif not checkpoints["CNN"].finished:
+        # Entraîner
+        model.fit(
+            train_gen,
+            epochs=EPOCHS,
+            initial_epoch=checkpoints["CNN"].initial_epoch,
+            validation_data=val_gen,
+            callbacks=checkpoints["CNN"].callbacks,
+            verbose=1
+        )
+
+    return checkpoints
+
+def create_ann_model():
+    """Crée une version ANN simple, sur l'entrée ANN_INPUT (adaptateur 224x224 devant)"""
+    spec = parse_spec(ANN_INPUT)
+    ann_model = tf.keras.Sequential([
+        layers.Input(shape=spec_shape(spec)),
+        layers.Flatten(),
+        layers.Dense(512, activation='relu'),
+        layers.Dropout(0.3),  # Réduit de 0.6 à 0.3
+        layers.Dense(256, activation='relu'),
+        layers.Dropout(0.3),  # Réduit de 0.5 à 0.3
+        layers.Dense(128, activation='relu'),
+        layers.Dropout(0.2),  # Réduit de 0.4 à 0.2
+        layers.Dense(len(CLASSES), activation='softmax')
+    ], name='ann')
+
+    ann_model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=0.0005),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
     )
 
-    return history
+    return with_adapter(ann_model, spec)
+
+def ann_callbacks():
+    """Callbacks de l'ANN (mêmes que la phase 1)"""
+    return [
+        tf.keras.callbacks.EarlyStopping(
+            monitor='val_accuracy',
+            patience=8,
+            restore_best_weights=True
+        )
+    ]
 
 def main():
     """Fonction principale"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resume', action='store_true',
+                        help="reprendre depuis le dernier checkpoint (checkpoints/)")
+    args = parser.parse_args()
+
     try:
         os.makedirs('models', exist_ok=True)
 
@@ -155,75 +338,97 @@ def main():
             )
         ]
 
-        history1 = model.fit(
-            train_gen,
-            epochs=20,
-            validation_data=val_gen,
-            callbacks=callbacks,
-            verbose=1
-        )
+        if args.resume and TrainingCheckpoint('transfer_cnn').exists():
+            # Le checkpoint de la phase 2 contient déjà tout le modèle
+            print("Phase 1 déjà terminée (checkpoint de fine-tuning présent)")
+        elif USE_FEATURE_CACHE:
+            train_head_on_features(model, base_model, train_gen, val_gen, args.resume)
+        else:
+            checkpoint = TrainingCheckpoint('transfer_phase1', callbacks, data=train_gen,
+                                            resume=args.resume)
+            initial_epoch = checkpoint.prepare(model)
+            if not checkpoint.finished:
+                model.fit(
+                    train_gen,
+                    epochs=20,
+                    initial_epoch=initial_epoch,
+                    validation_data=val_gen,
+                    callbacks=checkpoint.callbacks,
+                    verbose=1
+                )
 
         # Phase 2 : Fine-tuning
         print("\n" + "="*70)
         print("PHASE 2 : FINE-TUNING")
         print("="*70)
 
-        history2 = fine_tune_model(model, base_model, train_gen, val_gen)
+        ann_model = None
+        if LOCKSTEP:
+            # L'ANN s'entraîne sur les mêmes lots que le fine-tuning
+            ann_model = create_ann_model()
+            fine_tune_model(
+                model, base_model, train_gen, val_gen,
+                extra_runs={"ANN": (ann_model, ann_callbacks())},
+                resume=args.resume
+            )
+        else:
+            fine_tune_model(model, base_model, train_gen, val_gen, resume=args.resume)
 
         # Sauvegarder
-        model.save('models/cnn_model.h5')
-
-        # Évaluation finale
-        print("\n" + "="*70)
-        print("EVALUATION FINALE")
-        print("="*70)
-
-        val_loss, val_acc = model.evaluate(val_gen, verbose=0)
-
-        print(f"\nPrécision finale : {val_acc*100:.2f}%")
-        print(f"Loss : {val_loss:.4f}")
+        save_model_atomic(model, 'models/cnn_model.h5')
         print(f"\nModèle sauvegardé : models/cnn_model.h5")
 
         # Créer aussi une version ANN simple
+        if ann_model is None:
+            print("\n" + "="*70)
+            print("CREATION DU MODELE ANN")
+            print("="*70)
+
+            ann_model = create_ann_model()
+
+            checkpoint = TrainingCheckpoint('transfer_ann', ann_callbacks(), data=train_gen,
+                                            resume=args.resume)
+            initial_epoch = checkpoint.prepare(ann_model)
+            if not checkpoint.finished:
+                ann_model.fit(
+                    train_gen,
+                    epochs=30,
+                    initial_epoch=initial_epoch,
+                    validation_data=val_gen,
+                    callbacks=checkpoint.callbacks,
+                    verbose=1
+                )
+
+        save_model_atomic(serving_model(ann_model), 'models/ann_model.h5')
+
+        # Évaluation finale : CNN et ANN sur les mêmes lots, un passage par split
         print("\n" + "="*70)
-        print("CREATION DU MODELE ANN")
+        print("EVALUATION FINALE")
         print("="*70)
 
-        ann_model = tf.keras.Sequential([
-            layers.Input(shape=(*IMG_SIZE, 3)),
-            layers.Flatten(),
-            layers.Dense(512, activation='relu'),
-            layers.Dropout(0.3),  # Réduit de 0.6 à 0.3
-            layers.Dense(256, activation='relu'),
-            layers.Dropout(0.3),  # Réduit de 0.5 à 0.3
-            layers.Dense(128, activation='relu'),
-            layers.Dropout(0.2),  # Réduit de 0.4 à 0.2
-            layers.Dense(len(CLASSES), activation='softmax')
-        ])
-
-        ann_model.compile(
-            optimizer=tf.keras.optimizers.Adam(learning_rate=0.0005),
-            loss='sparse_categorical_crossentropy',
-            metrics=['accuracy']
-        )
-
-        ann_history = ann_model.fit(
-            train_gen,
-            epochs=30,
-            validation_data=val_gen,
-            callbacks=callbacks,
-            verbose=1
+        splits = [split for split in ('data/validation', 'data/test') if os.path.exists(split)]
+        report = evaluation.evaluate({
+            "CNN": (model, 'models/cnn_model.h5'),
+            "ANN": (ann_model, 'models/ann_model.h5')
+        }, splits)
+        evaluation.print_report(report)
+        report_path = evaluation.save_report(
+            report, os.path.join(evaluation.REPORTS_DIR, 'eval_transfer.json')
         )
+        print(f"\nRapport complet : {report_path}")
 
-        ann_model.save('models/ann_model.h5')
-        ann_loss, ann_acc = ann_model.evaluate(val_gen, verbose=0)
+        # Artefacts d'inférence (TFLite float32 / float16 / int8)
+        export_model('models/cnn_model.h5')
+        export_model('models/ann_model.h5')
 
-        print(f"\nANN Précision : {ann_acc*100:.2f}%")
+        # Mode dégradé du serveur : classifieur couleur sur histogrammes
+        fit_color_classifier()
         print(f"\nModèles sauvegardés avec succès")
         print("Lancez : python app.py")
 
     except KeyboardInterrupt:
         print("\n\nEntraînement interrompu")
+        print("Reprendre : python train_transfer_learning.py --resume")
     except Exception as e:
         print(f"\n\nErreur : {e}")
         import traceback
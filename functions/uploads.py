@@ -0,0 +1,219 @@
+import json
+import mmap
+import os
+import struct
+
+from model_inputs import build_inputs_timed
+
+# Octets lus pour trouver les dimensions ; au-dela on abandonne (en-tete illisible)
+SNIFF_BYTES = 64 * 1024
+MAX_HEADER_BYTES = 1024 * 1024
+# Les uploads plus gros sont deja sur disque (SpooledTemporaryFile) : on les mappe
+MMAP_MIN_BYTES = 1024 * 1024
+
+class UploadRejected(Exception):
+    """Upload refuse avant decodage (trop gros, pas une image, trop de pixels)"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+    def __reduce__(self):
+        # Traverse l'executeur de decodage en processus
+        return (UploadRejected, (self.status_code, str(self)))
+
+class BodyTooLarge(Exception):
+    pass
+
+class BodyLimitMiddleware:
+    """Middleware ASGI : limite la taille du corps des requetes pendant la reception
+
+    Un Content-Length trop grand est refuse sans rien lire ; sinon les octets
+    sont comptes au fil de l'eau et la reception est interrompue des que la
+    limite est depassee, avant que le multipart ne soit entierement ecrit.
+    `overrides` : {chemin: limite} (ex. les archives de /predict/batch).
+    Une limite de 0 desactive le controle.
+    """
+
+    def __init__(self, app, max_bytes, overrides=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.overrides = overrides or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = self.overrides.get(scope["path"], self.max_bytes)
+        if not limit:
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            return await self.reject(send, limit)
+
+        state = {"received": 0, "exceeded": False, "rejected": False}
+
+        async def limited_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                if state["received"] > limit:
+                    state["exceeded"] = True
+                    raise BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # FastAPI transforme les erreurs de lecture du formulaire en 400 :
+            # on remplace cette reponse par le 413
+            if state["exceeded"]:
+                if not state["rejected"]:
+                    state["rejected"] = True
+                    await self.reject(send, limit)
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except BodyTooLarge:
+            pass
+        if state["exceeded"] and not state["rejected"]:
+            await self.reject(send, limit)
+
+    @staticmethod
+    async def reject(send, limit):
+        body = json.dumps({
+            "error": f"Corps de requete trop gros (max {limit // (1024 * 1024)} Mo)"
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+def jpeg_size(header):
+    """Dimensions d'un JPEG d'apres le premier marqueur SOF (None si pas encore lu)"""
+    pos = 2
+    while pos + 4 <= len(header):
+        if header[pos] != 0xFF:
+            raise UploadRejected(422, "JPEG invalide")
+        marker = header[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            pos += 2
+            continue
+        length = struct.unpack(">H", header[pos + 2:pos + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if pos + 9 > len(header):
+                return None
+            height, width = struct.unpack(">HH", header[pos + 5:pos + 9])
+            return width, height
+        pos += 2 + length
+    return None
+
+def sniff_image(header):
+    """(format, largeur, hauteur) d'apres les premiers octets, None s'il en faut plus
+
+    Leve UploadRejected si ce n'est pas un format d'image accepte.
+    """
+    header = bytes(header)
+    if header[:3] == b"\xff\xd8\xff":
+        size = jpeg_size(header)
+        return ("JPEG", *size) if size else None
+
+    if header[:8] == b"\x89PNG\r\n\x1a\n":
+        if len(header) < 24:
+            return None
+        return ("PNG", *struct.unpack(">II", header[16:24]))
+
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        if len(header) < 10:
+            return None
+        return ("GIF", *struct.unpack("<HH", header[6:10]))
+
+    if header[:2] == b"BM":
+        if len(header) < 26:
+            return None
+        if struct.unpack("<I", header[14:18])[0] == 12:
+            return ("BMP", *struct.unpack("<HH", header[18:22]))
+        width, height = struct.unpack("<ii", header[18:26])
+        return ("BMP", abs(width), abs(height))
+
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        if len(header) < 30:
+            return None
+        chunk = header[12:16]
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", header[26:30])
+            return ("WEBP", width & 0x3FFF, height & 0x3FFF)
+        if chunk == b"VP8L":
+            bits = struct.unpack("<I", header[21:25])[0]
+            return ("WEBP", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+        if chunk == b"VP8X":
+            return ("WEBP", int.from_bytes(header[24:27], "little") + 1,
+                    int.from_bytes(header[27:30], "little") + 1)
+
+    if len(header) < 12:
+        return None
+    raise UploadRejected(415, "Format non supporte (JPEG, PNG, GIF, BMP ou WEBP)")
+
+def check_dimensions(info, max_pixels):
+    """Refuse les images vides ou trop grandes (bombes de decompression)"""
+    image_format, width, height = info
+    if not width or not height:
+        raise UploadRejected(422, f"{image_format} sans dimensions")
+    if max_pixels and width * height > max_pixels:
+        raise UploadRejected(
+            413, f"Image trop grande : {width}x{height} ({width * height / 1e6:.1f} Mpx, "
+                 f"max {max_pixels / 1e6:.1f} Mpx)"
+        )
+
+def check_image(image_bytes, max_pixels):
+    """Verifie format et dimensions d'une image deja en memoire, sans la decoder"""
+    info = sniff_image(memoryview(image_bytes)[:MAX_HEADER_BYTES])
+    if info is None:
+        raise UploadRejected(422, "En-tete d'image illisible")
+    check_dimensions(info, max_pixels)
+    return info
+
+def checked_inputs(image_bytes, specs, max_pixels, scaled=True):
+    """build_inputs_timed precede de check_image (membres d'archive de /predict/batch)"""
+    if isinstance(image_bytes, Exception):
+        raise image_bytes
+    check_image(image_bytes, max_pixels)
+    return build_inputs_timed(image_bytes, specs, scaled)
+
+def open_upload(fileobj, max_pixels, zero_copy=True):
+    """Octets d'un upload deja recu, apres controle de l'en-tete
+
+    Seuls les premiers octets sont lus pour identifier le format et les
+    dimensions ; le reste n'est lu que si l'image est acceptee. Les uploads
+    passes sur disque sont mappes en memoire (memoryview sur le mmap) : le
+    decodeur lit directement le fichier temporaire, sans copie en memoire.
+    `zero_copy=False` renvoie des bytes (executeur de decodage en processus).
+    """
+    size = fileobj.seek(0, os.SEEK_END)
+    if not size:
+        raise UploadRejected(400, "Fichier vide")
+
+    fileobj.seek(0)
+    header = fileobj.read(min(size, SNIFF_BYTES))
+    info = sniff_image(header)
+    while info is None and len(header) < min(size, MAX_HEADER_BYTES):
+        header += fileobj.read(SNIFF_BYTES)
+        info = sniff_image(header)
+    if info is None:
+        raise UploadRejected(422, "En-tete d'image illisible")
+    check_dimensions(info, max_pixels)
+
+    if len(header) == size:
+        return header
+    if zero_copy and size >= MMAP_MIN_BYTES:
+        return memoryview(mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ))
+    fileobj.seek(0)
+    return fileobj.read()